@@ -1,6 +1,4 @@
 from logging import getLogger
-from pathlib import Path
-
 from flask import Blueprint, Response, request
 
 from config.settings import settings
@@ -28,9 +26,6 @@ def set_config():
     logger.debug("Got data %s", data)
 
     config = Config.model_validate(data)
-    config_path = Path(settings.config_path)
-
-    with open(config_path, "w", encoding="utf-8") as f:
-        f.write(config.model_dump_json(indent=2))
+    settings.save_config(config)
 
     return config.model_dump_json()
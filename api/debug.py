@@ -3,7 +3,7 @@ from logging import getLogger
 from flask import Blueprint, jsonify
 
 from models.errors import ErrorResponse
-from utils.docker import docker
+from utils.docker import engines
 
 logger = getLogger(__name__)
 
@@ -13,11 +13,14 @@ bp = Blueprint("debug", __name__, url_prefix="/api/debug")
 @bp.route("/docker")
 def debug_docker():
     try:
-        all_containers = docker.get().containers.list(all=True)
+        all_containers = [
+            (engine, container) for engine in engines.all() for container in engine.get().containers.list(all=True)
+        ]
 
         containers_info = []
-        for container in all_containers:
+        for engine, container in all_containers:
             container_info = {
+                "engine": engine.name,
                 "id": container.id[:12],
                 "name": container.name,
                 "status": container.status,
@@ -41,7 +44,7 @@ def debug_docker():
 @bp.route("/docker/clear-all", methods=["POST"])
 def debug_docker_stop_all():
     try:
-        cleaned = docker.cleanup_containers()
+        cleaned = engines.cleanup_containers()
         return jsonify({"containers_cleaned": cleaned})
 
     except Exception as e:
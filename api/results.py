@@ -1,24 +1,123 @@
+import mimetypes
 from logging import getLogger
 from pathlib import Path
 
-from flask import Blueprint, jsonify, send_file
+from flask import Blueprint, Response, jsonify, request, send_file
+from werkzeug.security import safe_join
 
 from config.settings import settings
+from db.db import database as db
+from models.compare import CompareQuery
 from models.errors import ErrorResponse
-from utils.zip import make_zip
+from models.metrics import MetricsQuery, PercentilesQuery
+from models.results import RunsQuery
+from models.trends import TrendsQuery
+from utils.catalog import catalog
+from utils.compare import RunNotFoundError, compare_runs
+from utils.compress import compressible, fresh_gzip
+from utils.metrics import metrics
+from utils.postrun import submit_finished_run
+from utils.retention import retention
+from utils.test_ids import results_dir as test_results_dir
+from utils.trends import trends
+from utils.zip import archive_path, iter_zip
 
 logger = getLogger(__name__)
 
 bp = Blueprint("results", __name__, url_prefix="/api/results")
 
 
+@bp.route("")
+def list_results():
+    query = RunsQuery.model_validate(request.args.to_dict())
+    page = catalog.query(**query.model_dump())
+    return jsonify(page.model_dump())
+
+
+@bp.route("/catalog/rebuild", methods=["POST"])
+def rebuild_catalog():
+    return jsonify({"runs": catalog.rebuild()})
+
+
+@bp.route("/retention")
+def get_retention():
+    """Disk usage, the retention settings and the report of the last pass."""
+    return jsonify(retention.status().model_dump())
+
+
+@bp.route("/retention/run", methods=["POST"])
+def run_retention():
+    report = retention.run()
+    if report is None:
+        return jsonify(
+            ErrorResponse(
+                status_code=409,
+                message="Retention is already running",
+            ).model_dump(),
+        ), 409
+    return jsonify(report.model_dump())
+
+
+@bp.route("/<test_id>/pin", methods=["POST", "DELETE"])
+def pin_result(test_id: str):
+    """Pin (`POST`) or unpin (`DELETE`) a run as a baseline that the retention never compacts or deletes."""
+    run = catalog.pin(test_id, pinned=request.method == "POST")
+    if run is None:
+        return jsonify(
+            ErrorResponse(
+                status_code=404,
+                message="Results not found",
+            ).model_dump(),
+        ), 404
+    return jsonify(run.model_dump())
+
+
+@bp.route("/trends")
+def get_trends():
+    """Precomputed summaries of the last `limit` finished runs of a scenario, per endpoint."""
+    query = TrendsQuery.model_validate(request.args.to_dict())
+    catalog.ensure()
+    trend = trends.query(query.project, query.scenario, query.name, query.limit)
+    return jsonify(trend.model_dump())
+
+
+@bp.route("/compare")
+def compare_results():
+    """Per-endpoint deltas of `ids` against the first of them, statistically significant regressions flagged."""
+    query = CompareQuery.model_validate(request.args.to_dict())
+
+    try:
+        comparison = compare_runs(query.ids, query.alpha, query.min_change)
+    except RunNotFoundError as e:
+        return jsonify(
+            ErrorResponse(
+                status_code=404,
+                message=f"Metrics not found: {e}",
+            ).model_dump(),
+        ), 404
+    return jsonify(comparison.model_dump())
+
+
+@bp.route("/percentiles")
+def merge_percentiles():
+    """Percentiles of the endpoints `names` over all requests of the runs `ids`, from their merged histograms."""
+    query = PercentilesQuery.model_validate(request.args.to_dict())
+
+    merged = metrics.merge_percentiles(query.ids, query.names)
+    if merged is None:
+        return jsonify(
+            ErrorResponse(
+                status_code=404,
+                message="Metrics not found",
+            ).model_dump(),
+        ), 404
+    return jsonify(merged.model_dump())
+
+
 @bp.route("/<test_id>/report")
 def get_test_report_html(test_id: str):
     try:
-        project_scenario, timestamp = test_id.rsplit("-", 1)
-        project, scenario = project_scenario.split("__", 1)
-
-        results_dir = Path(settings.results_path) / project / scenario / test_id
+        results_dir = test_results_dir(test_id)
 
         if not results_dir.exists():
             return jsonify(
@@ -38,10 +137,7 @@ def get_test_report_html(test_id: str):
                 ).model_dump(),
             ), 404
 
-        with open(report_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
-
-        return html_content, 200, {"Content-Type": "text/html; charset=utf-8"}
+        return send_result_file(test_id, report_path)
 
     except Exception as e:
         logger.error("Failed to get test report: %s", e)
@@ -53,13 +149,76 @@ def get_test_report_html(test_id: str):
         ), 500
 
 
+@bp.route("/<test_id>/metrics")
+def get_test_metrics(test_id: str):
+    """Per-endpoint time series and window summaries from the ingested CSVs (`name`, `since`, `until`, `resolution`)."""
+    query = MetricsQuery.model_validate(request.args.to_dict())
+
+    run_metrics = metrics.query(test_id, query.name, query.since, query.until, query.resolution)
+    if run_metrics is None:
+        return jsonify(
+            ErrorResponse(
+                status_code=404,
+                message="Metrics not found",
+            ).model_dump(),
+        ), 404
+    return jsonify(run_metrics.model_dump())
+
+
+@bp.route("/<test_id>/files/<filename>")
+def get_result_file(test_id: str, filename: str):
+    try:
+        results_dir = test_results_dir(test_id)
+        file_path = safe_join(str(results_dir), filename)
+
+        if file_path is None or not Path(file_path).is_file():
+            return jsonify(
+                ErrorResponse(
+                    status_code=404,
+                    message="Result file not found",
+                ).model_dump(),
+            ), 404
+
+        return send_result_file(test_id, Path(file_path), as_attachment=request.args.get("download") == "1")
+
+    except Exception as e:
+        logger.error("Failed to get result file: %s", e)
+        return jsonify(
+            ErrorResponse(
+                status_code=500,
+                message=f"Error: {str(e)}",
+            ).model_dump(),
+        ), 500
+
+
+def send_result_file(test_id: str, file_path: Path, as_attachment: bool = False) -> Response:
+    """Conditional (ETag/Last-Modified) and ranged response, gzip sidecar for clients that accept it.
+
+    Range requests always get the identity encoding, so byte offsets are those of the file itself."""
+    mimetype = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+
+    gzip_path = fresh_gzip(test_id, file_path)
+    if gzip_path is None and compressible(file_path):
+        test = db.get_test(test_id)
+        if test is None or test.status == "completed":
+            submit_finished_run(test_id, file_path.parent)  # a run indexed in bulk, processed on first use
+    if gzip_path and "gzip" in request.accept_encodings and request.range is None:
+        response = send_file(
+            gzip_path, mimetype=mimetype, as_attachment=as_attachment, download_name=file_path.name, conditional=True
+        )
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_file(file_path, mimetype=mimetype, as_attachment=as_attachment, conditional=True)
+
+    response.vary.add("Accept-Encoding")
+    response.cache_control.no_cache = True
+    return response
+
+
 @bp.route("/<test_id>/download-zip")
 def download_results_zip(test_id: str):
     try:
-        project_scenario, timestamp = test_id.rsplit("-", 1)
-        project, scenario = project_scenario.split("__", 1)
-
-        results_dir = Path(settings.results_path) / project / scenario / test_id
+        results_dir = test_results_dir(test_id)
 
         if not results_dir.exists():
             return jsonify({"error": "Results not found"}), 404
@@ -68,10 +227,18 @@ def download_results_zip(test_id: str):
         if not files:
             return jsonify({"error": "No result files found"}), 404
 
-        zip_buffer = make_zip(results_dir)
-
-        return send_file(
-            zip_buffer, as_attachment=True, download_name=f"{test_id}_results.zip", mimetype="application/zip"
+        download_name = f"{test_id}_results.zip"
+        cache_path = None
+        test = db.get_test(test_id)
+        if settings.zip_cache and (test is None or test.status == "completed"):
+            cache_path = archive_path(test_id, results_dir)
+            if cache_path.exists():
+                return send_file(cache_path, as_attachment=True, download_name=download_name)
+
+        return Response(
+            iter_zip(results_dir, cache_path),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
         )
 
     except Exception as e:
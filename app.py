@@ -8,7 +8,7 @@ from api.debug import bp as debug_bp
 from api.results import bp as results_bp
 from api.tests import bp as tests_bp
 from config.settings import settings
-from utils.app import create_exception_handlers, set_config
+from utils.app import create_exception_handlers, set_config, start_background_tasks
 
 logger = getLogger(__name__)
 basicConfig(
@@ -24,6 +24,7 @@ def create_app() -> Flask:
 
     app = set_config(app)
     app = create_exception_handlers(app)
+    app = start_background_tasks(app)
 
     app.register_blueprint(config_bp)
     app.register_blueprint(tests_bp)
@@ -1,8 +1,11 @@
 import json
+import os
+import tempfile
+import threading
 from logging import DEBUG, INFO, getLogger
 from pathlib import Path
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from models.config import Config
@@ -18,10 +21,34 @@ class Settings(BaseSettings):
     debug: bool = Field(default=True)
     logger_format: tuple[str, str] = ("%(asctime)s - %(name)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S")
 
-    docker_base_url: str = Field(default="unix:///var/run/docker.sock")
+    docker_base_url: str = Field(default="unix:///var/run/docker.sock")  # comma-separated, `url=weight` per engine
+    base_image: str = Field(default="locustio/locust:latest")
 
     allow_parallel: bool = Field(default=False)
     active_tests_cleanup_timeout: int = Field(default=60)  # in sec
+    job_workers: int = Field(default=4)
+
+    scheduler_reserved_cpus: int = Field(default=1)  # cores left to Docker and LocustSwarm itself
+    container_mem_limit: str = Field(default="1g")  # per Locust container
+
+    cleanup_workers: int = Field(default=8)
+    cleanup_stop_timeout: int = Field(default=5)  # in sec, per container
+    cleanup_deadline: int = Field(default=30)  # in sec, for the whole cleanup
+
+    pool_min_size: int = Field(default=0)  # idle containers per scenario, 0 disables the pool
+    pool_max_size: int = Field(default=4)  # idle containers in total
+
+    zip_cache: bool = Field(default=True)  # keep archives of finished tests in `{TMP_PATH}/archives`
+    metrics_keep_raw: bool = Field(default=True)  # per-second history in the metrics next to its rollups
+    latency_histograms: bool = Field(default=True)  # load `tests/histograms.py` into every test
+
+    retention_max_size: int = Field(default=0)  # in MB, results with archives, gzip copies and metrics; 0 is unlimited
+    retention_interval: int = Field(default=300)  # in sec, 0 disables the background retention
+    retention_keep_last: int = Field(default=10)  # runs per scenario never compacted or deleted
+    retention_max_runs: int = Field(default=0)  # runs per scenario kept at all, 0 is unlimited
+
+    live_poll_interval: float = Field(default=1.0)  # in sec, `/stats/requests` of every watched web-mode test
+    live_history: int = Field(default=300)  # samples per test sent to clients that join late
 
     min_port: int = Field(default=8080)
     max_port: int = Field(default=8090)
@@ -32,22 +59,91 @@ class Settings(BaseSettings):
     host: str = Field(default="http://ip")
     port: int = Field(default=3000)
 
+    _config: tuple[tuple[int, int], Config] | None = PrivateAttr(default=None)  # ((mtime_ns, size), config)
+    _config_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
     @property
     def results_path(self):
         return f"{self.tmp_path}/results"
 
+    @property
+    def archives_path(self):
+        return f"{self.tmp_path}/archives"
+
+    @property
+    def compressed_path(self):
+        return f"{self.tmp_path}/compressed"
+
+    @property
+    def metrics_path(self):
+        return f"{self.tmp_path}/metrics"
+
+    @property
+    def retention_state_path(self):
+        return f"{self.tmp_path}/retention.json"
+
+    @property
+    def db_path(self):
+        return f"{self.tmp_path}/locust_swarm.db"
+
+    @property
+    def docker_engines(self) -> list[tuple[str, float]]:
+        """`(base_url, weight)` of every Docker engine from `DOCKER_BASE_URL`."""
+        engines = []
+        for item in self.docker_base_url.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            base_url, _, weight = item.rpartition("=")
+            if base_url and weight.replace(".", "", 1).isdigit():
+                engines.append((base_url, float(weight)))
+            else:
+                engines.append((item, 1.0))
+        return engines
+
     @property
     def config(self) -> Config:
+        """Validated `config.json`, re-read only when the file's mtime or size changes."""
         config_path = Path(self.config_path)
 
-        if not config_path.exists():
-            raise FileNotFoundError(f"Projects config file not found: {config_path}")
+        try:
+            stat = config_path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Projects config file not found: {config_path}") from None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._config
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with self._config_lock:
+            with open(config_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
 
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            logger.debug("Load config.json from %s", config_path)
+            config = Config.model_validate(data)
+            self._config = (signature, config)
+        return config
+
+    def save_config(self, config: Config) -> None:
+        """Write `config.json` atomically (temp file + rename) and cache it."""
+        config_path = Path(self.config_path)
 
-        logger.debug(f"Load config.json from {config_path}")
-        return Config.model_validate(data)
+        with self._config_lock:
+            fd, tmp_path = tempfile.mkstemp(dir=config_path.parent, prefix=f".{config_path.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(config.model_dump_json(indent=2))
+                # mkstemp creates 0600, keep the mode of the file being replaced
+                mode = config_path.stat().st_mode & 0o777 if config_path.exists() else 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, config_path)
+            except Exception:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+            stat = config_path.stat()
+            self._config = ((stat.st_mtime_ns, stat.st_size), config)
 
     @property
     def log_level(self) -> int:
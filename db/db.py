@@ -1,41 +1,364 @@
+import os
+import sqlite3
+import threading
+import time
 from dataclasses import dataclass, field
-from typing import Any
+from pathlib import Path
 
+from config.settings import settings
+from models.jobs import JobInfo
+from models.results import RunInfo
+from models.scheduler import PendingRun
 from models.tests import TestInfo
+from models.trends import RunSummary
+from utils.test_ids import id_prefix
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    test_id TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL,
+    status TEXT NOT NULL,
+    container_id TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tests_prefix_status ON tests (prefix, status);
+CREATE INDEX IF NOT EXISTS tests_status_start_time ON tests (status, start_time);
+CREATE INDEX IF NOT EXISTS tests_container_id ON tests (container_id);
+
+CREATE TABLE IF NOT EXISTS ports (
+    engine TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    reserved_at REAL NOT NULL,
+    PRIMARY KEY (engine, port)
+);
+CREATE INDEX IF NOT EXISTS ports_owner ON ports (owner);
+
+CREATE TABLE IF NOT EXISTS runs (
+    test_id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_project_scenario_started_at ON runs (project, scenario, started_at);
+CREATE INDEX IF NOT EXISTS runs_status_started_at ON runs (status, started_at);
+
+CREATE TABLE IF NOT EXISTS run_summaries (
+    test_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    project TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (test_id, type, name)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT NOT NULL,  -- process that saved the job last, see `utils.jobs.process_token`
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status);
+CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at);
+
+-- FIFO in rowid order
+CREATE TABLE IF NOT EXISTS pending_runs (
+    job_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+-- runs whose summaries were computed, also those without any (no metrics), so they are not retried
+CREATE TABLE IF NOT EXISTS summarized_runs (
+    test_id TEXT PRIMARY KEY,
+    summaries INTEGER NOT NULL
+);
+"""
 
 
 @dataclass
 class Database:
-    _tests: list[TestInfo] = field(default_factory=list)
+    """Tests, port reservations, start/stop jobs, the scheduler queue, the results catalog and run summaries in
+    SQLite (WAL), shared by all gunicorn workers and kept across restarts."""
+
+    path: str
+    _local: threading.local = field(default_factory=threading.local)
+    _init_lock: threading.Lock = field(default_factory=threading.Lock)
+    _initialized: bool = False
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # a connection must not be used across fork (gunicorn `preload_app`)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # autocommit, multi-statement writes open their own transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_tests(self) -> list[TestInfo]:
+        rows = self.connection().execute("SELECT data FROM tests ORDER BY rowid").fetchall()
+        return [TestInfo.model_validate_json(data) for (data,) in rows]
+
+    def has_tests(self) -> bool:
+        return self.connection().execute("SELECT 1 FROM tests LIMIT 1").fetchone() is not None
+
+    def get_test(self, test_id: str) -> TestInfo | None:
+        row = self.connection().execute("SELECT data FROM tests WHERE test_id = ?", (test_id,)).fetchone()
+        return TestInfo.model_validate_json(row[0]) if row else None
+
+    def get_test_by_container(self, container_id: str) -> TestInfo | None:
+        row = self.connection().execute("SELECT data FROM tests WHERE container_id = ?", (container_id,)).fetchone()
+        return TestInfo.model_validate_json(row[0]) if row else None
+
+    def find_unfinished(self, prefix: str) -> TestInfo | None:
+        """A test of `{project}__{scenario}` that is not completed yet."""
+        query = "SELECT data FROM tests WHERE prefix = ? AND status != 'completed' LIMIT 1"
+        row = self.connection().execute(query, (prefix,)).fetchone()
+        return TestInfo.model_validate_json(row[0]) if row else None
+
+    def add_test(self, test: TestInfo) -> None:
+        self.update_test(test)
+
+    def update_test(self, test: TestInfo) -> None:
+        self.connection().execute(
+            "INSERT INTO tests (test_id, prefix, status, container_id, start_time, data) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (test_id) DO UPDATE SET prefix = excluded.prefix, status = excluded.status, "
+            "container_id = excluded.container_id, data = excluded.data",
+            (
+                test.test_id,
+                id_prefix(test.test_id),
+                test.status,
+                test.container_id,
+                test.start_time,
+                test.model_dump_json(),
+            ),
+        )
+
+    def remove_test(self, test_id: str) -> bool:
+        return self.connection().execute("DELETE FROM tests WHERE test_id = ?", (test_id,)).rowcount > 0
+
+    def remove_all_tests(self) -> int:
+        return self.connection().execute("DELETE FROM tests").rowcount
+
+    def remove_finished_before(self, statuses: list[str], start_time: str) -> list[str]:
+        """Remove tests in one of `statuses` started before `start_time` (isoformat), return their ids."""
+        placeholders = ", ".join("?" * len(statuses))
+        query = f"DELETE FROM tests WHERE status IN ({placeholders}) AND start_time < ? RETURNING test_id"
+        rows = self.connection().execute(query, (*statuses, start_time)).fetchall()
+        return [test_id for (test_id,) in rows]
+
+    def reserve_port(self, engine: str, candidates: list[int], owner: str) -> int | None:
+        """Atomically reserve the first of `candidates` not reserved on the engine."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            reserved = {port for (port,) in conn.execute("SELECT port FROM ports WHERE engine = ?", (engine,))}
+            port = next((port for port in candidates if port not in reserved), None)
+            if port is not None:
+                conn.execute(
+                    "INSERT INTO ports (engine, port, owner, reserved_at) VALUES (?, ?, ?, ?)",
+                    (engine, port, owner, time.time()),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return port
+
+    def get_ports(self, engine: str) -> dict[int, str]:
+        rows = self.connection().execute("SELECT port, owner FROM ports WHERE engine = ?", (engine,))
+        return dict(rows.fetchall())
+
+    def get_stale_ports(self, engine: str, reserved_before: float) -> dict[int, str]:
+        rows = self.connection().execute(
+            "SELECT port, owner FROM ports WHERE engine = ? AND reserved_at < ?", (engine, reserved_before)
+        )
+        return dict(rows.fetchall())
+
+    def release_ports(self, owner: str) -> list[tuple[str, int]]:
+        rows = self.connection().execute("DELETE FROM ports WHERE owner = ? RETURNING engine, port", (owner,))
+        return rows.fetchall()
+
+    def release_port(self, engine: str, port: int) -> None:
+        self.connection().execute("DELETE FROM ports WHERE engine = ? AND port = ?", (engine, port))
+
+    def transfer_ports(self, owner: str, new_owner: str) -> None:
+        self.connection().execute("UPDATE ports SET owner = ? WHERE owner = ?", (new_owner, owner))
+
+    def add_job(self, job: JobInfo, owner: str) -> JobInfo | None:
+        """Store a new job unless an unfinished one has the same key, that one is returned then."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE key = ? AND status NOT IN ('done', 'failed') LIMIT 1", (job.key,)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (job_id, key, status, owner, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job.job_id, job.key, job.status, owner, job.created_at, job.model_dump_json()),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return JobInfo.model_validate_json(row[0]) if row else None
+
+    def update_job(self, job: JobInfo, owner: str) -> None:
+        self.connection().execute(
+            "UPDATE jobs SET status = ?, owner = ?, data = ? WHERE job_id = ?",
+            (job.status, owner, job.model_dump_json(), job.job_id),
+        )
+
+    def get_job(self, job_id: str) -> tuple[JobInfo, str] | None:
+        row = self.connection().execute("SELECT data, owner FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return (JobInfo.model_validate_json(row[0]), row[1]) if row else None
+
+    def get_unfinished_jobs(self, key: str) -> list[tuple[JobInfo, str]]:
+        rows = self.connection().execute(
+            "SELECT data, owner FROM jobs WHERE key = ? AND status NOT IN ('done', 'failed')", (key,)
+        )
+        return [(JobInfo.model_validate_json(data), owner) for data, owner in rows.fetchall()]
+
+    def remove_finished_jobs(self, keep: int) -> int:
+        """Remove the oldest finished jobs until at most `keep` jobs are left, unfinished ones are never removed."""
+        conn = self.connection()
+        (total,) = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        if total <= keep:
+            return 0
+        return conn.execute(
+            "DELETE FROM jobs WHERE job_id IN "
+            "(SELECT job_id FROM jobs WHERE status IN ('done', 'failed') ORDER BY created_at LIMIT ?)",
+            (total - keep,),
+        ).rowcount
+
+    def add_pending_run(self, run: PendingRun) -> None:
+        self.connection().execute(
+            "INSERT INTO pending_runs (job_id, data) VALUES (?, ?)", (run.job_id, run.model_dump_json())
+        )
+
+    def get_pending_runs(self) -> list[PendingRun]:
+        rows = self.connection().execute("SELECT data FROM pending_runs ORDER BY rowid").fetchall()
+        return [PendingRun.model_validate_json(data) for (data,) in rows]
+
+    def remove_pending_run(self, job_id: str) -> bool:
+        """Whether the run was still queued: only one process gets `True` and dispatches it."""
+        return self.connection().execute("DELETE FROM pending_runs WHERE job_id = ?", (job_id,)).rowcount > 0
+
+    def upsert_run(self, run: RunInfo) -> None:
+        self.connection().execute(
+            "INSERT INTO runs (test_id, project, scenario, status, started_at, data) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (test_id) DO UPDATE SET status = excluded.status, data = excluded.data",
+            (run.test_id, run.project, run.scenario, run.status, run.started_at, run.model_dump_json()),
+        )
+
+    def remove_run(self, test_id: str) -> bool:
+        self.connection().execute("DELETE FROM run_summaries WHERE test_id = ?", (test_id,))
+        self.connection().execute("DELETE FROM summarized_runs WHERE test_id = ?", (test_id,))
+        return self.connection().execute("DELETE FROM runs WHERE test_id = ?", (test_id,)).rowcount > 0
+
+    def get_run(self, test_id: str) -> RunInfo | None:
+        row = self.connection().execute("SELECT data FROM runs WHERE test_id = ?", (test_id,)).fetchone()
+        return RunInfo.model_validate_json(row[0]) if row else None
+
+    def get_run_ids(self) -> set[str]:
+        return {test_id for (test_id,) in self.connection().execute("SELECT test_id FROM runs")}
 
-    def get(self, attr: str) -> Any:
-        if hasattr(self, attr):
-            return getattr(self, attr)
-        raise AttributeError(f"Attribute '{attr}' not found")
+    def has_runs(self) -> bool:
+        return self.connection().execute("SELECT 1 FROM runs LIMIT 1").fetchone() is not None
 
-    def set(self, attr: str, value: Any) -> bool:
-        if hasattr(self, attr):
-            setattr(self, attr, value)
-            return True
-        return False
+    def query_runs(
+        self,
+        project: str | None = None,
+        scenario: str | None = None,
+        status: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> tuple[list[RunInfo], int]:
+        """Runs matching the filters, newest first, and the total number of matches."""
+        conditions, params = [], []
+        for column, value in (("project", project), ("scenario", scenario), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("started_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    def get_tests(self):
-        return self._tests
+        conn = self.connection()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM runs {where}", params).fetchone()
+        rows = conn.execute(
+            f"SELECT data FROM runs {where} ORDER BY started_at DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+        ).fetchall()
+        return [RunInfo.model_validate_json(data) for (data,) in rows], total
 
-    def add_test(self, test: TestInfo) -> tuple[bool, list[TestInfo]]:
-        self._tests.append(test)
-        return True, self._tests
+    def replace_run_summaries(self, test_id: str, summaries: list[RunSummary]) -> None:
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM run_summaries WHERE test_id = ?", (test_id,))
+            conn.executemany(
+                "INSERT INTO run_summaries (test_id, type, name, project, scenario, started_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (s.test_id, s.type, s.name, s.project, s.scenario, s.started_at, s.model_dump_json())
+                    for s in summaries
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO summarized_runs (test_id, summaries) VALUES (?, ?)", (test_id, len(summaries))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
-    def remove_test(self, test_id: str) -> tuple[bool, list[TestInfo]]:
-        for i, test in enumerate(self._tests):
-            if test.test_id == test_id:
-                self._tests.pop(i)
-                return True, self._tests
-        return False, self._tests
+    def get_run_summaries(
+        self, project: str, scenario: str, name: str | None = None, limit: int = 100
+    ) -> list[RunSummary]:
+        """Summaries of the last `limit` finished runs of a scenario, oldest first."""
+        query = (
+            "SELECT data FROM run_summaries WHERE test_id IN ("
+            "SELECT test_id FROM runs WHERE project = ? AND scenario = ? AND status != 'running' "
+            "ORDER BY started_at DESC LIMIT ?)"
+        )
+        params: list[str | int] = [project, scenario, limit]
+        if name is not None:
+            query += " AND name = ?"
+            params.append(name)
+        rows = self.connection().execute(f"{query} ORDER BY started_at, type, name", params).fetchall()
+        return [RunSummary.model_validate_json(data) for (data,) in rows]
 
-    def remove_all_tests(self) -> bool:
-        self._tests.clear()
-        return True
+    def get_unsummarized_runs(self, project: str, scenario: str, limit: int = 100) -> list[str]:
+        """Ids among the last `limit` finished runs of a scenario that were never summarized."""
+        query = (
+            "SELECT test_id FROM (SELECT test_id FROM runs WHERE project = ? AND scenario = ? AND status != 'running' "
+            "ORDER BY started_at DESC LIMIT ?) AS last "
+            "WHERE NOT EXISTS (SELECT 1 FROM summarized_runs WHERE summarized_runs.test_id = last.test_id) "
+            "AND NOT EXISTS (SELECT 1 FROM run_summaries WHERE run_summaries.test_id = last.test_id)"
+        )
+        return [test_id for (test_id,) in self.connection().execute(query, (project, scenario, limit))]
 
 
-database = Database()
+database = Database(path=settings.db_path)
@@ -2,7 +2,8 @@ import multiprocessing
 import os
 
 bind = "0.0.0.0:3000"
-worker_class = "sync"
+worker_class = "gthread"  # live stats streams hold a thread each, not a whole worker
+threads = 32
 timeout = 120
 max_requests = 1000
 max_requests_jitter = 100
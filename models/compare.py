@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field, field_validator
+
+
+class CompareQuery(BaseModel):
+    ids: list[str] = Field(min_length=2, max_length=10)  # the first run is the baseline
+    alpha: float = Field(default=0.05, gt=0, lt=1)  # significance level
+    min_change: float = Field(default=0.05, ge=0)  # relative change below which nothing is flagged
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_ids(cls, value: str | list[str]) -> list[str]:
+        if isinstance(value, str):
+            return [test_id.strip() for test_id in value.split(",") if test_id.strip()]
+        return value
+
+
+class MetricDelta(BaseModel):
+    baseline: float | None
+    value: float | None
+    delta: float | None
+    delta_pct: float | None  # relative to the baseline
+    p_value: float | None
+    change: str | None = None  # regression, improvement
+
+
+class EndpointDiff(BaseModel):
+    type: str
+    name: str
+    metrics: dict[str, MetricDelta]
+
+
+class RunDiff(BaseModel):
+    test_id: str
+    regressions: int
+    endpoints: list[EndpointDiff]
+
+
+class Comparison(BaseModel):
+    baseline: str
+    alpha: float
+    min_change: float
+    runs: list[RunDiff]
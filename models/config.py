@@ -1,10 +1,14 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field
 
 
 class Scenario(BaseModel):
     users: int = 1
     spawn_rate: int = 1
     run_time: str = "10s"
+    workers: int = Field(default=0, ge=0)
+    corrected_latency: bool = False  # also measure latencies corrected for coordinated omission
 
 
 class Stage(BaseModel):
@@ -15,12 +19,52 @@ class Stage(BaseModel):
 
 class CustomScenario(BaseModel):
     stages: list[Stage]
+    workers: int = Field(default=0, ge=0)
+    corrected_latency: bool = False
+
+
+class RpsStage(BaseModel):
+    duration: int = 10  # sec since the start when the stage ends, as in `Stage`
+    rps: float = 10
+
+
+class RpsScenario(BaseModel):
+    """Users are added or removed until the run holds the target requests per second of each stage."""
+
+    rps_stages: list[RpsStage]
+    max_users: int = 100  # the controller never goes above, a target out of reach is reported in the logs
+    initial_users: int = 1
+    spawn_rate: int = 10
+    workers: int = Field(default=0, ge=0)
+    corrected_latency: bool = False
+
+
+class ArrivalStage(BaseModel):
+    duration: int = 10  # sec since the start when the stage ends, as in `Stage`
+    rate: float = 10  # iterations started per second
+    arrivals: Literal["poisson", "constant"] = "poisson"  # random or evenly spaced
+
+
+class ArrivalScenario(BaseModel):
+    """Open model: iterations start on schedule whatever is in flight, at most `max_concurrency` at a time."""
+
+    arrival_stages: list[ArrivalStage]
+    max_concurrency: int = 100  # users running iterations, an arrival that finds none idle is dropped
+    spawn_rate: int = 100
+    workers: int = Field(default=0, ge=0)
+    corrected_latency: bool = False
+
+
+class RetentionPolicy(BaseModel):
+    keep_last: int | None = None  # runs per scenario never compacted or deleted, RETENTION_KEEP_LAST if empty
+    max_runs: int | None = None  # runs per scenario kept at all, RETENTION_MAX_RUNS if empty, 0 is unlimited
 
 
 class ProjectConfigs(BaseModel):
     name: str
     host: str = "localhost"
-    scenarios: dict[str, Scenario | CustomScenario]
+    scenarios: dict[str, Scenario | CustomScenario | RpsScenario | ArrivalScenario]
+    retention: RetentionPolicy | None = None
 
 
 class Config(BaseModel):
@@ -0,0 +1,22 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    kind: str
+    key: str
+    status: str  # pending, queued, running, done, failed
+    progress: str = ""
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: str
+    updated_at: str
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    status_url: str
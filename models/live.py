@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+
+
+class LiveEndpoint(BaseModel):
+    method: str | None
+    name: str
+    num_requests: int
+    num_failures: int
+    rps: float  # current
+    fail_per_sec: float  # current
+    avg_response_time: float | None
+    median_response_time: float | None
+    p95_response_time: float | None
+    p99_response_time: float | None
+
+
+class LiveSample(BaseModel):
+    """One poll of a Locust master's `/stats/requests` or one interval of a headless test's `stats_history.csv`."""
+
+    id: int  # event id, milliseconds, increasing
+    test_id: str
+    source: str  # web, history
+    time: float
+    state: str
+    user_count: int
+    rps: float
+    fail_per_sec: float
+    fail_ratio: float
+    percentiles: dict[str, float | None]  # current window, e.g. `50%`, `95%`
+    endpoints: list[LiveEndpoint]
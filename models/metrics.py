@@ -0,0 +1,153 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field, field_validator
+
+PERCENTILES = ["50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "99.9%", "99.99%", "100%"]
+RESOLUTIONS = [1, 10, 60, 600]  # seconds per history row: as written by Locust, then the rollups
+
+
+class EndpointStats(BaseModel):
+    """One row of Locust's `stats.csv`, the totals of the whole run."""
+
+    type: str
+    name: str
+    request_count: int
+    failure_count: int
+    median_response_time: float | None
+    average_response_time: float | None
+    min_response_time: float | None
+    max_response_time: float | None
+    average_content_size: float | None
+    rps: float
+    fps: float
+    percentiles: dict[str, float | None]
+
+
+class FailureInfo(BaseModel):
+    method: str
+    name: str
+    error: str
+    occurrences: int
+
+
+class ExceptionInfo(BaseModel):
+    count: int
+    message: str
+    traceback: str
+    nodes: str
+
+
+class ArrivalStats(BaseModel):
+    """Totals of `arrivals.csv` of an arrival scenario, written by `tests/arrivals.py`."""
+
+    scheduled: int
+    started: int
+    late: int  # started over 100 ms after their scheduled time
+    dropped: int  # no idle user within the concurrency cap
+
+
+class EndpointRef(BaseModel):
+    type: str
+    name: str
+    start: int  # rows of the endpoint in the history columns are start..end
+    end: int
+
+
+class SeriesMeta(BaseModel):
+    resolution: int  # seconds per row
+    rows: int
+    endpoints: list[EndpointRef]
+    sketch_size: int = 0  # histogram entries of the rows, rollups only
+    corrected_sketch_size: int = 0
+
+
+class RunMetricsMeta(BaseModel):
+    """`meta.json` of an ingested run, the history itself is in one binary file per column and resolution."""
+
+    version: int
+    source: list[tuple[str, int, int]]  # (file, size, mtime_ns) of the ingested CSVs
+    columns: dict[str, str]  # column -> `array` typecode
+    series: list[SeriesMeta]
+    recorded: bool = False  # rollups are from the histograms of `tests/histograms.py`, not from percentiles
+    corrected: bool = False  # rollups also have latencies corrected for coordinated omission
+    stats: list[EndpointStats]
+    failures: list[FailureInfo]
+    exceptions: list[ExceptionInfo]
+    arrivals: ArrivalStats | None = None
+
+
+class MetricsQuery(BaseModel):
+    name: str | None = None  # endpoint name, all endpoints if empty
+    since: float | None = None  # unix time or ISO datetime, inclusive
+    until: float | None = None  # unix time or ISO datetime, inclusive
+    resolution: int | None = None  # seconds per row, the finest one with at most 1000 rows per endpoint if empty
+
+    @field_validator("resolution")
+    @classmethod
+    def check_resolution(cls, value: int | None) -> int | None:
+        if value is not None and value not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {RESOLUTIONS}")
+        return value
+
+    @field_validator("since", "until", mode="before")
+    @classmethod
+    def parse_time(cls, value: str | float | None) -> float | None:
+        if value in (None, ""):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
+
+
+class WindowSummary(BaseModel):
+    requests: int
+    failures: int
+    rps: float
+    error_rate: float
+    percentiles: dict[str, float | None]  # of the merged histograms of the intervals
+    max_percentiles: dict[str, float | None]  # worst interval
+    corrected_percentiles: dict[str, float | None] | None = None  # corrected for coordinated omission
+
+
+class EndpointSeries(BaseModel):
+    type: str
+    name: str
+    timestamps: list[int]
+    columns: dict[str, list[float | None]]
+    summary: WindowSummary
+
+
+class RunMetrics(BaseModel):
+    test_id: str
+    since: float | None
+    until: float | None
+    resolution: int
+    recorded: bool
+    corrected: bool
+    endpoints: list[EndpointSeries]
+    stats: list[EndpointStats]
+    failures: list[FailureInfo]
+    exceptions: list[ExceptionInfo]
+    arrivals: ArrivalStats | None = None
+
+
+class PercentilesQuery(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=100)
+    names: list[str] = ["Aggregated"]  # endpoints merged, of any request type
+
+    @field_validator("ids", "names", mode="before")
+    @classmethod
+    def split(cls, value: str | list[str]) -> list[str]:
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+
+class MergedPercentiles(BaseModel):
+    test_ids: list[str]
+    names: list[str]
+    requests: int
+    recorded: bool  # all runs have recorded histograms, else partly estimated from Locust's percentiles
+    percentiles: dict[str, float | None]
+    corrected_percentiles: dict[str, float | None] | None  # if all runs measured corrected latencies
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class RunInfo(BaseModel):
+    test_id: str
+    project: str
+    scenario: str
+    status: str  # running, completed (has report.html), incomplete
+    started_at: str
+    finished_at: str | None = None  # mtime of the newest result file
+    files: list[str] = []
+    size: int = 0  # bytes
+    pinned: bool = False  # baseline, never compacted or deleted by the retention
+    compacted: bool = False  # history downsampled by the retention
+
+
+class RunsQuery(BaseModel):
+    project: str | None = None
+    scenario: str | None = None
+    status: str | None = None
+    since: str | None = None  # ISO date/datetime, inclusive
+    until: str | None = None  # ISO date/datetime, exclusive
+    limit: int = Field(default=50, ge=1, le=500)
+    offset: int = Field(default=0, ge=0)
+
+    @field_validator("since", "until")
+    @classmethod
+    def normalize_date(cls, value: str | None) -> str | None:
+        return datetime.fromisoformat(value).isoformat() if value else None
+
+
+class RunsPage(BaseModel):
+    items: list[RunInfo]
+    total: int
+    limit: int
+    offset: int
@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+
+
+class DiskUsage(BaseModel):
+    """Bytes under `{TMP_PATH}` that the retention accounts for."""
+
+    results: int = 0
+    archives: int = 0
+    compressed: int = 0
+    metrics: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.results + self.archives + self.compressed + self.metrics
+
+
+class RetentionReport(BaseModel):
+    started_at: str
+    finished_at: str
+    used_before: int  # bytes
+    used_after: int
+    stale_archives: int
+    compacted: list[str]
+    deleted: list[str]
+
+
+class RetentionStatus(BaseModel):
+    max_size: int  # bytes, 0 is unlimited
+    interval: int  # sec, 0 is disabled
+    keep_last: int
+    max_runs: int
+    running: bool
+    usage: DiskUsage
+    total: int
+    last_report: RetentionReport | None
@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+
+from models.tests import StartTestRequest
+
+
+class Allocation(BaseModel):
+    owner: str  # job_id until the test is started, then test_id
+    engine: str  # Docker engine base url, all containers of a test run on the same engine
+    cpus: list[int]  # one core per container, the first one is the master's
+    mem_limit: str  # per container
+
+
+class PendingRun(BaseModel):
+    """A start waiting for capacity, stored so that any process dispatches it."""
+
+    job_id: str
+    key: str
+    containers: int
+    request: StartTestRequest
+    enqueued_at: str
+
+
+class PendingRunInfo(BaseModel):
+    job_id: str
+    key: str
+    position: int
+    containers: int
+    enqueued_at: str
+
+
+class CapacityInfo(BaseModel):
+    engine: str
+    weight: float
+    cpus_total: int
+    cpus_reserved: int
+    cpus_free: int
+    mem_total: int
+    mem_free: int
+    mem_limit: str
+
+
+class QueueInfo(BaseModel):
+    engines: list[CapacityInfo]
+    running: list[Allocation]
+    pending: list[PendingRunInfo]
@@ -19,6 +19,12 @@ class TestInfo(BaseModel):
     container_id: str
     container_status: str
     start_time: str
+    web_port: int | None = None
+    worker_ids: list[str] = []
+    network_id: str | None = None
+    pool_slot: str | None = None
+    engine: str | None = None  # Docker engine base url
+    cpus: list[int] = []  # scheduler allocation, the master's core first
 
 
 class StartTestResponse(BaseModel):
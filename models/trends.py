@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+
+
+class RunSummary(BaseModel):
+    """One endpoint (or `Aggregated`) of a finished run, precomputed for trends."""
+
+    test_id: str
+    project: str
+    scenario: str
+    status: str
+    started_at: str
+    type: str
+    name: str
+    duration: int  # seconds of history
+    requests: int
+    failures: int
+    rps: float
+    max_rps: float  # highest RPS sustained over `SUSTAINED_WINDOW` seconds
+    error_rate: float
+    p50: float | None
+    p95: float | None
+    p99: float | None
+
+
+class TrendsQuery(BaseModel):
+    project: str
+    scenario: str
+    name: str | None = None  # endpoint name, e.g. `Aggregated`, all endpoints if empty
+    limit: int = Field(default=100, ge=1, le=500)  # last N finished runs
+
+
+class TrendSeries(BaseModel):
+    type: str
+    name: str
+    points: list[RunSummary]  # oldest run first
+
+
+class Trend(BaseModel):
+    project: str
+    scenario: str
+    runs: int
+    endpoints: list[TrendSeries]
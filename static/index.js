@@ -41,7 +41,15 @@ projectSelect.addEventListener('change', async () => {
             for (const [scenarioId, scenario] of Object.entries(project.scenarios)) {
                 const option = document.createElement('option');
                 option.value = scenarioId;
-                option.textContent = scenarioId !== 'custom' ? `${scenarioId} (${scenario.users} users, ${scenario.run_time})` : `${scenarioId} (stages in config.json)`;
+                if (scenario.arrival_stages) {
+                    const rates = scenario.arrival_stages.map(stage => stage.rate).join(' → ');
+                    option.textContent = `${scenarioId} (${rates} arrivals/s, up to ${scenario.max_concurrency} users)`;
+                } else if (scenario.rps_stages) {
+                    const targets = scenario.rps_stages.map(stage => stage.rps).join(' → ');
+                    option.textContent = `${scenarioId} (${targets} RPS, up to ${scenario.max_users} users)`;
+                } else {
+                    option.textContent = !scenario.stages ? `${scenarioId} (${scenario.users} users, ${scenario.run_time})` : `${scenarioId} (stages in config.json)`;
+                }
                 scenarioSelect.appendChild(option);
             }
         }
@@ -70,12 +78,15 @@ testForm.addEventListener('submit', async (e) => {
         });
 
         if (response.ok) {
-            const result = await response.json();
-            console.log("[Form]-[/api/tests/start] Got result:", result)
-            if (result.status === "started") {
-                showNotifyMessage(`Test started ${result.test_id}!`, 'success');
-            } else if (result.status === "running") {
-                showNotifyMessage(`Test is running ${result.test_id}!`, 'success');
+            const job = await response.json();
+            console.log("[Form]-[/api/tests/start] Got job:", job)
+            const result = await waitForJob(job.status_url);
+            if (result.status === "failed") {
+                showNotifyMessage(`Error: ${result.error}`, 'error');
+            } else if (result.result.status === "started") {
+                showNotifyMessage(`Test started ${result.result.test_id}!`, 'success');
+            } else if (result.result.status === "running") {
+                showNotifyMessage(`Test is running ${result.result.test_id}!`, 'success');
             }
         } else {
             showNotifyMessage(`Error: ${response.status}!`, 'error');
@@ -186,6 +197,7 @@ async function loadActiveTests() {
                             <p>In web: ${test.in_web ? 'Yes' : 'No'}</p>
                             <p>Status: ${test.status}</p>
                             <p>Started: ${formatDateTime(test.start_time)}</p>
+                            ${test.status === "running" ? `<p id="live-${test.test_id}" class="live-stats">${formatLiveSample(liveSamples[test.test_id])}</p>` : ''}
                             ${test.status !== "completed" ? `
                             ${test.in_web ? `<a href="${test.web_url}" target="_blank" class="link">📊 Open panel</a> 
                                              <a href="${test.web_url}/stats/report" target="_blank" class="link">📋 Open report</a>` : ''}` :
@@ -204,6 +216,34 @@ async function loadActiveTests() {
     }
 }
 
+// Live stats of running tests, one stream for the whole page
+const liveSamples = {};
+
+function formatLiveSample(sample) {
+    if (!sample) {
+        return 'Live: waiting for stats...';
+    }
+    const percentile = (p) => sample.percentiles[p] != null ? `${Math.round(sample.percentiles[p])} ms` : '—';
+    return `Live: ${sample.user_count} users | ${sample.rps.toFixed(1)} RPS | ${sample.fail_per_sec.toFixed(1)} failures/s | p50 ${percentile('50%')} | p95 ${percentile('95%')}`;
+}
+
+function watchLiveStats() {
+    const source = new EventSource('/api/tests/live');
+    source.addEventListener('sample', (event) => {
+        const sample = JSON.parse(event.data);
+        liveSamples[sample.test_id] = sample;
+        const element = document.getElementById(`live-${sample.test_id}`);
+        if (element) {
+            element.textContent = formatLiveSample(sample);
+        }
+    });
+    source.addEventListener('end', (event) => {
+        const { test_id } = JSON.parse(event.data);
+        delete liveSamples[test_id];
+        loadActiveTests();
+    });
+}
+
 async function reloadActiveTests() {
     const indicator = document.getElementById('active-refresh-indicator');
     indicator.style.display = 'inline';
@@ -216,27 +256,51 @@ async function reloadActiveTests() {
     }, 1000);
 }
 
+const COMPLETED_TESTS_LIMIT = 50;
+
+function formatBytes(size) {
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let i = 0;
+    while (size >= 1024 && i < units.length - 1) {
+        size /= 1024;
+        i++;
+    }
+    return `${size.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
+
 async function loadCompletedTests() {
     const completedTestsDiv = document.getElementById('completed-tests');
 
     try {
-        const response = await fetch('/api/tests/completed');
-        const tests = await response.json();
-        console.log("[loadCompletedTests]-[/api/tests/completed] Got result:", tests);
+        const response = await fetch(`/api/results?limit=${COMPLETED_TESTS_LIMIT}`);
+        const page = await response.json();
+        console.log("[loadCompletedTests]-[/api/results] Got result:", page);
 
         let html = '';
-        if (tests && tests.length > 0) {
-            for (const testId of tests) {
+        if (page.items && page.items.length > 0) {
+            for (const run of page.items) {
                 html += `
                 <div class="test-item">
                     <div class="section-header">
-                        <h3 style="margin: 0; font-size: 16px;">${testId}</h3>
+                        <h3 style="margin: 0; font-size: 16px;">${run.test_id}</h3>
+                        <div class="checkbox-group">
+                            <input type="checkbox" id="compare-${run.test_id}" class="compare-select" value="${run.test_id}" />
+                            <label for="compare-${run.test_id}" class="checkbox-label">Compare</label>
+                        </div>
                     </div>
-                    <a href="/api/results/${testId}/report" target="_blank" class="link">📋 Open report</a>
-                    <a href="/api/results/${testId}/download-zip" target="_blank" class="link">🗃️ Download results archive</a>
+                    <p>Status: ${run.status}${run.compacted ? ' (compacted)' : ''} | Started: ${run.started_at} | Size: ${formatBytes(run.size)}</p>
+                    <a href="#" onclick="pinTest('${run.test_id}', ${!run.pinned}); return false;" class="link">${run.pinned ? '📌 Unpin baseline' : '📍 Pin as baseline'}</a>
+                    <a href="/api/results/${run.test_id}/report" target="_blank" class="link">📋 Open report</a>
+                    <a href="/api/results/${run.test_id}/download-zip" target="_blank" class="link">🗃️ Download results archive</a>
+                    ${run.files.filter(name => name.endsWith('.csv')).map(name =>
+                        `<a href="/api/results/${run.test_id}/files/${name}?download=1" class="link">📄 ${name}</a>`
+                    ).join(' ')}
                 </div>
                 `;
             }
+            if (page.total > page.items.length) {
+                html += `<p>Showing the latest ${page.items.length} of ${page.total} tests</p>`;
+            }
         } else {
             html = '<p>Tests not found</p>';
         }
@@ -246,6 +310,20 @@ async function loadCompletedTests() {
     }
 }
 
+async function pinTest(testId, pinned) {
+    try {
+        const response = await fetch(`/api/results/${testId}/pin`, { method: pinned ? 'POST' : 'DELETE' });
+        if (response.ok) {
+            showNotifyMessage(pinned ? `Test ${testId} pinned` : `Test ${testId} unpinned`, 'success');
+            loadCompletedTests();
+        } else {
+            showNotifyMessage(`Error: ${response.status}!`, 'error');
+        }
+    } catch (error) {
+        showNotifyMessage(`Error: ${error.message}`, 'error');
+    }
+}
+
 async function reloadCompletedTests() {
     const indicator = document.getElementById('completed-refresh-indicator');
     indicator.style.display = 'inline';
@@ -258,6 +336,121 @@ async function reloadCompletedTests() {
     }, 1000);
 }
 
+// Comparison
+const COMPARED_METRICS = { rps: 'RPS', p50: 'p50, ms', p95: 'p95, ms', p99: 'p99, ms', error_rate: 'Errors' };
+
+function formatMetric(metric, value) {
+    if (value === null) {
+        return '—';
+    }
+    return metric === 'error_rate' ? `${(value * 100).toFixed(2)}%` : value.toFixed(metric === 'rps' ? 2 : 0);
+}
+
+function formatDelta(delta) {
+    if (delta.delta === null) {
+        return '';
+    }
+    if (delta.delta_pct === null) {
+        return delta.delta ? '(new)' : '';
+    }
+    return `(${delta.delta_pct >= 0 ? '+' : ''}${(delta.delta_pct * 100).toFixed(1)}%)`;
+}
+
+async function compareSelectedTests() {
+    // the oldest selected test is the baseline
+    const testIds = [...document.querySelectorAll('.compare-select:checked')]
+        .map(input => input.value)
+        .sort((a, b) => a.split('-').pop().localeCompare(b.split('-').pop()));
+    if (testIds.length < 2) {
+        showNotifyMessage('Select at least two tests to compare', 'error');
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/results/compare?ids=${testIds.map(encodeURIComponent).join(',')}`);
+        const comparison = await response.json();
+        console.log("[compareSelectedTests]-[/api/results/compare] Got result:", comparison);
+        if (!response.ok) {
+            showNotifyMessage(`Error: ${comparison.message}`, 'error');
+            return;
+        }
+
+        let html = '';
+        for (const run of comparison.runs) {
+            html += `
+            <div class="test-item">
+                <h3 style="margin: 0; font-size: 16px;">${run.test_id}</h3>
+                <p>Baseline: ${comparison.baseline} | Regressions: ${run.regressions}</p>
+                <table class="compare-table">
+                    <tr><th>Endpoint</th>${Object.values(COMPARED_METRICS).map(title => `<th>${title}</th>`).join('')}</tr>
+                    ${run.endpoints.map(endpoint => `
+                    <tr>
+                        <td>${endpoint.type} ${endpoint.name}</td>
+                        ${Object.keys(COMPARED_METRICS).map(metric => {
+                            const delta = endpoint.metrics[metric];
+                            const title = `Baseline: ${formatMetric(metric, delta.baseline)}, p-value: ${delta.p_value === null ? '—' : delta.p_value.toPrecision(2)}`;
+                            return `<td class="${delta.change || ''}" title="${title}">${formatMetric(metric, delta.value)} ${formatDelta(delta)}</td>`;
+                        }).join('')}
+                    </tr>`).join('')}
+                </table>
+            </div>
+            `;
+        }
+        document.getElementById('comparison').innerHTML = html;
+        document.getElementById('comparison-section').style.display = 'block';
+    } catch (error) {
+        showNotifyMessage(`Comparison error: ${error.message}`, 'error');
+    }
+}
+
+function closeComparison() {
+    document.getElementById('comparison-section').style.display = 'none';
+}
+
+// Trends
+const TREND_LIMIT = 100;
+
+async function loadTrend() {
+    const trendDiv = document.getElementById('trend');
+    const project = projectSelect.value;
+    const scenario = scenarioSelect.value;
+
+    try {
+        const params = new URLSearchParams({ project, scenario, name: 'Aggregated', limit: TREND_LIMIT });
+        const response = await fetch(`/api/results/trends?${params}`);
+        const trend = await response.json();
+        console.log("[loadTrend]-[/api/results/trends] Got result:", trend);
+        if (!response.ok) {
+            trendDiv.innerHTML = `<p>Loading error: ${trend.message}</p>`;
+            return;
+        }
+
+        const points = trend.endpoints.length ? [...trend.endpoints[0].points].reverse() : [];
+        if (!points.length) {
+            trendDiv.innerHTML = `<p>No finished runs of ${project}, ${scenario}</p>`;
+            return;
+        }
+        trendDiv.innerHTML = `
+            <p>${project}, ${scenario}: last ${trend.runs} runs, all requests (Aggregated)</p>
+            <table class="compare-table">
+                <tr><th>Test</th><th>Duration, s</th><th>RPS</th><th>Max RPS</th><th>p95, ms</th><th>p99, ms</th><th>Errors</th></tr>
+                ${points.map(point => `
+                <tr>
+                    <td><a href="/api/results/${point.test_id}/report" target="_blank" class="link">${point.test_id}</a></td>
+                    <td>${point.duration}</td>
+                    <td>${formatMetric('rps', point.rps)}</td>
+                    <td>${formatMetric('rps', point.max_rps)}</td>
+                    <td>${formatMetric('p95', point.p95)}</td>
+                    <td>${formatMetric('p99', point.p99)}</td>
+                    <td>${formatMetric('error_rate', point.error_rate)}</td>
+                </tr>`).join('')}
+            </table>
+        `;
+    } catch (error) {
+        trendDiv.innerHTML = `<p>Loading error: ${error.message}</p>`;
+    }
+}
+
 async function stopTest(testId) {
     try {
         const response = await fetch(`/api/tests/stop/${testId}`, {
@@ -265,8 +458,15 @@ async function stopTest(testId) {
         });
 
         if (response.ok) {
+            showNotifyMessage(`Stopping test ${testId}...`, 'info');
+            const job = await response.json();
+            const result = await waitForJob(job.status_url);
             loadActiveTests();
-            showNotifyMessage(`Test ${testId} stopped`, 'success');
+            if (result.status === "failed") {
+                showNotifyMessage(`Error: ${result.error}`, 'error');
+            } else {
+                showNotifyMessage(`Test ${testId} stopped`, 'success');
+            }
         } else {
             alert('Error stopping test');
         }
@@ -313,6 +513,21 @@ async function cleanupDocker() {
     }
 }
 
+// Jobs
+async function waitForJob(statusUrl, interval = 1000) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+        if (!response.ok) {
+            return { status: "failed", error: job.message };
+        }
+        if (job.status === "done" || job.status === "failed") {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 // Utils
 function formatDateTime(dateString) {
     const date = new Date(dateString);
@@ -333,6 +548,7 @@ function formatDateTime(dateString) {
 
 // First load
 loadProjectsList();
+watchLiveStats();
 
 setTimeout(async () => {
     await loadActiveTests();
@@ -0,0 +1,197 @@
+"""
+Open-model load of LocustSwarm's arrival scenarios (`arrival_stages` in `config.json`).
+
+Locust's users are a closed model: a user sends its next request once the previous one is answered, so a slow target
+gets less load. Here iterations arrive on a schedule, Poisson or evenly spaced at each stage's rate, whatever is in
+flight. The generated shape keeps `max_concurrency` users; their `wait_time` blocks until the next arrival, then the
+user runs one task. An arrival that finds no idle user is dropped, one picked up over `LATE_AFTER` after its time is
+late: the concurrency cap or the load generator itself could not keep up.
+
+Counts per 10 seconds of scheduled time go to `{csv prefix}_arrivals.csv` next to the CSVs, totals to the log.
+"""
+
+import csv
+import random
+import time
+from logging import getLogger
+
+import gevent
+from gevent.queue import Queue
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+logger = getLogger("arrivals")
+
+INTERVAL = 10  # in sec
+FLUSH_DELAY = 10  # in sec, an interval is kept for late worker reports (sent every 3 sec)
+LATE_AFTER = 0.1  # in sec after its scheduled time
+ARRIVALS_FILE = "arrivals.csv"
+HEADER = ["Timestamp", "Scheduled", "Started", "Late", "Dropped"]
+
+_config = None  # set by the generated shape
+_arrivals = Queue()  # scheduled times of arrivals handed to idle users
+_waiting = 0  # users waiting for an arrival
+# interval -> [scheduled, started, late, dropped]
+_counts: dict[int, list[int]] = {}
+_totals = [0, 0, 0, 0]
+_dispatcher = None
+_prefix = None
+
+
+def configure(config):
+    global _config
+    _config = config
+
+
+def tick(run_time):
+    """The shape's users: the concurrency cap until the last stage ends."""
+    if run_time >= _config["arrival_stages"][-1]["duration"]:
+        return None
+    return (_config["max_concurrency"], _config["spawn_rate"])
+
+
+def _count(scheduled, *counts):
+    interval = int(scheduled) - int(scheduled) % INTERVAL
+    row = _counts.setdefault(interval, [0, 0, 0, 0])
+    for i, count in enumerate(counts):
+        row[i] += count
+
+
+def _take_arrival():
+    global _waiting
+    _waiting += 1
+    try:
+        scheduled = _arrivals.get()
+    finally:
+        _waiting -= 1
+    _count(scheduled, 0, 1, int(time.time() - scheduled > LATE_AFTER))
+
+
+def _wait_time(user):
+    _take_arrival()
+    return 0
+
+
+def _after_start(on_start):
+    def wrapper(user):
+        on_start(user)
+        _take_arrival()  # the first task waits for an arrival as well
+
+    wrapper.takes_arrival = True
+    return wrapper
+
+
+def _dispatch(start):
+    """Hands out the arrivals of this process, its share of the stage rates."""
+    workers = max(1, _config["workers"])
+    stages = _config["arrival_stages"]
+    next_time = start
+    i = 0
+    while True:
+        while i < len(stages) and next_time - start >= stages[i]["duration"]:
+            i += 1
+        if i == len(stages):
+            return
+        stage = stages[i]
+        rate = stage["rate"] / workers
+        if rate <= 0:
+            next_time = start + stage["duration"]
+            continue
+
+        delay = next_time - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        if _waiting > _arrivals.qsize():
+            _arrivals.put(next_time)
+            _count(next_time, 1)
+        else:
+            _count(next_time, 1, 0, 0, 1)
+        next_time += random.expovariate(rate) if stage["arrivals"] == "poisson" else 1 / rate
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    global _prefix
+    if _config is None:
+        return
+    for user_class in environment.user_classes:
+        user_class.wait_time = _wait_time
+        if not getattr(user_class.on_start, "takes_arrival", False):  # a subclass of another user class
+            user_class.on_start = _after_start(user_class.on_start)
+
+    csv_prefix = getattr(environment.parsed_options, "csv_prefix", None)
+    if not isinstance(environment.runner, WorkerRunner) and csv_prefix:
+        _prefix = csv_prefix
+        gevent.spawn(_flush_loop)
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    global _dispatcher
+    if _config is None or isinstance(environment.runner, MasterRunner):
+        return  # a master has no users
+    if _dispatcher is not None:
+        _dispatcher.kill()
+    _dispatcher = gevent.spawn(_dispatch, time.time())
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.kill()
+        _dispatcher = None
+    while not _arrivals.empty():
+        _arrivals.get_nowait()
+
+
+@events.report_to_master.add_listener
+def on_report_to_master(client_id, data):
+    data["arrivals"] = [[interval, *counts] for interval, counts in _counts.items()]
+    _counts.clear()
+
+
+@events.worker_report.add_listener
+def on_worker_report(client_id, data):
+    for interval, *counts in data.get("arrivals", []):
+        _count(interval, *counts)
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    if _config is None or isinstance(environment.runner, WorkerRunner):
+        return
+    _flush(until=None)
+    scheduled, started, late, dropped = _totals
+    log = logger.warning if dropped or late else logger.info
+    log(f"Arrivals: {scheduled} scheduled, {started} started, {late} late, {dropped} dropped")
+
+
+def _flush_loop():
+    while True:
+        gevent.sleep(INTERVAL)
+        now = int(time.time())
+        _flush(until=now - now % INTERVAL - FLUSH_DELAY)
+
+
+def _flush(until):
+    """Append the intervals that started before `until` (all if `None`) and add them to the totals."""
+    intervals = sorted(interval for interval in _counts if until is None or interval < until)
+    rows = []
+    for interval in intervals:
+        counts = _counts.pop(interval)
+        for i, count in enumerate(counts):
+            _totals[i] += count
+        rows.append([interval, *counts])
+    if not rows or _prefix is None:
+        return
+
+    path = f"{_prefix}_{ARRIVALS_FILE}"
+    try:
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if f.tell() == 0:
+                writer.writerow(HEADER)
+            writer.writerows(rows)
+    except OSError as e:
+        logger.warning(f"Failed to write arrivals to {path}: {e}")
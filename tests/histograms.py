@@ -0,0 +1,163 @@
+"""
+Latency histograms of every request, per endpoint and 10 seconds, for LocustSwarm.
+
+Locust's CSVs only have percentiles, which can't be merged across workers, endpoints or time windows. LocustSwarm adds
+this file to `-f`, it then writes `{csv prefix}_histograms.bin` next to the CSVs: requests per log-spaced bucket of 1%
+relative accuracy, merged exactly by adding counts. The buckets must stay the same as in `utils/histogram.py`.
+
+With `CORRECTED_LATENCY=1` (`corrected_latency` of the scenario) latencies corrected for coordinated omission are
+written to `{csv prefix}_corrected_histograms.bin` as well. Every user is expected to send its requests at its usual
+pace; a request slower than that blocked the ones the user would have sent meanwhile, so each of them is counted too,
+with the time from its intended start to the end of the stall (as HdrHistogram's `recordValueWithExpectedInterval`).
+
+File: `LSH1`, then records of `<qHHH` (interval start, type length, name length, buckets), type and name in UTF-8,
+`<{n}h` bucket indexes and `<{n}I` their counts. An interval may have several records, their counts add up.
+"""
+
+import math
+import os
+import struct
+import time
+from logging import getLogger
+from weakref import WeakKeyDictionary
+
+import gevent
+from locust import events
+from locust.runners import WorkerRunner
+
+logger = getLogger("histograms")
+
+INTERVAL = 10  # in sec
+RELATIVE_ACCURACY = 0.01
+LOG_GAMMA = math.log((1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY))
+MIN_VALUE = 0.01  # in ms
+MAGIC = b"LSH1"
+FLUSH_DELAY = 10  # in sec, an interval is kept for late worker reports (sent every 3 sec)
+
+CORRECTED = os.getenv("CORRECTED_LATENCY") == "1"
+PACE_WEIGHT = 0.1  # of the latest request in a user's usual pace
+MAX_CORRECTIONS = 10000  # intended requests counted for one stall
+
+RAW_FILE = "histograms.bin"
+CORRECTED_FILE = "corrected_histograms.bin"
+
+# file -> (interval, type, name) -> {bucket: count}
+_histograms: dict[str, dict[tuple[int, str, str], dict[int, int]]] = {RAW_FILE: {}, CORRECTED_FILE: {}}
+# user greenlet -> [start of its last request, its usual pace in ms, whether the last request stalled]
+_users = WeakKeyDictionary()
+_prefix = None
+
+
+def _bucket(value):
+    return math.ceil(math.log(max(value, MIN_VALUE)) / LOG_GAMMA)
+
+
+def _record(file, key, value):
+    histogram = _histograms[file].setdefault(key, {})
+    bucket = _bucket(value)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+
+
+def _record_corrected(key, response_time, start_time):
+    user = _users.get(gevent.getcurrent())
+    if user is None:
+        user = _users[gevent.getcurrent()] = [None, None, False]
+    last_start, pace, stalled = user
+
+    _record(CORRECTED_FILE, key, response_time)
+    if pace:
+        stall = response_time - pace
+        for _ in range(MAX_CORRECTIONS):
+            if stall <= 0:
+                break
+            _record(CORRECTED_FILE, key, stall)
+            stall -= pace
+
+    # the pace is learnt from the time between the starts of the user's requests, stalls left out
+    if last_start is not None and not stalled:
+        gap = (start_time - last_start) * 1000
+        pace = gap if pace is None else pace + (gap - pace) * PACE_WEIGHT
+    user[:] = [start_time, pace, bool(pace) and response_time > pace]
+
+
+@events.request.add_listener
+def on_request(request_type, name, response_time, start_time=None, **kwargs):
+    now = time.time()
+    key = (int(now) - int(now) % INTERVAL, request_type, name)
+    response_time = response_time or 0
+    _record(RAW_FILE, key, response_time)
+    if CORRECTED:
+        _record_corrected(key, response_time, start_time or now - response_time / 1000)
+
+
+@events.report_to_master.add_listener
+def on_report_to_master(client_id, data):
+    data["histograms"] = {
+        file: [[*key, list(counts.items())] for key, counts in histograms.items()]
+        for file, histograms in _histograms.items()
+    }
+    for histograms in _histograms.values():
+        histograms.clear()
+
+
+@events.worker_report.add_listener
+def on_worker_report(client_id, data):
+    for file, records in data.get("histograms", {}).items():
+        for interval, request_type, name, counts in records:
+            histogram = _histograms[file].setdefault((interval, request_type, name), {})
+            for bucket, count in counts:
+                histogram[bucket] = histogram.get(bucket, 0) + count
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    global _prefix
+    csv_prefix = getattr(environment.parsed_options, "csv_prefix", None)
+    if isinstance(environment.runner, WorkerRunner) or not csv_prefix:
+        return
+    _prefix = csv_prefix
+    gevent.spawn(_flush_loop)
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    _flush(until=None)
+
+
+def _flush_loop():
+    while True:
+        gevent.sleep(INTERVAL)
+        now = int(time.time())
+        _flush(until=now - now % INTERVAL - FLUSH_DELAY)
+
+
+def _flush(until):
+    """Append the intervals that started before `until` (all if `None`)."""
+    if _prefix is None:
+        return
+    for file, histograms in _histograms.items():
+        keys = [key for key in histograms if until is None or key[0] < until]
+        if not keys:
+            continue
+
+        chunks = []
+        for key in sorted(keys):
+            interval, request_type, name = key
+            counts = histograms.pop(key)
+            type_bytes, name_bytes = str(request_type).encode(), str(name).encode()
+            buckets = sorted(counts)
+            chunks += [
+                struct.pack("<qHHH", interval, len(type_bytes), len(name_bytes), len(buckets)),
+                type_bytes,
+                name_bytes,
+                struct.pack(f"<{len(buckets)}h", *buckets),
+                struct.pack(f"<{len(buckets)}I", *(counts[b] for b in buckets)),
+            ]
+        path = f"{_prefix}_{file}"
+        try:
+            with open(path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(MAGIC)
+                f.write(b"".join(chunks))
+        except OSError as e:
+            logger.warning(f"Failed to write histograms to {path}: {e}")
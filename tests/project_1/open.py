@@ -0,0 +1,18 @@
+from logging import getLogger
+
+from locust import HttpUser, task
+
+
+class OpenUser(HttpUser):
+    logger = getLogger("OpenUser")
+    # no `wait_time`: the arrival scenario makes each user wait for the next scheduled arrival
+
+    def on_start(self):
+        self.logger.info(f"User start {self.__class__.__name__} test")
+
+    @task(1)
+    def info(self):
+        self.client.get("/")
+
+    def on_stop(self):
+        self.logger.info(f"User stop {self.__class__.__name__} test")
@@ -0,0 +1,18 @@
+from logging import getLogger
+
+from locust import HttpUser, between, task
+
+
+class TargetRpsUser(HttpUser):
+    logger = getLogger("TargetRpsUser")
+    wait_time = between(1, 5)  # the users are scaled to the measured RPS, whatever the wait
+
+    def on_start(self):
+        self.logger.info(f"User start {self.__class__.__name__} test")
+
+    @task(1)
+    def info(self):
+        self.client.get("/")
+
+    def on_stop(self):
+        self.logger.info(f"User stop {self.__class__.__name__} test")
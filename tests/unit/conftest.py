@@ -0,0 +1,18 @@
+"""
+Unit tests of LocustSwarm itself: `python -m pytest`.
+
+The app's modules read their settings and connect to Docker when imported, so the settings point at a temporary
+directory and the Docker client is replaced before any of them is imported. Locust is imported to run generated shapes
+only, without monkey-patching the already imported standard library.
+"""
+
+import os
+import tempfile
+from unittest import mock
+
+import docker
+
+os.environ["TMP_PATH"] = tempfile.mkdtemp(prefix="locust-swarm-tests-")
+os.environ["RETENTION_INTERVAL"] = "0"
+os.environ["LOCUST_SKIP_MONKEY_PATCH"] = "1"
+docker.DockerClient = mock.MagicMock
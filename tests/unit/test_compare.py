@@ -0,0 +1,41 @@
+import math
+from array import array
+
+import pytest
+
+from models.metrics import EndpointRef
+from utils.compare import _interval_values, _proportions_p_value, _rank_sum_p_value
+from utils.metrics import Series
+
+
+def test_rank_sum_of_separated_samples():
+    # U = 0, sigma = sqrt(3 * 3 / 12 * 7), z = -4.5 / sigma
+    assert _rank_sum_p_value([1, 2, 3], [4, 5, 6]) == pytest.approx(0.049535, abs=1e-6)
+    assert _rank_sum_p_value([4, 5, 6], [1, 2, 3]) == pytest.approx(0.049535, abs=1e-6)
+
+
+def test_rank_sum_with_ties():
+    # ranks of `a`: 1, 3, 3, 6 -> U = 13 - 10 = 3; two groups of 3 ties -> sigma = sqrt(16 / 12 * (9 - 48 / 56))
+    assert _rank_sum_p_value([1, 2, 2, 3], [2, 3, 3, 4]) == pytest.approx(0.129155, abs=1e-6)
+
+
+def test_rank_sum_of_equal_or_too_small_samples():
+    assert _rank_sum_p_value([5, 5], [5, 5]) == 1.0
+    assert _rank_sum_p_value([1], [2, 3]) is None
+
+
+def test_proportions():
+    # pooled 0.02, se = sqrt(0.02 * 0.98 * (1 / 1000 + 1 / 1000)), z = 0.02 / se
+    assert _proportions_p_value(10, 1000, 30, 1000) == pytest.approx(0.001401, abs=1e-6)
+    assert _proportions_p_value(0, 1000, 0, 1000) == 1.0
+    assert _proportions_p_value(1, 0, 1, 10) is None
+
+
+def test_interval_values_skip_rows_without_requests():
+    series = Series(
+        resolution=10,
+        columns={"total_requests": array("q", [0, 5, 9, 12]), "p50": array("f", [math.nan, 10, math.nan, 30])},
+        endpoints=[],
+    )
+    endpoint = EndpointRef(type="GET", name="/", start=0, end=4)
+    assert list(_interval_values(series, endpoint, "p50")) == [10, 30]
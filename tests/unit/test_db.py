@@ -0,0 +1,26 @@
+from db.db import database as db
+from models import tests as test_models  # `TestInfo` itself would be collected as a test class
+
+
+def test_unfinished_test_is_found_by_a_prefix_with_hyphens():
+    test = test_models.TestInfo(
+        test_id="shop-api__smoke-test-20260101120000",
+        status="running",
+        project="Shop API",
+        scenario="smoke-test",
+        in_web=True,
+        web_url="",
+        container_id="c1",
+        container_status="running",
+        start_time="2026-01-01T12:00:00",
+    )
+    db.add_test(test)
+    try:
+        assert db.find_unfinished("shop-api__smoke-test").test_id == test.test_id
+        assert db.find_unfinished("shop-api__smoke") is None
+
+        test.status = "completed"
+        db.update_test(test)
+        assert db.find_unfinished("shop-api__smoke-test") is None
+    finally:
+        db.remove_test(test.test_id)
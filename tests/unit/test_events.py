@@ -0,0 +1,35 @@
+from unittest import mock
+
+from db.db import database as db
+from models import tests as test_models  # `TestInfo` itself would be collected as a test class
+from utils.docker import engines
+from utils.events import watcher
+
+
+def test_workers_and_network_of_a_finished_headless_run_are_removed():
+    test = test_models.TestInfo(
+        test_id="p__s-20260101120000",
+        status="running",
+        project="p",
+        scenario="s",
+        in_web=False,
+        web_url="",
+        container_id="master",
+        container_status="running",
+        start_time="2026-01-01T12:00:00",
+        worker_ids=["worker-1", "worker-2"],
+        network_id="network",
+    )
+    db.add_test(test)
+    engine = engines.all()[0]
+    try:
+        with mock.patch.object(engine, "client") as client, mock.patch("utils.events.catalog"):
+            watcher._update(test, "exited", engine)
+
+        assert db.get_test(test.test_id).status == "completed"
+        assert [call.args for call in client.containers.get.call_args_list] == [("worker-1",), ("worker-2",)]
+        assert client.containers.get.return_value.remove.call_count == 2
+        client.networks.get.assert_called_once_with("network")
+        client.networks.get.return_value.remove.assert_called_once_with()
+    finally:
+        db.remove_test(test.test_id)
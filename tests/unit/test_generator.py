@@ -0,0 +1,34 @@
+from unittest import mock
+
+from models.config import CustomScenario, RpsScenario, RpsStage, Stage
+from utils.generator import generate_custom_scenario_file, generate_rps_scenario_file
+
+
+def load_shape(source: str, name: str):
+    namespace = {}
+    exec(compile(source, "custom_scenario.py", "exec"), namespace)
+    return namespace[name]()
+
+
+def test_custom_scenario_file_runs_its_stages():
+    scenario = CustomScenario(
+        stages=[Stage(duration=10, users=5, spawn_rate=1), Stage(duration=20, users=10, spawn_rate=2)],
+        corrected_latency=True,  # JSON `true` is not Python, only the stages may end up in the file
+    )
+    shape = load_shape(generate_custom_scenario_file("project_1", scenario), "CustomLoadShape")
+
+    for run_time, expected in ((0, (5, 1)), (15, (10, 2)), (25, None)):
+        with mock.patch.object(shape, "get_run_time", return_value=run_time):
+            assert shape.tick() == expected
+
+
+def test_rps_scenario_file_starts_with_the_initial_users():
+    scenario = RpsScenario(
+        rps_stages=[RpsStage(duration=60, rps=50)], initial_users=2, spawn_rate=5, corrected_latency=True
+    )
+    shape = load_shape(generate_rps_scenario_file("project_1", scenario), "TargetRpsShape")
+
+    with mock.patch.object(shape, "get_run_time", return_value=0):
+        assert shape.tick() == (2, 5)
+    with mock.patch.object(shape, "get_run_time", return_value=60):
+        assert shape.tick() is None
@@ -0,0 +1,71 @@
+import importlib.util
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from utils.histogram import HISTOGRAMS_FILE, RELATIVE_ACCURACY, Histogram, bucket, bucket_value, read_histograms
+
+RECORDER = Path(__file__).parents[1] / "histograms.py"
+
+
+def histogram_of(values) -> Histogram:
+    histogram = Histogram()
+    for value in values:
+        histogram.add(value)
+    return histogram
+
+
+def test_bucket_value_is_within_the_relative_accuracy():
+    for value in (0.5, 1, 7.3, 100, 2500, 60000):
+        assert bucket_value(bucket(value)) == pytest.approx(value, rel=RELATIVE_ACCURACY)
+
+
+def test_known_quantiles():
+    histogram = histogram_of(range(1, 101))  # 1..100 ms, once each
+
+    p50, p90, p99, p100 = histogram.quantiles([0.5, 0.9, 0.99, 1.0])
+    assert p50 == pytest.approx(50, rel=RELATIVE_ACCURACY)
+    assert p90 == pytest.approx(90, rel=RELATIVE_ACCURACY)
+    assert p99 == pytest.approx(99, rel=RELATIVE_ACCURACY)
+    assert p100 == pytest.approx(100, rel=RELATIVE_ACCURACY)
+    assert Histogram().quantiles([0.5]) == [None]
+
+
+def test_merge_is_associative_and_exact():
+    a, b, c = histogram_of(range(1, 50)), histogram_of(range(40, 400, 3)), histogram_of([5000] * 7)
+
+    left = Histogram()
+    left.merge(a)
+    left.merge(b)
+    left.merge(c)
+    bc = Histogram()
+    bc.merge(b)
+    bc.merge(c)
+    right = Histogram()
+    right.merge(a)
+    right.merge(bc)
+
+    assert left.counts == right.counts
+    everything = histogram_of([*range(1, 50), *range(40, 400, 3), *[5000] * 7])
+    assert left.counts == everything.counts
+    assert left.percentiles(["50%", "99%"]) == everything.percentiles(["50%", "99%"])
+
+
+def test_recorded_file_is_read_back(tmp_path):
+    spec = importlib.util.spec_from_file_location("histograms", RECORDER)
+    recorder = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(recorder)
+    recorder._prefix = str(tmp_path / "stats")
+
+    with mock.patch.object(recorder.time, "time", return_value=1767268805.0):  # all in one interval
+        for response_time in (1, 2, 2, 250, 250, 250):
+            recorder.on_request("GET", "/health", response_time)
+        recorder.on_request("POST", "/login", 80)
+    recorder._flush(until=None)
+
+    recorded = read_histograms(tmp_path / f"stats_{HISTOGRAMS_FILE}")
+    health = recorded[("GET", "/health")][1767268800]
+    login = recorded[("POST", "/login")][1767268800]
+    assert health.counts == histogram_of([1, 2, 2, 250, 250, 250]).counts
+    assert login.counts == {bucket(80): 1}
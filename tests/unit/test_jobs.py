@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from db.db import database as db
+from models.tests import StopTestResponse
+from utils.jobs import JobQueue, process_alive, process_token
+
+
+@pytest.fixture(autouse=True)
+def no_jobs():
+    db.connection().execute("DELETE FROM jobs")
+    yield
+    db.connection().execute("DELETE FROM jobs")
+
+
+def test_job_outlives_the_queue_that_ran_it():
+    def stop(job, test_id):
+        return StopTestResponse(test_id=test_id, status="stopped", container_status="exited", message="")
+
+    job = JobQueue(max_workers=1).submit("stop", "stop:p__s-1", stop, "p__s-1")
+
+    recycled = JobQueue(max_workers=1)  # a new gunicorn worker
+    deadline = time.monotonic() + 5
+    while recycled.get(job.job_id).status != "done" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recycled.get(job.job_id).result["status"] == "stopped"
+
+
+def test_unfinished_job_of_the_same_key_is_returned():
+    queue = JobQueue(max_workers=1)
+    job, created = queue.create("start", "start:p__s")
+    again, created_again = JobQueue(max_workers=1).create("start", "start:p__s")
+
+    assert created and not created_again
+    assert again.job_id == job.job_id
+
+
+def test_job_of_an_exited_process_has_failed():
+    queue = JobQueue(max_workers=1)
+    job, _ = queue.create("start", "start:p__s")
+    pid, start = process_token().split(":", 1)
+    db.update_job(job, f"{pid}:{start}0")  # the same pid, another process (a restart)
+
+    assert queue.get(job.job_id).status == "failed"
+    assert queue.create("start", "start:p__s")[1]
+
+
+def test_only_finished_jobs_are_evicted():
+    queue = JobQueue(max_workers=1, max_jobs=2)
+    first, _ = queue.create("stop", "stop:1")
+    second, _ = queue.create("stop", "stop:2")
+    queue.fail(second, "error")
+    third, _ = queue.create("stop", "stop:3")
+    fourth, _ = queue.create("stop", "stop:4")
+
+    assert queue.get(second.job_id) is None
+    assert all(queue.get(job.job_id) for job in (first, third, fourth))
+
+
+def test_process_token():
+    assert process_alive(process_token())
+    assert process_token(os.getpid()) == process_token()
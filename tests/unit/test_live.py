@@ -0,0 +1,49 @@
+from pathlib import Path
+from unittest import mock
+
+from config.settings import settings
+from db.db import database as db
+from models import tests as test_models  # `TestInfo` itself would be collected as a test class
+from utils.live import HISTORY_FILE, HistoryTailer, LiveHub
+
+HISTORY = (
+    '"Timestamp","User Count","Type","Name","Requests/s","Failures/s","50%","95%","99%",'
+    '"Total Request Count","Total Failure Count","Total Median Response Time","Total Average Response Time"\n'
+    '"1767268800","10","GET","/health","4.0","0.0","12","30","45","40","0","12","14.5"\n'
+    '"1767268800","10","","Aggregated","4.0","0.0","12","30","45","40","0","12","14.5"\n'
+)
+
+
+def test_headless_test_is_tailed_from_the_results_directory_of_its_config_key():
+    # the display name of `project_1` in `config.json`, as stored by the runner
+    test = test_models.TestInfo(
+        test_id="project_1__regular-20260101120000",
+        status="running",
+        project="Project One",
+        scenario="regular",
+        in_web=False,
+        web_url="",
+        container_id="c1",
+        container_status="running",
+        start_time="2026-01-01T12:00:00",
+    )
+    results_dir = Path(settings.results_path) / "project_1" / "regular" / test.test_id
+    results_dir.mkdir(parents=True)
+    (results_dir / HISTORY_FILE).write_text(HISTORY, encoding="utf-8")
+    db.add_test(test)
+    try:
+        hub = LiveHub()
+        with mock.patch.object(HistoryTailer, "start"):
+            hub.refresh(force=True)
+
+        poller = hub._pollers[test.test_id]
+        assert isinstance(poller, HistoryTailer)
+        assert Path(poller.url) == results_dir / HISTORY_FILE
+
+        [sample] = poller.poll()
+        assert sample["source"] == "history"
+        assert sample["user_count"] == 10
+        assert sample["rps"] == 4.0
+        assert [endpoint.name for endpoint in sample["endpoints"]] == ["/health"]
+    finally:
+        db.remove_test(test.test_id)
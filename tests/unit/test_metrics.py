@@ -0,0 +1,125 @@
+import math
+from array import array
+
+import pytest
+
+from models.metrics import PERCENTILES, EndpointRef
+from utils.histogram import RELATIVE_ACCURACY, Histogram
+from utils.metrics import Series, metrics, rollup
+
+T0 = 1767268800  # a multiple of every resolution
+HEADER = (
+    '"Timestamp","User Count","Type","Name","Requests/s","Failures/s",'
+    + ",".join(f'"{p}"' for p in PERCENTILES)
+    + ',"Total Request Count","Total Failure Count","Total Median Response Time","Total Average Response Time"'
+)
+STATS = (
+    '"Type","Name","Request Count","Failure Count","Median Response Time","Average Response Time",'
+    '"Min Response Time","Max Response Time","Average Content Size","Requests/s","Failures/s",'
+    + ",".join(f'"{p}"' for p in PERCENTILES)
+)
+
+
+def history_row(second: int, request_type: str, name: str) -> str:
+    """10 requests a second, a failure every 30 seconds, p50 of 100 ms and no percentiles in the first second."""
+    requests, failures = 10 * (second + 1), second // 30 + 1
+    percentiles = ["N/A"] * len(PERCENTILES) if second == 0 else [str(100 + 10 * i) for i in range(len(PERCENTILES))]
+    return ",".join(
+        [str(T0 + second), str(second // 10 + 1), request_type, name, "10", str(int(second % 30 == 0))]
+        + percentiles
+        + [str(requests), str(failures), "100", "104.5"]
+    )
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    rows = [
+        history_row(s, request_type, name)
+        for s in range(120)
+        for request_type, name in (("GET", "/a"), ("", "Aggregated"))
+    ]
+    (tmp_path / "stats_stats_history.csv").write_text("\n".join([HEADER, *rows]) + "\n", encoding="utf-8")
+    stats = ",".join(
+        ["GET", "/a", "1200", "4", "100", "104.5", "3", "900", "12", "10", "0.03"] + ["100"] * len(PERCENTILES)
+    )
+    (tmp_path / "stats_stats.csv").write_text(f"{STATS}\n{stats}\n", encoding="utf-8")
+    (tmp_path / "stats_failures.csv").write_text('"Method","Name","Error","Occurrences"\nGET,/a,"HTTPError(500)",4\n')
+    return tmp_path
+
+
+def test_csvs_are_ingested_into_typed_columns(results_dir):
+    test_id = "p__s-20260101120000"
+    assert metrics.ingest(test_id, results_dir)
+    assert not metrics.ingest(test_id, results_dir)  # up to date
+    try:
+        loaded = metrics.load(test_id)
+        raw = loaded.series[1]
+        assert [(e.type, e.name, e.start, e.end) for e in raw.endpoints] == [
+            ("", "Aggregated", 0, 120),
+            ("GET", "/a", 120, 240),
+        ]
+        assert raw.columns["timestamp"].typecode == "q"
+        assert raw.columns["p50"].typecode == "f"
+        endpoint = raw.endpoints[1]
+        assert list(raw.columns["timestamp"][endpoint.start : endpoint.start + 2]) == [T0, T0 + 1]
+        assert math.isnan(raw.columns["p50"][endpoint.start])
+        assert raw.columns["p50"][endpoint.start + 1] == 100
+        assert raw.columns["total_requests"][endpoint.end - 1] == 1200
+        assert loaded.meta.stats[0].request_count == 1200
+        assert loaded.meta.failures[0].occurrences == 4
+
+        result = metrics.query(test_id, name="/a", since=T0 + 10, until=T0 + 19, resolution=1)
+        [series] = result.endpoints
+        assert series.timestamps == list(range(T0 + 10, T0 + 20))
+        assert series.summary.requests == 100  # the totals at T0 + 19 less those at T0 + 9
+        assert series.summary.rps == pytest.approx(10)
+    finally:
+        metrics.forget(test_id)
+
+
+def test_rollups_keep_totals_and_merge_histograms():
+    timestamps = list(range(T0, T0 + 120))
+    raw = Series(
+        resolution=1,
+        columns={
+            "timestamp": array("q", timestamps),
+            "user_count": array("i", [s // 10 + 1 for s in range(120)]),
+            "rps": array("f", [10 if s % 2 else 20 for s in range(120)]),
+            "fps": array("f", [0] * 120),
+            **{f"p{p.rstrip('%')}": array("f", [100] * 120) for p in PERCENTILES},
+            "total_requests": array("q", [15 * (s + 1) for s in range(120)]),
+            "total_failures": array("q", [s // 60 for s in range(120)]),
+            "total_average_response_time": array("f", [100] * 120),
+        },
+        endpoints=[EndpointRef(type="GET", name="/a", start=0, end=120)],
+    )
+    # 10 requests of 50 ms and 5 of 200 ms recorded every 10 seconds
+    recorded = {("GET", "/a"): {}}
+    for interval in range(T0, T0 + 120, 10):
+        histogram = recorded[("GET", "/a")][interval] = Histogram()
+        histogram.add(50, 10)
+        histogram.add(200, 5)
+
+    series = rollup(raw, [10, 60], recorded)
+
+    ten, minute = series[10], series[60]
+    assert list(ten.columns["timestamp"]) == list(range(T0, T0 + 120, 10))
+    assert list(ten.columns["total_requests"]) == [150 * (i + 1) for i in range(12)]
+    assert list(ten.columns["user_count"]) == list(range(1, 13))
+    assert set(ten.columns["rps"]) == {15}
+    assert list(minute.columns["timestamp"]) == [T0, T0 + 60]
+    assert list(minute.columns["total_requests"]) == [900, 1800]
+    assert list(minute.columns["total_failures"]) == [0, 1]
+    assert list(minute.columns["user_count"]) == [6, 12]
+
+    # each minute merges the six recorded histograms: 60 requests of 50 ms and 30 of 200 ms
+    [endpoint] = minute.endpoints
+    merged = minute.histogram(endpoint, endpoint.start, endpoint.start + 1)
+    assert merged.total == 90
+    assert merged.percentiles(["50%", "66%", "67%"]) == {
+        "50%": pytest.approx(50, rel=RELATIVE_ACCURACY),
+        "66%": pytest.approx(50, rel=RELATIVE_ACCURACY),
+        "67%": pytest.approx(200, rel=RELATIVE_ACCURACY),
+    }
+    assert minute.columns["p50"][0] == pytest.approx(50, rel=RELATIVE_ACCURACY)
+    assert minute.histogram(endpoint, endpoint.start, endpoint.end).total == 180
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from config.settings import settings
+from db.db import database as db
+from utils.ports import PortAllocator
+
+ENGINE = "unix:///var/run/docker.sock"
+
+
+@pytest.fixture(autouse=True)
+def port_range(monkeypatch):
+    monkeypatch.setattr(settings, "min_port", 9000)
+    monkeypatch.setattr(settings, "max_port", 9002)
+    db.connection().execute("DELETE FROM ports")
+    yield
+    db.connection().execute("DELETE FROM ports")
+
+
+def test_reserve_release_and_transfer():
+    ports = PortAllocator()
+    assert [ports.reserve("job-1", ENGINE), ports.reserve("job-2", ENGINE)] == [9000, 9001]
+    assert ports.reserve("job-1", "tcp://other:2375") == 9000  # engines have their own ports
+
+    ports.transfer("job-1", "p__s-1")
+    assert db.get_ports(ENGINE) == {9000: "p__s-1", 9001: "job-2"}
+
+    ports.release("p__s-1")
+    assert db.get_ports(ENGINE) == {9001: "job-2"}
+    assert ports.reserve("job-3", ENGINE) == 9000
+
+
+def test_exhausted_range():
+    ports = PortAllocator()
+    for owner in ("a", "b", "c"):
+        ports.reserve(owner, ENGINE)
+    with pytest.raises(ValueError, match="No free ports"):
+        ports.reserve("d", ENGINE)
+
+
+def test_busy_port_is_skipped_until_its_timeout():
+    ports = PortAllocator()
+    assert ports.reserve("job-1", ENGINE) == 9000
+    ports.mark_busy(9000, ENGINE)  # taken by something else on the host
+    assert ports.reserve("job-1", ENGINE) == 9001
+
+    ports = PortAllocator(busy_timeout=0)
+    ports.mark_busy(9000, ENGINE)
+    assert ports.reserve("job-2", ENGINE) == 9000
+
+
+def test_concurrent_reservations_get_distinct_ports():
+    # two allocators stand for two gunicorn workers sharing the store
+    allocators = [PortAllocator(), PortAllocator()]
+    reserved = []
+
+    def reserve(i):
+        reserved.append(allocators[i % 2].reserve(f"job-{i}", ENGINE))
+
+    threads = [threading.Thread(target=reserve, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(reserved) == [9000, 9001, 9002]
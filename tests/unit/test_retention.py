@@ -0,0 +1,78 @@
+import csv
+
+import pytest
+
+from config.settings import settings
+from db.db import database as db
+from utils.catalog import catalog
+from utils.retention import downsample_history, retention
+
+T0 = 1767268800
+RUNS = [f"p__s-2026010112000{i}" for i in range(1, 5)]  # oldest first
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    """Four finished runs of 400 KB each in a results directory of their own."""
+    monkeypatch.setattr(settings, "tmp_path", str(tmp_path))
+    monkeypatch.setattr(settings, "retention_keep_last", 1)
+    monkeypatch.setattr(settings, "retention_max_runs", 0)
+    monkeypatch.setattr(settings, "retention_max_size", 0)
+    db.connection().execute("DELETE FROM runs")
+    for test_id in RUNS:
+        run_dir = tmp_path / "results" / "p" / "s" / test_id
+        run_dir.mkdir(parents=True)
+        (run_dir / "report.html").write_text("<html></html>", encoding="utf-8")
+        (run_dir / "data.bin").write_bytes(bytes(400 * 1024))
+    yield tmp_path / "results" / "p" / "s"
+    db.connection().execute("DELETE FROM runs")
+
+
+def kept(results) -> list[str]:
+    return sorted(path.name for path in results.iterdir())
+
+
+def test_oldest_runs_are_deleted_until_within_the_budget(results, monkeypatch):
+    monkeypatch.setattr(settings, "retention_max_size", 1)  # MB, the four runs use 1.6
+
+    report = retention.run()
+
+    assert report.deleted == RUNS[:2]
+    assert kept(results) == RUNS[2:]
+    assert report.used_before - report.used_after == 2 * (400 * 1024 + len("<html></html>"))
+    assert report.compacted == RUNS[:3]  # tried first, the newest is kept as is by `keep_last`
+
+
+def test_pinned_runs_are_not_deleted(results, monkeypatch):
+    monkeypatch.setattr(settings, "retention_max_size", 1)
+    catalog.refresh()
+    catalog.pin(RUNS[0])
+
+    assert retention.run().deleted == RUNS[1:3]
+    assert kept(results) == [RUNS[0], RUNS[3]]
+
+
+def test_runs_over_max_runs_are_deleted_without_a_budget(results, monkeypatch):
+    monkeypatch.setattr(settings, "retention_max_runs", 2)
+
+    assert sorted(retention.run().deleted) == RUNS[:2]
+    assert kept(results) == RUNS[2:]
+
+
+def test_downsampled_history_keeps_the_last_totals(tmp_path):
+    path = tmp_path / "stats_stats_history.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "User Count", "Type", "Name", "Total Request Count"])
+        for second in range(25):
+            for request_type, name in (("GET", "/a"), ("", "Aggregated")):
+                writer.writerow([T0 + second, 10, request_type, name, 10 * (second + 1)])
+
+    assert downsample_history(path)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    for name in ("/a", "Aggregated"):
+        endpoint = [row for row in rows if row["Name"] == name]
+        assert [int(row["Timestamp"]) - T0 for row in endpoint] == [0, 10, 20, 24]
+        assert endpoint[-1]["Total Request Count"] == "250"
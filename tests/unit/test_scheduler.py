@@ -0,0 +1,91 @@
+from unittest import mock
+
+import pytest
+
+from config.settings import settings
+from db.db import database as db
+from models.tests import StartTestRequest
+from utils.docker import engines
+from utils.jobs import jobs
+from utils.scheduler import Scheduler
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(settings, "allow_parallel", True)
+    monkeypatch.setattr(settings, "scheduler_reserved_cpus", 0)
+    monkeypatch.setattr(jobs, "run", mock.Mock())  # launches are recorded, not run
+    for table in ("pending_runs", "jobs", "tests"):
+        db.connection().execute(f"DELETE FROM {table}")
+    yield
+    for table in ("pending_runs", "jobs", "tests"):
+        db.connection().execute(f"DELETE FROM {table}")
+
+
+def new_scheduler(cpus: int) -> Scheduler:
+    scheduler = Scheduler(launcher=mock.Mock())
+    scheduler._capacity[engines.all()[0].name] = (cpus, 64 * 1024**3)
+    return scheduler
+
+
+def start(scheduler: Scheduler, scenario: str, containers: int = 1) -> str:
+    request = StartTestRequest(project="p", scenario=scenario, auth_token="", in_web=False)
+    job, _ = jobs.create("start", f"start:p__{scenario}")
+    scheduler.enqueue(job, containers, request)
+    return job.job_id
+
+
+def launched() -> list[str]:
+    return [call.args[2].scenario for call in jobs.run.call_args_list]
+
+
+def test_queued_run_is_started_by_the_next_process():
+    scheduler = new_scheduler(cpus=1)
+    start(scheduler, "first")
+    queued = start(scheduler, "second")
+    assert launched() == ["first"]
+    assert jobs.get(queued).status == "queued"
+
+    # a recycled worker: its allocations come from the stored tests, the queue from the store
+    new_scheduler(cpus=1).resume()
+    assert launched() == ["first", "second"]
+    assert db.get_pending_runs() == []
+
+
+def test_runs_get_distinct_cores_after_the_reserved_ones(monkeypatch):
+    monkeypatch.setattr(settings, "scheduler_reserved_cpus", 1)
+    scheduler = new_scheduler(cpus=4)
+    start(scheduler, "distributed", containers=2)
+    start(scheduler, "single")
+
+    first, second = (call.args[3] for call in jobs.run.call_args_list)
+    assert first.cpus == [1, 2]
+    assert second.cpus == [3]
+
+
+def test_queue_is_strictly_fifo():
+    scheduler = new_scheduler(cpus=3)
+    start(scheduler, "first", containers=2)
+    big = start(scheduler, "big", containers=2)
+    start(scheduler, "small")  # fits, but is not started ahead of `big`
+    assert launched() == ["first"]
+    assert [run.job_id for run in db.get_pending_runs()][0] == big
+
+    scheduler.release(jobs.run.call_args_list[0].args[0].job_id)
+    assert launched() == ["first", "big", "small"]
+
+
+def test_one_run_at_a_time_without_parallel(monkeypatch):
+    monkeypatch.setattr(settings, "allow_parallel", False)
+    scheduler = new_scheduler(cpus=8)
+    start(scheduler, "first")
+    start(scheduler, "second")
+    assert launched() == ["first"]
+
+    scheduler.release(jobs.run.call_args_list[0].args[0].job_id)
+    assert launched() == ["first", "second"]
+
+
+def test_run_larger_than_any_engine_is_rejected():
+    with pytest.raises(ValueError, match="needs 5 containers"):
+        start(new_scheduler(cpus=4), "huge", containers=5)
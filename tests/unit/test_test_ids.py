@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+from config.settings import settings
+from utils.test_ids import id_prefix, results_dir, split_test_id
+
+
+def test_keys_with_hyphens_are_kept_whole():
+    test_id = "shop-api__smoke-test-20260101120000"
+
+    assert id_prefix(test_id) == "shop-api__smoke-test"
+    assert split_test_id(test_id) == ("shop-api", "smoke-test")
+    assert results_dir(test_id) == Path(settings.results_path) / "shop-api" / "smoke-test" / test_id
+
+
+def test_not_a_test_id():
+    with pytest.raises(ValueError):
+        split_test_id("report-20260101120000")
@@ -4,6 +4,9 @@ from flask import Flask, jsonify
 from pydantic import ValidationError
 
 from models.errors import ErrorResponse
+from utils.events import watcher
+from utils.retention import retention
+from utils.scheduler import scheduler
 
 logger = getLogger(__name__)
 
@@ -56,6 +59,18 @@ def create_exception_handlers(app: Flask) -> Flask:
     return app
 
 
+def start_background_tasks(app: Flask) -> Flask:
+    """Start per-process background threads on the first request (gunicorn forks after `preload_app`)."""
+
+    @app.before_request
+    def ensure_background_tasks():
+        watcher.start()
+        retention.start()
+        scheduler.resume()
+
+    return app
+
+
 def set_config(app: Flask):
     app.config["JSON_AS_ASCII"] = False
     app.config["JSON_SORT_KEYS"] = False
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+
+from config.settings import settings
+from db.db import database as db
+from models.results import RunInfo, RunsPage
+from utils.postrun import submit_finished_run
+from utils.test_ids import split_test_id
+
+logger = getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+
+@dataclass
+class ResultsCatalog:
+    """Index of `results/{project}/{scenario}/{test_id}` in the store, updated when a run starts and finishes."""
+
+    def record(self, test_id: str, process: bool = True) -> RunInfo | None:
+        """(Re)index one run from its results directory; drops it from the catalog if the directory is gone.
+        A finished run gets its post-run work unless `process` is off."""
+        try:
+            project, scenario = split_test_id(test_id)
+        except ValueError:
+            logger.warning("Not a test id: %s", test_id)
+            return None
+
+        results_dir = Path(settings.results_path) / project / scenario / test_id
+        if not results_dir.is_dir():
+            db.remove_run(test_id)
+            return None
+
+        files = sorted((p for p in results_dir.iterdir() if p.is_file()), key=lambda p: p.name)
+        stats = [p.stat() for p in files]
+
+        existing = db.get_run(test_id)
+        test = db.get_test(test_id)
+        if test is not None and test.status != "completed":
+            status = "running"
+        elif any(p.name == "report.html" for p in files):
+            status = "completed"
+        else:
+            status = "incomplete"
+
+        run = RunInfo(
+            test_id=test_id,
+            project=project,
+            scenario=scenario,
+            status=status,
+            started_at=self._started_at(test_id, results_dir),
+            finished_at=datetime.fromtimestamp(max(s.st_mtime for s in stats)).isoformat() if stats else None,
+            files=[p.name for p in files],
+            size=sum(s.st_size for s in stats),
+            pinned=existing.pinned if existing else False,
+            compacted=existing.compacted if existing else False,
+        )
+        db.upsert_run(run)
+        if process and status != "running":
+            submit_finished_run(test_id, results_dir)
+        return run
+
+    def pin(self, test_id: str, pinned: bool = True) -> RunInfo | None:
+        """Mark a run as a baseline that the retention keeps."""
+        self.ensure()
+        run = db.get_run(test_id) or self.record(test_id)
+        if run is None:
+            return None
+        run.pinned = pinned
+        db.upsert_run(run)
+        return run
+
+    def rebuild(self) -> int:
+        """Re-index every run on disk and drop the ones whose directory was removed.
+
+        Runs indexed in bulk get no post-run work, all of them at once would hold the executor and the disk for long:
+        their metrics and trends are ingested when first queried, their gzip copies made when a file is first served."""
+        on_disk = self._on_disk()
+        for test_id in on_disk:
+            self.record(test_id, process=False)
+        for test_id in db.get_run_ids() - on_disk:
+            db.remove_run(test_id)
+
+        logger.info("Results catalog rebuilt: %s runs", len(on_disk))
+        return len(on_disk)
+
+    def refresh(self) -> int:
+        """Index the runs on disk that are missing from the catalog and drop the removed ones, the rest as is."""
+        on_disk, indexed = self._on_disk(), db.get_run_ids()
+        for test_id in on_disk - indexed:
+            self.record(test_id, process=False)
+        for test_id in indexed - on_disk:
+            db.remove_run(test_id)
+        return len(on_disk ^ indexed)
+
+    def _on_disk(self) -> set[str]:
+        results_path = Path(settings.results_path)
+        if not results_path.exists():
+            return set()
+        return {test_dir.name for test_dir in results_path.glob("*/*/*") if test_dir.is_dir()}
+
+    def ensure(self) -> None:
+        """Build the catalog from disk the first time it is used."""
+        if not db.has_runs() and Path(settings.results_path).exists():
+            self.rebuild()
+
+    def query(self, limit: int = 50, offset: int = 0, **filters: str | None) -> RunsPage:
+        self.ensure()
+        items, total = db.query_runs(limit=limit, offset=offset, **filters)
+        return RunsPage(items=items, total=total, limit=limit, offset=offset)
+
+    def _started_at(self, test_id: str, results_dir: Path) -> str:
+        timestamp = test_id.rsplit("-", 1)[-1][:14]
+        try:
+            return datetime.strptime(timestamp, TIMESTAMP_FORMAT).isoformat()
+        except ValueError:
+            return datetime.fromtimestamp(results_dir.stat().st_mtime).isoformat()
+
+
+catalog = ResultsCatalog()
@@ -1,31 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from logging import getLogger
 
-from models.tests import TestInfo
-
+from db.db import database as db
 
 logger = getLogger(__name__)
 
+FINISHED_STATUSES = ["stopped", "completed", "err"]
 
-def cleanup_old_stopped_tests(active_tests: list[TestInfo], max_age_seconds: int = 300):
-    current_time = datetime.now()
-
-    tests_to_remove = []
-
-    for test in active_tests:
-        if test.status in ["stopped", "completed", "err"]:
-            try:
-                start_time = datetime.fromisoformat(test.start_time)
-                time_diff = (current_time - start_time).total_seconds()
 
-                if time_diff > max_age_seconds:
-                    tests_to_remove.append(test)
-                    logger.info("Removing old test: %s (age: %d seconds)", test.test_id, time_diff)
-            except (ValueError, KeyError) as e:
-                logger.warning("Failed to parse start time for test %s: %s", test.test_id, e)
-                tests_to_remove.append(test)
+def cleanup_old_stopped_tests(max_age_seconds: int = 300) -> int:
+    started_before = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
 
-    for test in tests_to_remove:
-        active_tests.remove(test)
+    removed = db.remove_finished_before(FINISHED_STATUSES, started_before)
+    for test_id in removed:
+        logger.info("Removing old test: %s (older than %d seconds)", test_id, max_age_seconds)
 
-    return len(tests_to_remove)
+    return len(removed)
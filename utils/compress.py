@@ -0,0 +1,60 @@
+import gzip
+import os
+import shutil
+import uuid
+from logging import getLogger
+from pathlib import Path
+
+from config.settings import settings
+
+logger = getLogger(__name__)
+
+COMPRESSIBLE_SUFFIXES = (".html", ".csv", ".json", ".txt", ".log")
+MIN_SIZE = 1024  # smaller files are not worth a sidecar
+
+
+def gzip_path(test_id: str, file_path: Path) -> Path:
+    return Path(settings.compressed_path) / test_id / f"{file_path.name}.gz"
+
+
+def compressible(file_path: Path) -> bool:
+    """Whether the file gets a gzip sidecar."""
+    return file_path.suffix in COMPRESSIBLE_SUFFIXES and file_path.stat().st_size >= MIN_SIZE
+
+
+def fresh_gzip(test_id: str, file_path: Path) -> Path | None:
+    """The gzip sidecar of a result file if it was made from the file's current version."""
+    path = gzip_path(test_id, file_path)
+    try:
+        if path.stat().st_mtime_ns == file_path.stat().st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def compress_results(test_id: str, results_dir: Path) -> int:
+    """Write gzip sidecars of the compressible result files that don't have a fresh one yet."""
+    compressed = 0
+    for file_path in results_dir.iterdir():
+        if not file_path.is_file() or not compressible(file_path) or fresh_gzip(test_id, file_path):
+            continue
+        stat = file_path.stat()
+
+        path = gzip_path(test_id, file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(file_path, "rb") as src, gzip.GzipFile(tmp_path, "wb", compresslevel=6, mtime=0) as dest:
+                shutil.copyfileobj(src, dest, 1024 * 1024)
+            # the sidecar carries the source's mtime, a changed source makes it stale
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_path, path)
+            compressed += 1
+        except Exception as e:
+            logger.warning("Failed to compress %s: %s", file_path, e)
+            tmp_path.unlink(missing_ok=True)
+
+    if compressed:
+        logger.debug("Compressed %s result files of %s", compressed, test_id)
+    return compressed
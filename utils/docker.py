@@ -1,54 +1,131 @@
+import io
 import os
-from dataclasses import dataclass
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from logging import getLogger
 from pathlib import Path
+from urllib.parse import urlparse
 
+import requests
 from docker import DockerClient
+from docker.errors import APIError, NotFound
 from docker.models.containers import Container
+from docker.models.networks import Network
 
 from config.settings import settings
+from models.scheduler import Allocation
+from models.tests import TestInfo
+from utils.ports import ports
+from utils.test_ids import results_dir as test_results_dir
+from utils.test_ids import split_test_id
 
 logger = getLogger(__name__)
 
+LABEL = "locust-swarm"
+PORT_ATTEMPTS = 3
+LOCAL_SCHEMES = ("unix", "npipe")
+
+
+def container_labels(role: str, test_id: str = "") -> dict[str, str]:
+    """Labels put on every container LocustSwarm creates, `role` is one of master/worker/pool."""
+    return {LABEL: "1", f"{LABEL}.role": role, f"{LABEL}.test_id": test_id}
+
+
+@dataclass
+class PoolProfile:
+    """Everything needed to park a web-mode container; `command` has a `{results_path}` placeholder."""
+
+    key: str
+    image: str
+    command: str
+    volumes: dict[str, dict[str, str]]
+    environment: dict[str, str]
+
+
+@dataclass
+class PooledContainer:
+    profile_key: str
+    slot: str
+    container: Container
+    web_port: str
+
 
 @dataclass
 class Docker:
+    """One Docker engine; engines that don't share the filesystem (`tcp://`, `ssh://`) get bind mounts copied in."""
+
     client: DockerClient
+    name: str = "default"
+    weight: float = 1.0
+    web_host: str = ""  # scheme and host the published Locust web ports are reachable on
+    shares_files: bool = True
+    _pool: list[PooledContainer] = field(default_factory=list)
+    _pool_profiles: dict[str, PoolProfile] = field(default_factory=dict)
+    _pool_lock: threading.Lock = field(default_factory=threading.Lock)
+    _pool_wakeup: threading.Event = field(default_factory=threading.Event)
+    _pool_thread: threading.Thread | None = None
 
     def get(self) -> DockerClient:
         return self.client
 
-    def cleanup_containers(self) -> int:
-        try:
-            logger.info("Starting Docker cleanup...")
-
-            running_containers: list[Container] = self.client.containers.list(filters={"status": "running"})
-            if running_containers:
-                logger.info("Stopping %s running containers...", len(running_containers))
-                for container in running_containers:
-                    try:
-                        container.stop()
-                        logger.debug("Stopped container: %s", container.name)
-                    except Exception as e:
-                        logger.warning("Failed to stop container %s: %s", container.name, e)
-
-            all_containers: list[Container] = self.client.containers.list(all=True)
-            if all_containers:
-                logger.info("Removing %s containers...", len(all_containers))
-                for container in all_containers:
-                    try:
-                        container.remove(force=True)
-                        logger.debug("Removed container: %s", container.name)
-                    except Exception as e:
-                        logger.warning("Failed to remove container %s: %s", container.name, e)
-            return len(all_containers)
+    def pool_container_ids(self) -> set[str]:
+        with self._pool_lock:
+            return {pooled.container.id for pooled in self._pool}
+
+    def cleanup_containers(self, exclude: set[str] | None = None) -> int:
+        """Stop and remove LocustSwarm-labelled containers concurrently, bounded by `CLEANUP_DEADLINE`."""
+        exclude = exclude or set()
+        try:
+            logger.info("Starting Docker cleanup on %s...", self.name)
+
+            containers: list[Container] = [
+                c for c in self.client.containers.list(all=True, filters={"label": LABEL}) if c.id not in exclude
+            ]
+            if containers:
+                logger.info("Removing %s containers...", len(containers))
+                executor = ThreadPoolExecutor(max_workers=settings.cleanup_workers, thread_name_prefix="cleanup")
+                futures = [executor.submit(self._stop_and_remove, container) for container in containers]
+                done, not_done = wait(futures, timeout=settings.cleanup_deadline)
+                executor.shutdown(wait=False)
+                if not_done:
+                    logger.warning(
+                        "Cleanup deadline of %ss exceeded, %s containers left", settings.cleanup_deadline, len(not_done)
+                    )
+
+            self.cleanup_networks()
+            return len(containers)
         except Exception as e:
             logger.error("Docker cleanup failed: %s", e)
             return 0
-        
-    def num_active_containers(self):
-        running_containers: list[Container] = self.client.containers.list(filters={"status": "running"})
-        return len(running_containers)
+
+    def _stop_and_remove(self, container: Container) -> None:
+        try:
+            if container.status == "running":
+                container.stop(timeout=settings.cleanup_stop_timeout)
+                logger.debug("Stopped container: %s", container.name)
+        except Exception as e:
+            logger.warning("Failed to stop container %s: %s", container.name, e)
+        try:
+            container.remove(force=True)
+            logger.debug("Removed container: %s", container.name)
+        except Exception as e:
+            logger.warning("Failed to remove container %s: %s", container.name, e)
+
+    def cleanup_networks(self) -> int:
+        removed = 0
+        for network in self.client.networks.list(filters={"label": LABEL}):
+            try:
+                network.remove()
+                removed += 1
+                logger.debug("Removed network: %s", network.name)
+            except Exception as e:
+                logger.warning("Failed to remove network %s: %s", network.name, e)
+        return removed
 
     def setup_results_volume(self, project: str, scenario: str, test_id: str) -> dict[str, dict[str, str]]:
         results_dir = Path(settings.results_path) / project / scenario / test_id
@@ -58,5 +135,363 @@ class Docker:
 
         return {str(results_dir.absolute()): {"bind": container_results_dir, "mode": "rw"}}
 
+    def run_with_port(self, owner: str, image: str, name: str, **kwargs) -> tuple[Container, int]:
+        """Run a container with the Locust web port published on a reserved host port."""
+        for attempt in range(PORT_ATTEMPTS):
+            port = ports.reserve(owner, self.name)
+            try:
+                container = self.run(image, name=name, ports={"8089/tcp": port}, **kwargs)
+                return container, port
+            except APIError as e:
+                # the container is created before the port is bound, drop it so the name can be reused
+                try:
+                    self.client.containers.get(name).remove(force=True)
+                except NotFound:
+                    pass
+                if not ports.is_port_in_use_error(e) or attempt == PORT_ATTEMPTS - 1:
+                    ports.release(owner)
+                    raise
+                ports.mark_busy(port, self.name)
+        raise ValueError(f"Failed to run container {name}")
+
+    def run(self, image: str, volumes: dict[str, dict[str, str]] | None = None, **kwargs) -> Container:
+        """`containers.run(detach=True)`, on a remote engine the bind-mounted paths are copied into the container."""
+        kwargs.pop("detach", None)
+        if self.shares_files or not volumes:
+            return self.client.containers.run(image, volumes=volumes, detach=True, **kwargs)
+
+        container = self.client.containers.create(image, **kwargs)
+        try:
+            container.put_archive("/", self._volumes_archive(volumes))
+            container.start()
+        except Exception:
+            container.remove(force=True)
+            raise
+        return container
+
+    def _volumes_archive(self, volumes: dict[str, dict[str, str]]) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            for host_path, bind in volumes.items():
+                info = tar.gettarinfo(host_path, arcname=bind["bind"].lstrip("/"))
+                if info.isdir():
+                    # results dirs are written by the container user
+                    info.mode = 0o777 if bind.get("mode") == "rw" else 0o755
+                    tar.addfile(info)
+                    for child in sorted(Path(host_path).iterdir()):
+                        tar.add(str(child), arcname=f"{info.name}/{child.name}")
+                else:
+                    with open(host_path, "rb") as f:
+                        tar.addfile(info, f)
+        return buffer.getvalue()
+
+    def fetch_results(self, test: TestInfo) -> None:
+        """Copy the results a remote engine's master container wrote back to `TMP_PATH`."""
+        if self.shares_files:
+            return
+
+        if test.pool_slot:
+            container_dir = f"/results/pool/{test.pool_slot}"
+            local_dir = Path(settings.tmp_path) / "pool" / test.pool_slot
+        else:
+            project, scenario = split_test_id(test.test_id)
+            container_dir = f"/results/{project}/{scenario}/{test.test_id}"
+            local_dir = test_results_dir(test.test_id)
+
+        try:
+            stream, _ = self.client.containers.get(test.container_id).get_archive(f"{container_dir}/.")
+            with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as tar:
+                local_dir.mkdir(parents=True, exist_ok=True)
+                for member in tar.getmembers():
+                    if not member.isfile():
+                        continue
+                    source = tar.extractfile(member)
+                    if source is not None:
+                        (local_dir / Path(member.name).name).write_bytes(source.read())
+            logger.debug("Fetched results of %s from %s", test.test_id, self.name)
+        except NotFound:
+            logger.debug("Container of %s is already removed from %s", test.test_id, self.name)
+        except Exception as e:
+            logger.warning("Failed to fetch results of %s from %s: %s", test.test_id, self.name, e)
+
+    def create_network(self, test_id: str) -> Network:
+        network = self.client.networks.create(
+            f"locust_{test_id}", driver="bridge", labels={LABEL: "1", f"{LABEL}.test_id": test_id}
+        )
+        logger.info("Created network %s for test %s on %s", network.name, test_id, self.name)
+        return network
+
+    def run_workers(
+        self,
+        image: str,
+        test_id: str,
+        command: str,
+        volumes: dict[str, dict[str, str]],
+        environment: dict[str, str],
+        network: Network,
+        allocation: Allocation,
+    ) -> list[Container]:
+        """Run one worker per allocated cpu after the first one, which belongs to the master."""
+        master_host = f"locust_{test_id}"
+        worker_command = f"{command} --worker --master-host {master_host}"
+
+        workers = []
+        for i, cpu in enumerate(allocation.cpus[1:]):
+            worker = self.run(
+                image,
+                command=worker_command,
+                volumes=volumes,
+                name=f"locust_{test_id}_worker_{i}",
+                environment=environment,
+                network=network.name,
+                labels=container_labels("worker", test_id),
+                cpuset_cpus=str(cpu),
+                mem_limit=allocation.mem_limit,
+            )
+            workers.append(worker)
+        logger.info("Started %s workers for test %s", len(workers), test_id)
+        return workers
+
+    def discard_test(self, test_id: str, container: Container | None = None, network: Network | None = None) -> None:
+        """Force-remove what a failed launch left behind: the master, the workers started so far and the network."""
+        try:
+            labeled = self.client.containers.list(all=True, filters={"label": f"{LABEL}.test_id={test_id}"})
+        except Exception as e:
+            logger.warning("Failed to list containers of failed test %s: %s", test_id, e)
+            labeled = []
+        containers = {c.id: c for c in labeled}
+        if container is not None:
+            containers.setdefault(container.id, container)  # a pooled container keeps its pool labels
+        for c in containers.values():
+            try:
+                c.remove(force=True)
+                logger.debug("Removed container %s of failed test %s", c.name, test_id)
+            except NotFound:
+                pass
+            except Exception as e:
+                logger.warning("Failed to remove container %s of failed test %s: %s", c.name, test_id, e)
+
+        if network is not None:
+            try:
+                network.remove()
+            except NotFound:
+                pass
+            except Exception as e:
+                logger.warning("Failed to remove network %s: %s", network.name, e)
+
+    def stop_test(self, test: TestInfo, timeout: int = 10) -> Container:
+        """Stop master first so it writes the final report, then workers and the network."""
+        container = self.client.containers.get(test.container_id)
+        container.stop(timeout=timeout)
+        self.remove_workers(test)
+        container.reload()
+        return container
+
+    def remove_workers(self, test: TestInfo) -> None:
+        """Remove the workers and the network of a distributed test whose master has stopped or exited."""
+        for worker_id in test.worker_ids:
+            try:
+                self.client.containers.get(worker_id).remove(force=True)
+            except NotFound:
+                pass
+            except Exception as e:
+                logger.warning("Failed to remove worker %s: %s", worker_id, e)
+
+        if test.network_id:
+            try:
+                self.client.networks.get(test.network_id).remove()
+            except NotFound:
+                pass
+            except Exception as e:
+                logger.warning("Failed to remove network %s: %s", test.network_id, e)
+
+    def take_from_pool(self, profile: PoolProfile) -> PooledContainer | None:
+        """Return a parked container for the profile, if any, and schedule a background refill."""
+        if settings.pool_min_size <= 0:
+            return None
+
+        taken = None
+        with self._pool_lock:
+            self._pool_profiles.pop(profile.key, None)
+            self._pool_profiles[profile.key] = profile
+            for pooled in self._pool:
+                if pooled.profile_key == profile.key:
+                    taken = pooled
+                    break
+            if taken:
+                self._pool.remove(taken)
+
+        self._ensure_pool_thread()
+        self._pool_wakeup.set()
+
+        if taken:
+            try:
+                taken.container.reload()
+            except Exception as e:
+                logger.warning("Pooled container %s is gone: %s", taken.slot, e)
+                return None
+            if taken.container.status != "running":
+                logger.warning("Pooled container %s is %s, skipping", taken.slot, taken.container.status)
+                return None
+            logger.info("Took container %s from pool", taken.slot)
+        return taken
+
+    def forget_pooled(self, container_id: str) -> None:
+        """Drop a parked container that died or was removed outside of the pool."""
+        with self._pool_lock:
+            gone = [pooled for pooled in self._pool if pooled.container.id == container_id]
+            for pooled in gone:
+                self._pool.remove(pooled)
+        for pooled in gone:
+            logger.info("Pooled container %s is gone, dropping it", pooled.slot)
+            self._discard_pooled(pooled)
+
+    def collect_pool_results(self, test: TestInfo) -> None:
+        """Move the results of a pooled run from its slot dir into `results/{project}/{scenario}/{test_id}`."""
+        if not test.pool_slot:
+            return
+
+        slot_dir = Path(settings.tmp_path) / "pool" / test.pool_slot
+        if not slot_dir.exists():
+            return
+
+        results_dir = test_results_dir(test.test_id)
+        results_dir.mkdir(parents=True, exist_ok=True)
+        for file_path in slot_dir.iterdir():
+            shutil.move(str(file_path), results_dir / file_path.name)
+        slot_dir.rmdir()
+        logger.debug("Moved pool results %s -> %s", slot_dir, results_dir)
+
+    def _ensure_pool_thread(self) -> None:
+        with self._pool_lock:
+            if self._pool_thread and self._pool_thread.is_alive():
+                return
+            self._pool_thread = threading.Thread(target=self._pool_refill_loop, name="pool-refill", daemon=True)
+            self._pool_thread.start()
+
+    def _pool_refill_loop(self) -> None:
+        while True:
+            self._pool_wakeup.wait(timeout=30)
+            self._pool_wakeup.clear()
+            try:
+                self._refill_pool()
+            except Exception as e:
+                logger.error("Pool refill failed: %s", e)
+
+    def _refill_pool(self) -> None:
+        with self._pool_lock:
+            # most recently used profiles first, forget the ones that no longer fit
+            profiles = list(reversed(self._pool_profiles.values()))[: settings.pool_max_size]
+            self._pool_profiles = {p.key: p for p in reversed(profiles)}
+            stale = [pooled for pooled in self._pool if pooled.profile_key not in self._pool_profiles]
+            for pooled in stale:
+                self._pool.remove(pooled)
+
+        for pooled in stale:
+            self._discard_pooled(pooled)
+
+        for profile in profiles:
+            while True:
+                with self._pool_lock:
+                    idle = len([p for p in self._pool if p.profile_key == profile.key])
+                    if idle >= settings.pool_min_size or len(self._pool) >= settings.pool_max_size:
+                        break
+                pooled = self._park(profile)
+                if pooled is None:
+                    break
+                with self._pool_lock:
+                    self._pool.append(pooled)
+
+    def _park(self, profile: PoolProfile) -> PooledContainer | None:
+        slot = f"locust_pool_{uuid.uuid4().hex[:12]}"
+        slot_dir = Path(settings.tmp_path) / "pool" / slot
+        slot_dir.mkdir(parents=True, exist_ok=True)
+        os.chmod(slot_dir, 0o777)
+
+        volumes = dict(profile.volumes)
+        volumes[str(slot_dir.absolute())] = {"bind": f"/results/pool/{slot}", "mode": "rw"}
+
+        try:
+            container, port = self.run_with_port(
+                slot,
+                profile.image,
+                slot,
+                command=profile.command.replace("{results_path}", f"/results/pool/{slot}"),
+                volumes=volumes,
+                detach=True,
+                environment=profile.environment,
+                labels=container_labels("pool"),
+            )
+            web_port = str(port)
+        except Exception as e:
+            logger.warning("Failed to park pool container: %s", e)
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            return None
+
+        pooled = PooledContainer(profile_key=profile.key, slot=slot, container=container, web_port=web_port)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{self.web_host}:{web_port}/", timeout=2).ok:
+                    logger.info("Parked pool container %s on port %s", slot, web_port)
+                    return pooled
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+
+        logger.warning("Pool container %s did not become ready", slot)
+        self._discard_pooled(pooled)
+        return None
+
+    def _discard_pooled(self, pooled: PooledContainer) -> None:
+        try:
+            pooled.container.remove(force=True)
+        except Exception as e:
+            logger.debug("Failed to remove pooled container %s: %s", pooled.slot, e)
+        ports.release(pooled.slot)
+        shutil.rmtree(Path(settings.tmp_path) / "pool" / pooled.slot, ignore_errors=True)
+
+
+@dataclass
+class Engines:
+    """The Docker engines from `DOCKER_BASE_URL`; a test runs entirely on the engine the scheduler placed it on."""
+
+    engines: dict[str, Docker]
+
+    @classmethod
+    def from_settings(cls) -> "Engines":
+        engines = {}
+        for base_url, weight in settings.docker_engines:
+            url = urlparse(base_url)
+            shares_files = url.scheme in LOCAL_SCHEMES
+            engines[base_url] = Docker(
+                client=DockerClient(base_url=base_url),
+                name=base_url,
+                weight=weight,
+                web_host=settings.host if shares_files else f"http://{url.hostname}",
+                shares_files=shares_files,
+            )
+        return cls(engines=engines)
+
+    def all(self) -> list[Docker]:
+        return list(self.engines.values())
+
+    def get(self, name: str) -> Docker:
+        engine = self.engines.get(name)
+        if engine is None:
+            raise ValueError(f"Unknown Docker engine: {name}")
+        return engine
+
+    def for_test(self, test: TestInfo) -> Docker:
+        return self.get(test.engine) if test.engine else self.all()[0]
+
+    def cleanup_containers(self, keep_pool: bool = False) -> int:
+        with ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix="cleanup-engine") as executor:
+            cleaned = executor.map(
+                lambda engine: engine.cleanup_containers(exclude=engine.pool_container_ids() if keep_pool else None),
+                self.all(),
+            )
+            return sum(cleaned)
+
 
-docker = Docker(client=DockerClient(base_url=settings.docker_base_url))
+engines = Engines.from_settings()
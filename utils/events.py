@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+
+from docker.errors import NotFound
+
+from db.db import database as db
+from models.tests import TestInfo
+from utils.catalog import catalog
+from utils.docker import LABEL, Docker, engines
+from utils.ports import ports
+from utils.scheduler import scheduler
+
+logger = getLogger(__name__)
+
+CONTAINER_EVENTS = ["start", "die", "destroy"]
+STALE_PORT_AGE = 60  # in sec, younger reservations may belong to a container that is being created
+
+
+@dataclass
+class EventsWatcher:
+    """Keeps `TestInfo.container_status`/`status` in sync with the events stream of every Docker engine."""
+
+    retry_interval: int = 5
+    _threads: dict[str, threading.Thread] = field(default_factory=dict)
+    _pid: int | None = None
+
+    def start(self) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._threads = {}
+            self.forget_unknown_engines()
+
+        for engine in engines.all():
+            thread = self._threads.get(engine.name)
+            if thread and thread.is_alive():
+                continue
+            thread = threading.Thread(target=self._run, args=(engine,), name="docker-events", daemon=True)
+            self._threads[engine.name] = thread
+            thread.start()
+            logger.info("Docker events watcher started for %s", engine.name)
+
+    def _run(self, engine: Docker) -> None:
+        while True:
+            try:
+                events = engine.get().events(
+                    decode=True,
+                    filters={"type": "container", "label": LABEL, "event": CONTAINER_EVENTS},
+                )
+                # events between the last sync and the subscription are not lost
+                self.sync(engine)
+                for event in events:
+                    self.handle(event, engine)
+            except Exception as e:
+                logger.warning(
+                    "Docker events stream of %s failed: %s, retry in %ss", engine.name, e, self.retry_interval
+                )
+            time.sleep(self.retry_interval)
+
+    def forget_unknown_engines(self) -> None:
+        """Complete tests of engines that were removed from `DOCKER_BASE_URL` since they were started."""
+        for test in db.get_tests():
+            if test.engine and test.engine not in engines.engines and test.status != "completed":
+                logger.warning("Engine %s of test %s is not configured anymore", test.engine, test.test_id)
+                test.status = "completed"
+                db.update_test(test)
+                ports.release(test.test_id)
+
+    def sync(self, engine: Docker) -> None:
+        """Reconcile the tests and port reservations of the engine with its current containers."""
+        tests = {}
+        for test in db.get_tests():
+            tests[test.test_id] = test
+            if (test.engine or engines.all()[0].name) != engine.name:
+                continue
+            try:
+                container = engine.get().containers.get(test.container_id)
+                self._update(test, container.status or "unknown", engine)
+            except NotFound:
+                self._update(test, "removed", engine)
+            except Exception as e:
+                logger.debug("Failed to sync test %s: %s", test.test_id, e)
+
+        # owners are test ids (container `locust_{test_id}`) and pool slots (container `{slot}`)
+        for port, owner in db.get_stale_ports(engine.name, time.time() - STALE_PORT_AGE).items():
+            test = tests.get(owner)
+            if test is not None and test.status != "completed":
+                continue
+            if test is None and self._is_running(engine, [owner, f"locust_{owner}"]):
+                continue
+            logger.info("Releasing stale port %s on %s of %s", port, engine.name, owner)
+            db.release_port(engine.name, port)
+
+    def _is_running(self, engine: Docker, names: list[str]) -> bool:
+        for name in names:
+            try:
+                return engine.get().containers.get(name).status == "running"
+            except NotFound:
+                continue
+        return False
+
+    def handle(self, event: dict, engine: Docker) -> None:
+        action = event.get("Action") or event.get("status")
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        attributes = event.get("Actor", {}).get("Attributes", {})
+        logger.debug("Docker event %s for %s (%s)", action, attributes.get("name"), container_id)
+
+        if action in ("die", "destroy") and attributes.get(f"{LABEL}.role") == "pool":
+            engine.forget_pooled(container_id)
+            # parked by an earlier process
+            ports.release(attributes.get("name", ""))
+
+        container_status = {"start": "running", "die": "exited", "destroy": "removed"}.get(action)
+        if container_status is None:
+            return
+
+        test = db.get_test_by_container(container_id)
+        if test is not None:
+            self._update(test, container_status, engine)
+
+    def _update(self, test: TestInfo, container_status: str, engine: Docker) -> None:
+        if test.container_status != container_status:
+            logger.debug("Test %s container %s -> %s", test.test_id, test.container_status, container_status)
+            if container_status == "exited" and not test.in_web:
+                # headless runs finish on their own, web runs are fetched by the stop job
+                engine.fetch_results(test)
+        status = test.status if container_status == "running" else "completed"
+        if (test.container_status, test.status) != (container_status, status):
+            finished = status == "completed" and test.status != "completed"
+            test.container_status = container_status
+            test.status = status
+            db.update_test(test)
+            if finished:
+                # the workers of a headless run wait for a master that is gone, the master is kept for its logs
+                engine.remove_workers(test)
+                catalog.record(test.test_id)
+        if status == "completed":
+            ports.release(test.test_id)
+            scheduler.release(test.test_id)
+
+
+watcher = EventsWatcher()
@@ -3,10 +3,6 @@ import random
 from datetime import datetime, timedelta
 
 
-def get_port_from_range(start=8080, end=8090):
-    return random.randint(start, end)
-
-
 def _random_supplier_id():
     return random.randint(10000, 11000)
 
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from models.config import CustomScenario
+from models.config import ArrivalScenario, CustomScenario, RpsScenario
 
 
 def generate_custom_scenario_file(project: str, custom_scenario: CustomScenario) -> str:
@@ -12,7 +12,7 @@ Generated at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 from locust import LoadTestShape
 
 class CustomLoadShape(LoadTestShape):
-    config = {custom_scenario.model_dump_json(indent=4)}
+    config = {custom_scenario.model_dump_json(include={"stages"}, indent=4)}
 
     def tick(self):
         run_time = self.get_run_time()
@@ -22,3 +22,82 @@ class CustomLoadShape(LoadTestShape):
                 return (stage["users"], stage["spawn_rate"])
         return None
 '''
+
+
+def generate_rps_scenario_file(project: str, rps_scenario: RpsScenario) -> str:
+    config = rps_scenario.model_dump_json(include={"rps_stages", "max_users", "initial_users", "spawn_rate"}, indent=4)
+    return f'''"""
+Auto-generated LoadTestShape for {project}
+Generated at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+"""
+
+import logging
+
+from locust import LoadTestShape
+
+logger = logging.getLogger("rps_scenario")
+
+ADJUST_INTERVAL = 10  # in sec, about the window of Locust's current RPS
+GAIN = 0.5  # share of the missing users added at each adjustment, lower is slower but steadier
+
+
+class TargetRpsShape(LoadTestShape):
+    """Feedback loop on the measured throughput: every `ADJUST_INTERVAL` the users are moved towards
+    `target RPS / RPS per user`, a new stage scales them by the ratio of its target to the previous one."""
+
+    config = {config}
+
+    users = None
+    stage = None
+    adjusted_at = 0
+
+    def tick(self):
+        run_time = self.get_run_time()
+        stage = next((s for s in self.config["rps_stages"] if run_time < s["duration"]), None)
+        if stage is None:
+            return None
+
+        max_users = self.config["max_users"]
+        if self.users is None:
+            self.users = self.config["initial_users"]
+        elif stage is not self.stage and self.stage["rps"] > 0:
+            self.users *= stage["rps"] / self.stage["rps"]
+            self.adjusted_at = run_time
+        elif run_time - self.adjusted_at >= ADJUST_INTERVAL:
+            self.adjusted_at = run_time
+            user_count = self.runner.user_count
+            current_rps = self.runner.stats.total.current_rps
+            if user_count and current_rps > 0:
+                needed = stage["rps"] * user_count / current_rps
+                self.users += GAIN * (needed - self.users)
+                if needed > max_users:
+                    logger.warning(
+                        "Target of %s RPS needs about %.0f users, over max_users %s", stage["rps"], needed, max_users
+                    )
+            elif user_count >= round(self.users):
+                self.users *= 2  # no requests measured yet
+        self.stage = stage
+
+        self.users = max(1, min(max_users, self.users))
+        return (round(self.users), self.config["spawn_rate"])
+'''
+
+
+def generate_arrival_scenario_file(project: str, arrival_scenario: ArrivalScenario) -> str:
+    config = arrival_scenario.model_dump_json(
+        include={"arrival_stages", "max_concurrency", "spawn_rate", "workers"}, indent=4
+    )
+    return f'''"""
+Auto-generated LoadTestShape for {project}
+Generated at: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+"""
+
+import arrivals  # tests/arrivals.py, configured in every Locust process
+from locust import LoadTestShape
+
+arrivals.configure({config})
+
+class ArrivalLoadShape(LoadTestShape):
+    def tick(self):
+        return arrivals.tick(self.get_run_time())
+'''
@@ -0,0 +1,127 @@
+import math
+import struct
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+logger = getLogger(__name__)
+
+# log-spaced buckets, a value is within RELATIVE_ACCURACY of its bucket's value whatever its magnitude;
+# `tests/histograms.py` records with the same ones inside Locust
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_VALUE = 0.01  # in ms, faster responses share one bucket
+
+HISTOGRAMS_FILE = "histograms.bin"  # `{csv prefix}_histograms.bin` written by `tests/histograms.py`
+CORRECTED_FILE = "corrected_histograms.bin"  # the same of latencies corrected for coordinated omission
+HISTOGRAMS_MAGIC = b"LSH1"
+HISTOGRAMS_INTERVAL = 10  # in sec
+_RECORD = struct.Struct("<qHHH")
+
+
+def bucket(value: float) -> int:
+    return math.ceil(math.log(max(value, MIN_VALUE)) / LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    return 2 * GAMMA**index / (GAMMA + 1)
+
+
+def _level(percentile: str) -> float:
+    """`99.9%` -> `0.999`"""
+    return float(percentile.rstrip("%")) / 100
+
+
+@dataclass
+class Histogram:
+    """Response times as counts per log bucket; histograms of any intervals, endpoints or runs merge by adding counts,
+    so the percentiles of the merged one are those of all their requests, not an average of percentiles."""
+
+    counts: dict[int, float] = field(default_factory=dict)  # bucket -> requests
+
+    @classmethod
+    def from_percentiles(cls, percentiles: dict[str, float], count: float) -> "Histogram":
+        """Best guess of an interval that only has Locust's percentiles: each percentile's share of the `count`
+        requests (e.g. 66% - 50% = 16% for `66%`) is put in its value's bucket. Missing values pass their share on."""
+        histogram = cls()
+        if count <= 0:
+            return histogram
+        below = 0.0
+        for percentile, value in sorted(percentiles.items(), key=lambda item: _level(item[0])):
+            if value is None or math.isnan(value):
+                continue
+            level = _level(percentile)
+            histogram.add(value, (level - below) * count)
+            below = level
+        return histogram
+
+    @property
+    def total(self) -> float:
+        return sum(self.counts.values())
+
+    def add(self, value: float, count: float = 1) -> None:
+        if count > 0:
+            index = bucket(value)
+            self.counts[index] = self.counts.get(index, 0.0) + count
+
+    def add_bucket(self, index: int, count: float) -> None:
+        self.counts[index] = self.counts.get(index, 0.0) + count
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0.0) + count
+
+    def quantiles(self, levels: list[float]) -> list[float | None]:
+        """Values at the `levels` (0..1) in one pass over the sorted buckets."""
+        total = self.total
+        if total <= 0:
+            return [None] * len(levels)
+        result: list[float | None] = [None] * len(levels)
+        order = sorted(range(len(levels)), key=lambda i: levels[i])
+        k = 0
+        seen = 0.0
+        indexes = sorted(self.counts)
+        for index in indexes:
+            seen += self.counts[index]
+            # a relative epsilon keeps float32 sums of shares from missing their own bucket
+            while k < len(order) and seen >= levels[order[k]] * total * (1 - 1e-6):
+                result[order[k]] = bucket_value(index)
+                k += 1
+        while k < len(order):
+            result[order[k]] = bucket_value(indexes[-1])
+            k += 1
+        return result
+
+    def percentiles(self, percentiles: list[str]) -> dict[str, float | None]:
+        return dict(zip(percentiles, self.quantiles([_level(p) for p in percentiles]), strict=True))
+
+
+def read_histograms(path: Path) -> dict[tuple[str, str], dict[int, Histogram]]:
+    """Recorded histograms per `(type, name)` and interval start; a truncated last record (a killed run) is skipped."""
+    data = path.read_bytes()
+    result: dict[tuple[str, str], dict[int, Histogram]] = {}
+    if not data.startswith(HISTOGRAMS_MAGIC):
+        logger.warning("%s is not a histograms file", path)
+        return result
+
+    offset = len(HISTOGRAMS_MAGIC)
+    while offset + _RECORD.size <= len(data):
+        interval, type_size, name_size, size = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        end = offset + type_size + name_size + size * 6
+        if end > len(data):
+            logger.warning("%s is truncated", path)
+            break
+        request_type = data[offset : offset + type_size].decode("utf-8", errors="replace")
+        offset += type_size
+        name = data[offset : offset + name_size].decode("utf-8", errors="replace")
+        offset += name_size
+        buckets = struct.unpack_from(f"<{size}h", data, offset)
+        counts = struct.unpack_from(f"<{size}I", data, offset + size * 2)
+        offset = end
+
+        histogram = result.setdefault((request_type, name), {}).setdefault(interval, Histogram())
+        for index, count in zip(buckets, counts, strict=True):
+            histogram.add_bucket(index, count)
+    return result
@@ -0,0 +1,113 @@
+import hashlib
+import shutil
+import threading
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+from docker.errors import ImageNotFound
+
+from config.settings import settings
+from utils.docker import Docker
+
+logger = getLogger(__name__)
+
+TESTS_DIR = Path("./tests")
+REQUIREMENTS_FILE = "requirements.txt"
+
+
+@dataclass
+class ImageBuilder:
+    """Builds `locust-swarm/{project}:{hash}` images with the project's tests (and requirements) baked in."""
+
+    _hashes: dict[str, tuple[tuple, str]] = field(default_factory=dict)
+    _built: dict[tuple[str, str], str] = field(default_factory=dict)  # (engine, project) -> tag
+    _locks: dict[str, threading.Lock] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def project_files(self, project: str) -> list[Path]:
+        """Shared modules from `tests/` plus everything under `tests/{project}/`."""
+        files = [p for p in TESTS_DIR.iterdir() if p.is_file() and p.suffix == ".py"]
+        files += [p for p in (TESTS_DIR / project).rglob("*") if p.is_file() and "__pycache__" not in p.parts]
+        return sorted(files)
+
+    def project_hash(self, project: str) -> str:
+        files = self.project_files(project)
+        signature = tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+
+        cached = self._hashes.get(project)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha256(settings.base_image.encode())
+        for file_path in files:
+            digest.update(str(file_path.relative_to(TESTS_DIR)).encode())
+            digest.update(file_path.read_bytes())
+
+        project_hash = digest.hexdigest()[:16]
+        self._hashes[project] = (signature, project_hash)
+        return project_hash
+
+    def get_image(self, project: str, engine: Docker) -> str:
+        """Return the image tag for the project's current tests, building it once per content hash and engine."""
+        tag = f"locust-swarm/{project}:{self.project_hash(project)}"
+
+        with self._lock:
+            lock = self._locks.setdefault(project, threading.Lock())
+
+        with lock:
+            if self._built.get((engine.name, project)) == tag:
+                return tag
+
+            try:
+                engine.get().images.get(tag)
+                logger.debug("Image %s already exists on %s", tag, engine.name)
+            except ImageNotFound:
+                self._build(project, tag, engine)
+
+            self._built[(engine.name, project)] = tag
+        return tag
+
+    def _build(self, project: str, tag: str, engine: Docker) -> None:
+        context_dir = Path(settings.tmp_path) / "images" / project
+        shutil.rmtree(context_dir, ignore_errors=True)
+        (context_dir / "tests").mkdir(parents=True)
+
+        for file_path in self.project_files(project):
+            target = context_dir / "tests" / file_path.relative_to(TESTS_DIR)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(file_path, target)
+
+        dockerfile = [f"FROM {settings.base_image}"]
+        if (TESTS_DIR / project / REQUIREMENTS_FILE).exists():
+            dockerfile += [
+                f"COPY tests/{project}/{REQUIREMENTS_FILE} /opt/{REQUIREMENTS_FILE}",
+                f"RUN pip install --no-cache-dir -r /opt/{REQUIREMENTS_FILE}",
+            ]
+        dockerfile += ["COPY tests/ /tests/"]
+        (context_dir / "Dockerfile").write_text("\n".join(dockerfile) + "\n", encoding="utf-8")
+
+        logger.info("Building image %s on %s...", tag, engine.name)
+        engine.get().images.build(
+            path=str(context_dir.absolute()),
+            tag=tag,
+            rm=True,
+            labels={"locust-swarm.project": project},
+        )
+        logger.info("Built image %s", tag)
+        shutil.rmtree(context_dir, ignore_errors=True)
+
+        self._remove_old_images(project, tag, engine)
+
+    def _remove_old_images(self, project: str, keep: str, engine: Docker) -> None:
+        for image in engine.get().images.list(name=f"locust-swarm/{project}"):
+            if keep in image.tags:
+                continue
+            try:
+                engine.get().images.remove(image.id)
+                logger.debug("Removed old image %s", image.tags)
+            except Exception as e:
+                logger.debug("Failed to remove old image %s: %s", image.tags, e)
+
+
+images = ImageBuilder()
@@ -0,0 +1,145 @@
+import os
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import getLogger
+from threading import Lock
+
+from pydantic import BaseModel
+
+from config.settings import settings
+from db.db import database as db
+from models.jobs import JobInfo
+
+logger = getLogger(__name__)
+
+FINISHED = ("done", "failed")
+QUEUED = "queued"  # in the scheduler's stored queue, not held by any process
+
+_tokens: dict[int, str] = {}
+
+
+def process_token(pid: int | None = None) -> str:
+    """`{pid}:{start time}` of a process (this one by default), so a pid reused after a restart is another process."""
+    pid = pid or os.getpid()
+    if pid == os.getpid() and pid in _tokens:
+        return _tokens[pid]
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            # the command in parentheses may hold spaces, the start time is the 20th field after it
+            start = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        start = ""  # no procfs, the pid alone
+    token = f"{pid}:{start}"
+    if pid == os.getpid():
+        _tokens[pid] = token
+    return token
+
+
+def process_alive(token: str) -> bool:
+    pid = int(token.split(":", 1)[0])
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, owned by another user
+    return process_token(pid) == token
+
+
+@dataclass
+class JobQueue:
+    """Runs container lifecycle work (start/stop) off the request thread. Jobs are stored in the database, so any
+    gunicorn worker reports them and they outlive a recycled worker; a job its process left unfinished has failed."""
+
+    max_workers: int
+    max_jobs: int = 200
+    _executor: ThreadPoolExecutor | None = None
+    _lock: Lock = field(default_factory=Lock)
+
+    def submit(self, kind: str, key: str, fn: Callable[..., BaseModel], *args) -> JobInfo:
+        """Queue `fn(job, *args)`; a pending/running job with the same key is returned instead of a new one."""
+        job, created = self.create(kind, key)
+        if created:
+            self.run(job, fn, *args)
+        return job
+
+    def create(self, kind: str, key: str) -> tuple[JobInfo, bool]:
+        """Register a pending job without running it, or return the unfinished job with the same key."""
+        for job, owner in db.get_unfinished_jobs(key):
+            self._check_owner(job, owner)
+
+        now = datetime.now().isoformat()
+        job = JobInfo(
+            job_id=uuid.uuid4().hex,
+            kind=kind,
+            key=key,
+            status="pending",
+            created_at=now,
+            updated_at=now,
+        )
+        existing = db.add_job(job, process_token())
+        if existing is not None:
+            logger.debug("Job %s for %s is already queued", existing.job_id, key)
+            return existing, False
+        db.remove_finished_jobs(keep=self.max_jobs)
+        return job, True
+
+    def run(self, job: JobInfo, fn: Callable[..., BaseModel], *args) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._executor.submit(self._run, job, fn, *args)
+
+    def fail(self, job: JobInfo, error: str) -> None:
+        job.error = error
+        job.status = "failed"
+        job.updated_at = datetime.now().isoformat()
+        self._save(job)
+
+    def get(self, job_id: str) -> JobInfo | None:
+        stored = db.get_job(job_id)
+        if stored is None:
+            return None
+        job, owner = stored
+        self._check_owner(job, owner)
+        return job
+
+    def progress(self, job: JobInfo, message: str) -> None:
+        logger.debug("Job %s: %s", job.job_id, message)
+        job.progress = message
+        job.updated_at = datetime.now().isoformat()
+        self._save(job)
+
+    def _save(self, job: JobInfo) -> None:
+        db.update_job(job, process_token())
+
+    def _check_owner(self, job: JobInfo, owner: str) -> None:
+        """Fail an unfinished job whose process exited (a recycled gunicorn worker killed mid-job, a restart)."""
+        if job.status in FINISHED or job.status == QUEUED or process_alive(owner):
+            return
+        logger.warning("Job %s (%s) was left %s by process %s", job.job_id, job.kind, job.status, owner)
+        job.error = f"Interrupted, its process exited while {job.status}"
+        job.status = "failed"
+        job.updated_at = datetime.now().isoformat()
+        db.update_job(job, owner)
+
+    def _run(self, job: JobInfo, fn: Callable[..., BaseModel], *args) -> None:
+        job.status = "running"
+        job.updated_at = datetime.now().isoformat()
+        self._save(job)
+        try:
+            result = fn(job, *args)
+            job.result = result.model_dump()
+            job.status = "done"
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job.job_id, job.kind, e)
+            self.fail(job, str(e))
+            return
+        job.updated_at = datetime.now().isoformat()
+        self._save(job)
+
+
+jobs = JobQueue(max_workers=settings.job_workers)
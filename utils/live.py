@@ -0,0 +1,292 @@
+import csv
+import io
+import json
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+import requests
+
+from config.settings import settings
+from db.db import database as db
+from models.live import LiveEndpoint, LiveSample
+from models.tests import TestInfo
+from utils.docker import engines
+from utils.test_ids import results_dir as test_results_dir
+
+logger = getLogger(__name__)
+
+IDLE_TIMEOUT = 30  # in sec, a poller without clients stops
+KEEPALIVE_INTERVAL = 15  # in sec, also how soon a closed connection is noticed
+REFRESH_INTERVAL = 2  # in sec, running tests are looked up for new pollers at most this often
+POLL_TIMEOUT = 5  # in sec
+MAX_BACKFILL = 1024 * 1024  # bytes of an existing history read when a tailer starts, only recent samples are kept
+HISTORY_FILE = "stats_stats_history.csv"  # `--csv {results_path}/stats`
+
+
+def _percentile_label(key: str) -> str:
+    """`response_time_percentile_0.95` -> `95%`"""
+    return f"{float(key.rsplit('_', 1)[-1]) * 100:g}%"
+
+
+def _frame(event: str, event_id: int, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+@dataclass
+class LivePoller:
+    """The one poller of a web-mode test in this process, its recent samples as ready-to-send frames in a ring buffer.
+    Its `url` is the master's `/stats/requests`."""
+
+    test: TestInfo
+    url: str
+    hub: "LiveHub"
+    frames: deque[tuple[int, str]] = field(default_factory=lambda: deque(maxlen=settings.live_history))
+    last_seen: float = field(default_factory=time.monotonic)  # last client activity
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name=f"live-{self.test.test_id}", daemon=True).start()
+        logger.info("Live stats %s started for %s", type(self).__name__, self.test.test_id)
+
+    def _run(self) -> None:
+        finished = False
+        while time.monotonic() - self.last_seen < IDLE_TIMEOUT:
+            test = db.get_test(self.test.test_id)
+            if test is None or test.status != "running":
+                finished = True
+                break
+            try:
+                for sample in self.poll():
+                    self.hub.publish(self, sample)
+            except Exception as e:
+                logger.debug("Live stats of %s not available: %s", self.test.test_id, e)
+            time.sleep(settings.live_poll_interval)
+
+        self.hub.remove(self, finished)
+        logger.info("Live stats %s stopped for %s", type(self).__name__, self.test.test_id)
+
+    def poll(self) -> list[dict]:
+        """New samples, `LiveSample` fields without the event id."""
+        response = requests.get(self.url, timeout=POLL_TIMEOUT)
+        response.raise_for_status()
+        return [self._from_stats(response.json())]
+
+    def _from_stats(self, stats: dict) -> dict:
+        """Sample of the master's `/stats/requests`."""
+        percentiles = {
+            _percentile_label(key): value
+            for key, value in (stats.get("current_response_time_percentiles") or {}).items()
+        }
+        for key in ("current_response_time_percentile_50", "current_response_time_percentile_95"):  # older Locust
+            if key in stats:
+                percentiles.setdefault(f"{key.rsplit('_', 1)[-1]}%", stats[key])
+
+        return dict(
+            test_id=self.test.test_id,
+            source="web",
+            time=time.time(),
+            state=stats.get("state", ""),
+            user_count=stats.get("user_count", 0),
+            rps=stats.get("total_rps", 0.0),
+            fail_per_sec=stats.get("total_fail_per_sec", 0.0),
+            fail_ratio=stats.get("fail_ratio", 0.0),
+            percentiles=percentiles,
+            endpoints=[
+                LiveEndpoint(
+                    method=row.get("method"),
+                    name=row.get("name", ""),
+                    num_requests=row.get("num_requests", 0),
+                    num_failures=row.get("num_failures", 0),
+                    rps=row.get("current_rps", 0.0),
+                    fail_per_sec=row.get("current_fail_per_sec", 0.0),
+                    avg_response_time=row.get("avg_response_time"),
+                    median_response_time=row.get("median_response_time"),
+                    p95_response_time=row.get("response_time_percentile_0.95"),
+                    p99_response_time=row.get("response_time_percentile_0.99", row.get("ninety_ninth_response_time")),
+                )
+                for row in stats.get("stats", [])
+            ],
+        )
+
+
+def _number(value: str | None) -> float | None:
+    try:
+        return float(value) if value not in (None, "", "N/A") else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class HistoryTailer(LivePoller):
+    """Follows `stats_history.csv` of a headless test in the bind-mounted results directory (its `url`), reading only
+    the bytes appended since the last poll. Locust writes the endpoints of an interval first, its `Aggregated` row
+    last."""
+
+    offset: int = 0
+    header: list[str] | None = None
+    pending: list[dict[str, str]] = field(default_factory=list)  # endpoint rows of the interval being written
+
+    def poll(self) -> list[dict]:
+        path = Path(self.url)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return []  # Locust has not written its first interval yet
+        if size < self.offset:  # rewritten from the start
+            self.offset, self.header, self.pending = 0, None, []
+
+        with open(path, "rb") as f:
+            if self.header is None:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    return []
+                self.header = next(csv.reader([line.decode("utf-8")]))
+                self.offset = len(line)
+                if size - self.offset > MAX_BACKFILL:
+                    # joined a long run, skip to the last complete line before the backfill window
+                    f.seek(size - MAX_BACKFILL)
+                    self.offset = size - MAX_BACKFILL + len(f.readline())
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self.offset += end + 1
+
+        samples = []
+        for values in csv.reader(io.StringIO(data[: end + 1].decode("utf-8"))):
+            row = dict(zip(self.header, values, strict=False))
+            if row.get("Name") != "Aggregated":
+                self.pending.append(row)
+                continue
+            samples.append(
+                self._from_rows(row, [r for r in self.pending if r.get("Timestamp") == row.get("Timestamp")])
+            )
+            self.pending = []
+        return samples[-settings.live_history :]  # older ones would drop out of the ring buffer at once
+
+    def _from_rows(self, total: dict[str, str], rows: list[dict[str, str]]) -> dict:
+        """Sample of one interval of `stats_history.csv`."""
+        requests_count = int(_number(total.get("Total Request Count")) or 0)
+        failures_count = int(_number(total.get("Total Failure Count")) or 0)
+        percentiles = {key: _number(value) for key, value in total.items() if key.endswith("%")}
+        return dict(
+            test_id=self.test.test_id,
+            source="history",
+            time=_number(total.get("Timestamp")) or time.time(),
+            state="running",
+            user_count=int(_number(total.get("User Count")) or 0),
+            rps=_number(total.get("Requests/s")) or 0.0,
+            fail_per_sec=_number(total.get("Failures/s")) or 0.0,
+            fail_ratio=failures_count / requests_count if requests_count else 0.0,
+            percentiles=percentiles,
+            endpoints=[
+                LiveEndpoint(
+                    method=row.get("Type") or None,
+                    name=row.get("Name", ""),
+                    num_requests=int(_number(row.get("Total Request Count")) or 0),
+                    num_failures=int(_number(row.get("Total Failure Count")) or 0),
+                    rps=_number(row.get("Requests/s")) or 0.0,
+                    fail_per_sec=_number(row.get("Failures/s")) or 0.0,
+                    avg_response_time=_number(row.get("Total Average Response Time")),
+                    median_response_time=_number(row.get("Total Median Response Time")),
+                    p95_response_time=_number(row.get("95%")),
+                    p99_response_time=_number(row.get("99%")),
+                )
+                for row in rows
+            ],
+        )
+
+
+@dataclass
+class LiveHub:
+    """Fans the samples of one poller per running test out to any number of SSE clients."""
+
+    _pollers: dict[str, LivePoller] = field(default_factory=dict)
+    _finished: deque[tuple[int, str, str]] = field(default_factory=lambda: deque(maxlen=64))  # (id, test_id, frame)
+    _changed: threading.Condition = field(default_factory=threading.Condition)
+    _last_id: int = 0
+    _refreshed: float = 0.0
+
+    def refresh(self, force: bool = False) -> None:
+        """Start pollers of running tests that don't have one: web-mode tests are polled, headless ones tailed."""
+        with self._changed:
+            if not force and time.monotonic() - self._refreshed < REFRESH_INTERVAL:
+                return
+            self._refreshed = time.monotonic()
+            for test in db.get_tests():
+                if test.status != "running" or test.test_id in self._pollers:
+                    continue
+                engine = engines.for_test(test)
+                if test.in_web and test.web_port:
+                    url = f"{engine.web_host}:{test.web_port}/stats/requests"
+                    poller = LivePoller(test=test, url=url, hub=self)
+                elif not test.in_web and engine.shares_files:
+                    # remote engines have no bind mount, their results are fetched when the test ends;
+                    # `test.project` is the display name, the results directory is named after the config key
+                    path = test_results_dir(test.test_id) / HISTORY_FILE
+                    poller = HistoryTailer(test=test, url=str(path), hub=self)
+                else:
+                    continue
+                self._pollers[test.test_id] = poller
+                poller.start()
+
+    def is_live(self, test_id: str) -> bool:
+        self.refresh(force=True)
+        with self._changed:
+            return test_id in self._pollers
+
+    def publish(self, poller: LivePoller, fields: dict) -> None:
+        with self._changed:
+            self._last_id = max(int(time.time() * 1000), self._last_id + 1)
+            sample = LiveSample(id=self._last_id, **fields)
+            poller.frames.append((sample.id, _frame("sample", sample.id, sample.model_dump_json())))
+            self._changed.notify_all()
+
+    def remove(self, poller: LivePoller, finished: bool) -> None:
+        with self._changed:
+            if self._pollers.get(poller.test.test_id) is poller:
+                del self._pollers[poller.test.test_id]
+            if finished:
+                self._last_id = max(int(time.time() * 1000), self._last_id + 1)
+                data = json.dumps({"test_id": poller.test.test_id})
+                self._finished.append((self._last_id, poller.test.test_id, _frame("end", self._last_id, data)))
+            self._changed.notify_all()
+
+    def stream(self, test_ids: set[str] | None = None, last_event_id: int = 0) -> Iterator[str]:
+        """SSE frames of the tests (all if `None`): the buffered history after `last_event_id`, then live samples."""
+        yield f"retry: {REFRESH_INTERVAL * 1000}\n\n"
+        last_id = last_event_id
+        last_sent = time.monotonic()
+        while True:
+            self.refresh()
+            with self._changed:
+                frames = []
+                for test_id, poller in self._pollers.items():
+                    if test_ids is None or test_id in test_ids:
+                        poller.last_seen = time.monotonic()
+                        frames.extend(frame for frame in poller.frames if frame[0] > last_id)
+                frames.extend(
+                    (event_id, frame)
+                    for event_id, test_id, frame in self._finished
+                    if event_id > last_id and (test_ids is None or test_id in test_ids)
+                )
+                if not frames:
+                    self._changed.wait(timeout=REFRESH_INTERVAL)
+
+            if frames:
+                frames.sort()
+                last_id = frames[-1][0]
+                last_sent = time.monotonic()
+                yield "".join(frame for _, frame in frames)
+            elif time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+
+
+live = LiveHub()
@@ -0,0 +1,672 @@
+import csv
+import math
+import shutil
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from config.settings import settings
+from models.metrics import (
+    PERCENTILES,
+    RESOLUTIONS,
+    ArrivalStats,
+    EndpointRef,
+    EndpointSeries,
+    EndpointStats,
+    ExceptionInfo,
+    FailureInfo,
+    MergedPercentiles,
+    RunMetrics,
+    RunMetricsMeta,
+    SeriesMeta,
+    WindowSummary,
+)
+from utils.histogram import CORRECTED_FILE, HISTOGRAMS_FILE, HISTOGRAMS_INTERVAL, Histogram, read_histograms
+from utils.test_ids import split_test_id
+
+logger = getLogger(__name__)
+
+VERSION = 2
+# `--csv {results_path}/stats` writes stats_stats.csv, stats_stats_history.csv, ...
+CSV_PREFIX = "stats_"
+ARRIVALS_FILE = "arrivals.csv"  # `{csv prefix}_arrivals.csv` written by `tests/arrivals.py`
+SOURCE_FILES = [
+    "stats.csv",
+    "stats_history.csv",
+    "failures.csv",
+    "exceptions.csv",
+    HISTOGRAMS_FILE,
+    CORRECTED_FILE,
+    ARRIVALS_FILE,
+]
+
+# column -> (typecode, header in stats_history.csv); float32 is plenty for rates and milliseconds
+HISTORY_COLUMNS: dict[str, tuple[str, str]] = {
+    "timestamp": ("q", "Timestamp"),
+    "user_count": ("i", "User Count"),
+    "rps": ("f", "Requests/s"),
+    "fps": ("f", "Failures/s"),
+    **{f"p{p.rstrip('%')}": ("f", p) for p in PERCENTILES},
+    "total_requests": ("q", "Total Request Count"),
+    "total_failures": ("q", "Total Failure Count"),
+    "total_average_response_time": ("f", "Total Average Response Time"),
+}
+FLOAT_TYPECODES = ("f", "d")
+# merged histograms of the rows of a rollup: row `i` owns the entries `sketch_offset[i]..sketch_offset[i + 1]`
+SKETCH_COLUMNS = {"sketch_offset": "q", "sketch_bucket": "h", "sketch_count": "f"}
+# the same of the latencies corrected for coordinated omission, rollups of runs with `corrected_latency`
+CORRECTED_COLUMNS = {
+    **{f"corrected_p{p.rstrip('%')}": "f" for p in PERCENTILES},
+    **{f"corrected_{column}": typecode for column, typecode in SKETCH_COLUMNS.items()},
+}
+
+RAW = RESOLUTIONS[0]  # the history as Locust writes it, every second
+MAX_POINTS = 1000  # rows per endpoint of an automatically chosen resolution
+
+
+def _float(value: str | None) -> float:
+    try:
+        return float(value) if value not in (None, "", "N/A") else math.nan
+    except ValueError:
+        return math.nan
+
+
+def _int(value: str | None) -> int:
+    number = _float(value)
+    return 0 if math.isnan(number) else int(number)
+
+
+def _optional(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+def _read_csv(path: Path) -> list[dict[str, str]]:
+    if not path.exists():
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _read_recorded(path: Path) -> dict[tuple[str, str], dict[int, Histogram]] | None:
+    """Histograms recorded by `tests/histograms.py`, with the `Aggregated` ones of all endpoints."""
+    if not path.exists():
+        return None
+    recorded = read_histograms(path)
+    aggregated: dict[int, Histogram] = {}
+    for intervals in recorded.values():
+        for interval, histogram in intervals.items():
+            aggregated.setdefault(interval, Histogram()).merge(histogram)
+    recorded[("", "Aggregated")] = aggregated
+    return recorded
+
+
+def _read_arrivals(path: Path) -> ArrivalStats | None:
+    """Totals of the intervals, an interval may have several rows."""
+    if not path.exists():
+        return None
+    totals = {"scheduled": 0, "started": 0, "late": 0, "dropped": 0}
+    for row in _read_csv(path):
+        for key in totals:
+            totals[key] += _int(row.get(key.capitalize()))
+    return ArrivalStats(**totals)
+
+
+def _read_meta(path: Path) -> RunMetricsMeta | None:
+    """`None` if missing or written by an older version, the run is then ingested again."""
+    try:
+        meta = RunMetricsMeta.model_validate_json(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValidationError):
+        return None
+    return meta if meta.version == VERSION else None
+
+
+@dataclass
+class Series:
+    """History of a run at one resolution, rows sorted by endpoint and time."""
+
+    resolution: int
+    columns: dict[str, array]
+    endpoints: list[EndpointRef]
+    rollup: "Series | None" = None  # the next coarser one, merged histograms of whole intervals are read from it
+
+    def endpoint(self, key: tuple[str, str]) -> EndpointRef | None:
+        return next((e for e in self.endpoints if (e.type, e.name) == key), None)
+
+    def histogram(self, endpoint: EndpointRef, start: int, end: int, corrected: bool = False) -> Histogram:
+        """Merged histogram of the rows `start..end` of the endpoint, of the `corrected` latencies if asked."""
+        histogram = Histogram()
+        columns = self.columns
+        prefix = "corrected_" if corrected else ""
+        if f"{prefix}sketch_offset" in columns:
+            offsets = columns[f"{prefix}sketch_offset"]
+            buckets, counts = columns[f"{prefix}sketch_bucket"], columns[f"{prefix}sketch_count"]
+            for i in range(offsets[start], offsets[end]):
+                histogram.add_bucket(buckets[i], counts[i])
+            return histogram
+
+        if end <= start:
+            return histogram
+        rows = range(start, end)
+        timestamps = columns["timestamp"]
+        rollup_endpoint = self.rollup.endpoint((endpoint.type, endpoint.name)) if self.rollup else None
+        if corrected:
+            # only rollups have corrected latencies, the intervals overlapping the window are merged
+            if rollup_endpoint is None or "corrected_sketch_offset" not in self.rollup.columns:
+                return histogram
+            resolution = self.rollup.resolution
+            rollup_timestamps = self.rollup.columns["timestamp"]
+            first = timestamps[start] - timestamps[start] % resolution
+            i = bisect_left(rollup_timestamps, first, rollup_endpoint.start, rollup_endpoint.end)
+            j = bisect_right(rollup_timestamps, timestamps[end - 1], i, rollup_endpoint.end)
+            return self.rollup.histogram(rollup_endpoint, i, j, corrected=True)
+        if rollup_endpoint is not None:
+            # intervals of the rollup that lie within the window, only the rows around them are merged here
+            resolution = self.rollup.resolution
+            first = -(-timestamps[start] // resolution) * resolution
+            last = (timestamps[end - 1] + 1) // resolution * resolution  # end of the last whole interval
+            rollup_timestamps = self.rollup.columns["timestamp"]
+            i = bisect_left(rollup_timestamps, first, rollup_endpoint.start, rollup_endpoint.end)
+            j = bisect_left(rollup_timestamps, last, i, rollup_endpoint.end)
+            if i < j:
+                histogram.merge(self.rollup.histogram(rollup_endpoint, i, j))
+                inner_start = bisect_left(timestamps, first, start, end)
+                inner_end = bisect_left(timestamps, last, inner_start, end)
+                rows = [*range(start, inner_start), *range(inner_end, end)]
+
+        # the raw history only has percentiles, weighted by the requests of each interval
+        totals = columns["total_requests"]
+        for i in rows:
+            requests = totals[i] - (totals[i - 1] if i > endpoint.start else 0)
+            percentiles = {p: columns[f"p{p.rstrip('%')}"][i] for p in PERCENTILES}
+            histogram.merge(Histogram.from_percentiles(percentiles, requests))
+        return histogram
+
+
+@dataclass
+class _Rollup:
+    """Row of a rollup being built."""
+
+    timestamp: int
+    histogram: Histogram = field(default_factory=Histogram)
+    corrected: Histogram = field(default_factory=Histogram)
+    user_count: int = 0
+    rps: list[float] = field(default_factory=list)
+    fps: list[float] = field(default_factory=list)
+    last: int = 0  # raw row with the cumulative totals at the end of the interval
+
+
+def _mean(values: list[float]) -> float:
+    values = [v for v in values if not math.isnan(v)]
+    return sum(values) / len(values) if values else math.nan
+
+
+def rollup(
+    raw: Series,
+    resolutions: list[int],
+    recorded: dict[tuple[str, str], dict[int, Histogram]] | None = None,
+    corrected: dict[tuple[str, str], dict[int, Histogram]] | None = None,
+) -> dict[int, Series]:
+    """Coarser series of the raw history in one pass: per interval the highest user count, the mean rates, the
+    cumulative totals at its end and the merged histogram, whose percentiles are the interval's percentiles.
+    The histograms are the `recorded` ones of the endpoint if there are, else estimated from the percentiles;
+    `corrected` ones are kept next to them."""
+    rollups = {
+        resolution: Series(
+            resolution=resolution,
+            columns={
+                **{column: array(typecode) for column, (typecode, _) in HISTORY_COLUMNS.items()},
+                **{column: array(typecode) for column, typecode in SKETCH_COLUMNS.items()},
+                **{column: array(typecode) for column, typecode in CORRECTED_COLUMNS.items() if corrected is not None},
+            },
+            endpoints=[],
+        )
+        for resolution in resolutions
+    }
+    for series in rollups.values():
+        series.columns["sketch_offset"].append(0)
+        if corrected is not None:
+            series.columns["corrected_sketch_offset"].append(0)
+
+    columns = raw.columns
+    for endpoint in raw.endpoints:
+        for series in rollups.values():
+            series.endpoints.append(
+                EndpointRef(type=endpoint.type, name=endpoint.name, start=len(series.columns["timestamp"]), end=0)
+            )
+
+        intervals = (recorded or {}).get((endpoint.type, endpoint.name))
+        corrected_intervals = (corrected or {}).get((endpoint.type, endpoint.name), {})
+        rows: dict[int, _Rollup | None] = dict.fromkeys(resolutions)
+        for i in range(endpoint.start, endpoint.end):
+            timestamp = columns["timestamp"][i]
+            histogram = None
+            if intervals is None:
+                requests = columns["total_requests"][i] - (
+                    columns["total_requests"][i - 1] if i > endpoint.start else 0
+                )
+                histogram = Histogram.from_percentiles(
+                    {p: columns[f"p{p.rstrip('%')}"][i] for p in PERCENTILES}, requests
+                )
+            for resolution, row in rows.items():
+                start = timestamp - timestamp % resolution
+                if row is None or row.timestamp != start:
+                    if row is not None:
+                        _append(rollups[resolution], row, columns)
+                    rows[resolution] = row = _Rollup(timestamp=start)
+                    for interval in range(start, start + resolution, HISTOGRAMS_INTERVAL):
+                        if intervals is not None and interval in intervals:
+                            row.histogram.merge(intervals[interval])
+                        if interval in corrected_intervals:
+                            row.corrected.merge(corrected_intervals[interval])
+                if histogram is not None:
+                    row.histogram.merge(histogram)
+                row.user_count = max(row.user_count, columns["user_count"][i])
+                row.rps.append(columns["rps"][i])
+                row.fps.append(columns["fps"][i])
+                row.last = i
+
+        for resolution, row in rows.items():
+            if row is not None:
+                _append(rollups[resolution], row, columns)
+            series = rollups[resolution]
+            series.endpoints[-1].end = len(series.columns["timestamp"])
+    return rollups
+
+
+def _append(series: Series, row: _Rollup, raw: dict[str, array]) -> None:
+    columns = series.columns
+    columns["timestamp"].append(row.timestamp)
+    columns["user_count"].append(row.user_count)
+    columns["rps"].append(_mean(row.rps))
+    columns["fps"].append(_mean(row.fps))
+    for p, value in row.histogram.percentiles(PERCENTILES).items():
+        columns[f"p{p.rstrip('%')}"].append(value if value is not None else math.nan)
+    for column in ("total_requests", "total_failures", "total_average_response_time"):
+        columns[column].append(raw[column][row.last])
+    _append_sketch(columns, "", row.histogram)
+    if "corrected_sketch_offset" in columns:
+        for p, value in row.corrected.percentiles(PERCENTILES).items():
+            columns[f"corrected_p{p.rstrip('%')}"].append(value if value is not None else math.nan)
+        _append_sketch(columns, "corrected_", row.corrected)
+
+
+def _append_sketch(columns: dict[str, array], prefix: str, histogram: Histogram) -> None:
+    for index in sorted(histogram.counts):
+        columns[f"{prefix}sketch_bucket"].append(index)
+        columns[f"{prefix}sketch_count"].append(histogram.counts[index])
+    columns[f"{prefix}sketch_offset"].append(len(columns[f"{prefix}sketch_bucket"]))
+
+
+@dataclass
+class LoadedRun:
+    meta: RunMetricsMeta
+    series: dict[int, Series]  # resolution -> series, without the raw one if `METRICS_KEEP_RAW` is off
+    meta_mtime_ns: int  # a re-ingest (possibly by another gunicorn worker) replaces meta.json
+    samples: dict = field(default_factory=dict)  # derived data (sorted samples of comparisons), dropped with the run
+
+    @property
+    def finest(self) -> Series:
+        return self.series[min(self.series)]
+
+
+@dataclass
+class MetricsStore:
+    """Locust CSVs of finished runs as typed columns in `{TMP_PATH}/metrics/{test_id}`, queried without the CSVs.
+    The history is kept as written and rolled up to 10s, 1m and 10m rows, one directory per resolution."""
+
+    cache_size: int = 32
+    _cache: OrderedDict[str, LoadedRun] = field(default_factory=OrderedDict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def run_dir(self, test_id: str) -> Path:
+        return Path(settings.metrics_path) / test_id
+
+    def source_signature(self, results_dir: Path) -> list[tuple[str, int, int]]:
+        signature = []
+        for name in SOURCE_FILES:
+            path = results_dir / f"{CSV_PREFIX}{name}"
+            if path.exists():
+                stat = path.stat()
+                signature.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return signature
+
+    def ingest(self, test_id: str, results_dir: Path) -> bool:
+        """Parse the run's CSVs into columns, skipped when the ingested copy is up to date."""
+        signature = self.source_signature(results_dir)
+        if not signature:
+            return False
+
+        meta = _read_meta(self.run_dir(test_id) / "meta.json")
+        if meta is not None and [tuple(s) for s in meta.source] == signature:
+            return False
+
+        files = {name: results_dir / f"{CSV_PREFIX}{name}" for name in SOURCE_FILES}
+
+        history = _read_csv(files["stats_history.csv"])
+        history.sort(key=lambda row: (row.get("Type", ""), row.get("Name", ""), _int(row.get("Timestamp"))))
+
+        columns = {column: array(typecode) for column, (typecode, _) in HISTORY_COLUMNS.items()}
+        endpoints: list[EndpointRef] = []
+        for i, row in enumerate(history):
+            key = (row.get("Type", ""), row.get("Name", ""))
+            if not endpoints or (endpoints[-1].type, endpoints[-1].name) != key:
+                endpoints.append(EndpointRef(type=key[0], name=key[1], start=i, end=i))
+            endpoints[-1].end = i + 1
+            for column, (typecode, header) in HISTORY_COLUMNS.items():
+                value = row.get(header)
+                columns[column].append(_float(value) if typecode in FLOAT_TYPECODES else _int(value))
+
+        recorded = _read_recorded(files[HISTOGRAMS_FILE])
+        corrected = _read_recorded(files[CORRECTED_FILE])
+
+        raw = Series(resolution=RAW, columns=columns, endpoints=endpoints)
+        series = rollup(raw, RESOLUTIONS[1:], recorded, corrected)
+        if settings.metrics_keep_raw:
+            series[RAW] = raw
+
+        meta = RunMetricsMeta(
+            version=VERSION,
+            source=signature,
+            columns={column: typecode for column, (typecode, _) in HISTORY_COLUMNS.items()},
+            series=[
+                SeriesMeta(
+                    resolution=resolution,
+                    rows=len(series[resolution].columns["timestamp"]),
+                    endpoints=series[resolution].endpoints,
+                    sketch_size=len(series[resolution].columns.get("sketch_bucket", ())),
+                    corrected_sketch_size=len(series[resolution].columns.get("corrected_sketch_bucket", ())),
+                )
+                for resolution in sorted(series)
+            ],
+            recorded=recorded is not None,
+            corrected=corrected is not None,
+            stats=[self._endpoint_stats(row) for row in _read_csv(files["stats.csv"])],
+            failures=[
+                FailureInfo(
+                    method=row.get("Method", ""),
+                    name=row.get("Name", ""),
+                    error=row.get("Error", ""),
+                    occurrences=_int(row.get("Occurrences")),
+                )
+                for row in _read_csv(files["failures.csv"])
+            ],
+            exceptions=[
+                ExceptionInfo(
+                    count=_int(row.get("Count")),
+                    message=row.get("Message", ""),
+                    traceback=row.get("Traceback", ""),
+                    nodes=row.get("Nodes", ""),
+                )
+                for row in _read_csv(files["exceptions.csv"])
+            ],
+            arrivals=_read_arrivals(files[ARRIVALS_FILE]),
+        )
+
+        run_dir = self.run_dir(test_id)
+        tmp_dir = run_dir.with_name(f".{test_id}.{uuid.uuid4().hex}")
+        for resolution, values_by_column in series.items():
+            series_dir = tmp_dir / f"{resolution}s"
+            series_dir.mkdir(parents=True)
+            for column, values in values_by_column.columns.items():
+                with open(series_dir / f"{column}.bin", "wb") as f:
+                    values.tofile(f)
+        (tmp_dir / "meta.json").write_text(meta.model_dump_json(), encoding="utf-8")
+
+        shutil.rmtree(run_dir, ignore_errors=True)
+        tmp_dir.rename(run_dir)
+        with self._lock:
+            self._cache.pop(test_id, None)
+
+        logger.info(
+            "Ingested %s history rows of %s endpoints for %s, rollups of %s rows",
+            len(history),
+            len(endpoints),
+            test_id,
+            sum(s.rows for s in meta.series if s.resolution != RAW),
+        )
+        return True
+
+    def load(self, test_id: str) -> LoadedRun | None:
+        run_dir = self.run_dir(test_id)
+        meta_path = run_dir / "meta.json"
+        try:
+            meta_mtime_ns = meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            loaded = self._cache.get(test_id)
+            if loaded is not None and loaded.meta_mtime_ns == meta_mtime_ns:
+                self._cache.move_to_end(test_id)
+                return loaded
+
+        meta = _read_meta(meta_path)
+        if meta is None:
+            return None
+        series = {}
+        for series_meta in meta.series:
+            series_dir = run_dir / f"{series_meta.resolution}s"
+            sizes = {column: series_meta.rows for column in meta.columns}
+            if series_meta.resolution != RAW:
+                sizes.update(
+                    sketch_offset=series_meta.rows + 1,
+                    sketch_bucket=series_meta.sketch_size,
+                    sketch_count=series_meta.sketch_size,
+                )
+                if meta.corrected:
+                    sizes.update({f"corrected_p{p.rstrip('%')}": series_meta.rows for p in PERCENTILES})
+                    sizes.update(
+                        corrected_sketch_offset=series_meta.rows + 1,
+                        corrected_sketch_bucket=series_meta.corrected_sketch_size,
+                        corrected_sketch_count=series_meta.corrected_sketch_size,
+                    )
+            columns = {}
+            for column, size in sizes.items():
+                values = array(meta.columns.get(column) or SKETCH_COLUMNS.get(column) or CORRECTED_COLUMNS[column])
+                with open(series_dir / f"{column}.bin", "rb") as f:
+                    values.fromfile(f, size)
+                columns[column] = values
+            series[series_meta.resolution] = Series(
+                resolution=series_meta.resolution, columns=columns, endpoints=series_meta.endpoints
+            )
+
+        if RAW in series and len(series) > 1:
+            series[RAW].rollup = series[RESOLUTIONS[1]]
+        loaded = LoadedRun(meta=meta, series=series, meta_mtime_ns=meta_mtime_ns)
+        with self._lock:
+            self._cache[test_id] = loaded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return loaded
+
+    def ensure(self, test_id: str) -> LoadedRun | None:
+        """The ingested run, ingested now if it finished before ingestion existed or its post-run step is queued."""
+        loaded = self.load(test_id)
+        if loaded is not None:
+            return loaded
+        try:
+            project, scenario = split_test_id(test_id)
+        except ValueError:
+            return None
+        results_dir = Path(settings.results_path) / project / scenario / test_id
+        if results_dir.is_dir() and self.ingest(test_id, results_dir):
+            return self.load(test_id)
+        return None
+
+    def forget(self, test_id: str) -> None:
+        with self._lock:
+            self._cache.pop(test_id, None)
+        shutil.rmtree(self.run_dir(test_id), ignore_errors=True)
+
+    def query(
+        self,
+        test_id: str,
+        name: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        resolution: int | None = None,
+    ) -> RunMetrics | None:
+        loaded = self.ensure(test_id)
+        if loaded is None:
+            return None
+
+        if resolution is None:
+            series = self.resolution(loaded, name, since, until)
+        else:  # the raw history may not be kept
+            series = loaded.series[min((r for r in loaded.series if r >= resolution), default=max(loaded.series))]
+
+        endpoints = []
+        for endpoint in series.endpoints:
+            if name is not None and endpoint.name != name:
+                continue
+            start, end = self.window(series, endpoint, since, until)
+            endpoints.append(
+                EndpointSeries(
+                    type=endpoint.type,
+                    name=endpoint.name,
+                    timestamps=list(series.columns["timestamp"][start:end]),
+                    columns={
+                        column: [_optional(float(v)) for v in series.columns[column][start:end]]
+                        for column in [*HISTORY_COLUMNS, *CORRECTED_COLUMNS]
+                        if column in series.columns and column != "timestamp" and "sketch" not in column
+                    },
+                    summary=self.summarize(series, endpoint, start, end, loaded.meta.corrected),
+                )
+            )
+
+        return RunMetrics(
+            test_id=test_id,
+            since=since,
+            until=until,
+            resolution=series.resolution,
+            recorded=loaded.meta.recorded,
+            corrected=loaded.meta.corrected,
+            endpoints=endpoints,
+            stats=loaded.meta.stats,
+            failures=loaded.meta.failures,
+            exceptions=loaded.meta.exceptions,
+            arrivals=loaded.meta.arrivals,
+        )
+
+    def merge_percentiles(self, test_ids: list[str], names: list[str]) -> MergedPercentiles | None:
+        """Percentiles of all requests of the endpoints named `names` in all the runs, `None` if one is not found."""
+        histogram, corrected = Histogram(), Histogram()
+        recorded = all_corrected = True
+        for test_id in dict.fromkeys(test_ids):
+            loaded = self.ensure(test_id)
+            if loaded is None:
+                return None
+            series = loaded.series[max(loaded.series)]
+            for endpoint in series.endpoints:
+                if endpoint.name in names:
+                    histogram.merge(series.histogram(endpoint, endpoint.start, endpoint.end))
+                    if loaded.meta.corrected:
+                        corrected.merge(series.histogram(endpoint, endpoint.start, endpoint.end, corrected=True))
+            recorded = recorded and loaded.meta.recorded
+            all_corrected = all_corrected and loaded.meta.corrected
+
+        return MergedPercentiles(
+            test_ids=test_ids,
+            names=names,
+            requests=round(histogram.total),
+            recorded=recorded,
+            percentiles=histogram.percentiles(PERCENTILES),
+            corrected_percentiles=corrected.percentiles(PERCENTILES) if all_corrected else None,
+        )
+
+    def resolution(self, loaded: LoadedRun, name: str | None, since: float | None, until: float | None) -> Series:
+        """The finest series with at most `MAX_POINTS` rows of any endpoint in the window, else the coarsest."""
+        for resolution in sorted(loaded.series):
+            series = loaded.series[resolution]
+            rows = max(
+                (
+                    end - start
+                    for start, end in (
+                        self.window(series, e, since, until) for e in series.endpoints if name is None or e.name == name
+                    )
+                ),
+                default=0,
+            )
+            if rows <= MAX_POINTS:
+                return series
+        return loaded.series[max(loaded.series)]
+
+    def window(
+        self, series: Series, endpoint: EndpointRef, since: float | None, until: float | None
+    ) -> tuple[int, int]:
+        """Rows of the endpoint within `since..until`, timestamps are sorted within an endpoint."""
+        timestamps = series.columns["timestamp"]
+        start, end = endpoint.start, endpoint.end
+        if since is not None:
+            start = bisect_left(timestamps, since, start, end)
+        if until is not None:
+            end = bisect_right(timestamps, until, start, end)
+        return start, end
+
+    def summarize(
+        self, series: Series, endpoint: EndpointRef, start: int, end: int, corrected: bool = False
+    ) -> WindowSummary:
+        columns = series.columns
+        if end <= start:
+            empty = {p: None for p in PERCENTILES}
+            return WindowSummary(
+                requests=0,
+                failures=0,
+                rps=0.0,
+                error_rate=0.0,
+                percentiles=empty,
+                max_percentiles=empty,
+                corrected_percentiles=empty if corrected else None,
+            )
+
+        # totals are cumulative, the row before the window is the baseline
+        base = start - 1 if start > endpoint.start else None
+        requests = columns["total_requests"][end - 1] - (columns["total_requests"][base] if base is not None else 0)
+        failures = columns["total_failures"][end - 1] - (columns["total_failures"][base] if base is not None else 0)
+        duration = columns["timestamp"][end - 1] - columns["timestamp"][base if base is not None else start]
+        if base is None and series.resolution != RAW:
+            duration += series.resolution  # rows of rollups are at the start of their interval
+
+        max_percentiles = {}
+        for p in PERCENTILES:
+            values = columns[f"p{p.rstrip('%')}"][start:end]
+            max_percentiles[p] = max((v for v in values if not math.isnan(v)), default=None)
+
+        mean_rps = _mean(list(columns["rps"][start:end]))
+        return WindowSummary(
+            requests=requests,
+            failures=failures,
+            rps=requests / duration if duration > 0 else (0.0 if math.isnan(mean_rps) else mean_rps),
+            error_rate=failures / requests if requests else 0.0,
+            percentiles=series.histogram(endpoint, start, end).percentiles(PERCENTILES),
+            corrected_percentiles=(
+                series.histogram(endpoint, start, end, corrected=True).percentiles(PERCENTILES) if corrected else None
+            ),
+            max_percentiles=max_percentiles,
+        )
+
+    def _endpoint_stats(self, row: dict[str, str]) -> EndpointStats:
+        return EndpointStats(
+            type=row.get("Type", ""),
+            name=row.get("Name", ""),
+            request_count=_int(row.get("Request Count")),
+            failure_count=_int(row.get("Failure Count")),
+            median_response_time=_optional(_float(row.get("Median Response Time"))),
+            average_response_time=_optional(_float(row.get("Average Response Time"))),
+            min_response_time=_optional(_float(row.get("Min Response Time"))),
+            max_response_time=_optional(_float(row.get("Max Response Time"))),
+            average_content_size=_optional(_float(row.get("Average Content Size"))),
+            rps=_optional(_float(row.get("Requests/s"))) or 0.0,
+            fps=_optional(_float(row.get("Failures/s"))) or 0.0,
+            percentiles={p: _optional(_float(row.get(p))) for p in PERCENTILES},
+        )
+
+
+metrics = MetricsStore()
@@ -0,0 +1,55 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+
+from config.settings import settings
+from db.db import database as db
+
+logger = getLogger(__name__)
+
+PORT_IN_USE_ERRORS = ("port is already allocated", "address already in use")
+
+
+@dataclass
+class PortAllocator:
+    """Hands out host ports for Locust web UIs from `MIN_PORT..MAX_PORT` of every Docker engine,
+    reservations live in the test store."""
+
+    busy_timeout: int = 60  # how long a port that failed to bind is skipped, in sec
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _busy: dict[tuple[str, int], float] = field(default_factory=dict)
+
+    def reserve(self, owner: str, engine: str) -> int:
+        with self._lock:
+            now = time.monotonic()
+            self._busy = {key: until for key, until in self._busy.items() if until > now}
+            candidates = [
+                port for port in range(settings.min_port, settings.max_port + 1) if (engine, port) not in self._busy
+            ]
+
+        port = db.reserve_port(engine, candidates, owner)
+        if port is None:
+            raise ValueError(f"No free ports in range {settings.min_port}-{settings.max_port} on {engine}")
+        logger.debug("Reserved port %s on %s for %s", port, engine, owner)
+        return port
+
+    def release(self, owner: str) -> None:
+        for engine, port in db.release_ports(owner):
+            logger.debug("Released port %s on %s of %s", port, engine, owner)
+
+    def transfer(self, owner: str, new_owner: str) -> None:
+        db.transfer_ports(owner, new_owner)
+
+    def mark_busy(self, port: int, engine: str) -> None:
+        """Skip a port that is taken on the Docker host by something LocustSwarm doesn't track."""
+        with self._lock:
+            self._busy[(engine, port)] = time.monotonic() + self.busy_timeout
+        db.release_port(engine, port)
+        logger.warning("Port %s is busy on %s, skipping it for %ss", port, engine, self.busy_timeout)
+
+    def is_port_in_use_error(self, error: Exception) -> bool:
+        return any(message in str(error).lower() for message in PORT_IN_USE_ERRORS)
+
+
+ports = PortAllocator()
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+
+from utils.compress import compress_results
+from utils.metrics import metrics
+from utils.trends import trends
+
+logger = getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_queued: set[str] = set()  # runs waiting for the executor, submitted once
+
+
+def process_finished_run(test_id: str, results_dir: Path) -> None:
+    """Post-run steps of a finished test; each one skips work that is already up to date."""
+    with _lock:
+        _queued.discard(test_id)
+    if not results_dir.is_dir():
+        return  # removed by the retention while queued
+    steps = (
+        (compress_results, (test_id, results_dir)),
+        (metrics.ingest, (test_id, results_dir)),
+        (trends.record, (test_id,)),  # reads the ingested metrics
+    )
+    for step, args in steps:
+        try:
+            step(*args)
+        except Exception as e:
+            logger.warning("Post-run step %s failed for %s: %s", step.__name__, test_id, e)
+
+
+def submit_finished_run(test_id: str, results_dir: Path) -> None:
+    """Run the post-run steps in the background, one run at a time; a run already waiting is not queued again."""
+    global _executor
+    with _lock:
+        if test_id in _queued:
+            return
+        _queued.add(test_id)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="postrun")
+    _executor.submit(process_finished_run, test_id, results_dir)
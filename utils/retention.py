@@ -0,0 +1,320 @@
+import csv
+import fcntl
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from typing import IO
+
+from config.settings import settings
+from db.db import database as db
+from models.results import RunInfo
+from models.retention import DiskUsage, RetentionReport, RetentionStatus
+from utils.catalog import catalog
+from utils.metrics import metrics
+from utils.postrun import process_finished_run
+from utils.test_ids import results_dir as test_results_dir
+from utils.zip import archive_path
+
+logger = getLogger(__name__)
+
+DOWNSAMPLE_INTERVAL = 10  # in sec, resolution of the history of compacted runs
+HISTORY_FILE = "stats_stats_history.csv"
+
+
+def _dir_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def downsample_history(path: Path, interval: int = DOWNSAMPLE_INTERVAL) -> bool:
+    """Keep one row per `interval` seconds of every endpoint, and its last row so the cumulative totals stay exact."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or "Timestamp" not in header:
+            return False
+        ts, type_, name = header.index("Timestamp"), header.index("Type"), header.index("Name")
+        last = {}
+        for i, row in enumerate(reader):
+            last[(row[type_], row[name])] = i
+
+    last_rows = set(last.values())
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(path, newline="", encoding="utf-8") as src, open(tmp_path, "w", newline="", encoding="utf-8") as dest:
+            reader, writer = csv.reader(src), csv.writer(dest)
+            writer.writerow(next(reader))
+            for i, row in enumerate(reader):
+                if i in last_rows or (row[ts].isdigit() and int(row[ts]) % interval == 0):
+                    writer.writerow(row)
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+
+@dataclass
+class Retention:
+    """Keeps `{TMP_PATH}` within `RETENTION_MAX_SIZE`: drops stale archives, compacts and then deletes the oldest runs
+    that no policy protects. One gunicorn worker at a time runs it, the others skip."""
+
+    _thread: threading.Thread | None = None
+    _pid: int | None = None
+    _lock_file: IO | None = None
+
+    def start(self) -> None:
+        if settings.retention_interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+        logger.info("Retention started, every %ss", settings.retention_interval)
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run()
+            except Exception as e:
+                logger.warning("Retention failed: %s", e)
+            time.sleep(settings.retention_interval)
+
+    def usage(self) -> DiskUsage:
+        return DiskUsage(
+            results=_dir_size(Path(settings.results_path)),
+            archives=_dir_size(Path(settings.archives_path)),
+            compressed=_dir_size(Path(settings.compressed_path)),
+            metrics=_dir_size(Path(settings.metrics_path)),
+        )
+
+    def policy(self, project: str) -> tuple[int, int]:
+        """`(keep_last, max_runs)` of a project, its `retention` in `config.json` over the settings."""
+        keep_last, max_runs = settings.retention_keep_last, settings.retention_max_runs
+        try:
+            project_config = settings.config.projects_configs.get(project)
+        except Exception as e:
+            logger.warning("Retention uses the default policy, config is not readable: %s", e)
+            project_config = None
+        if project_config and project_config.retention:
+            if project_config.retention.keep_last is not None:
+                keep_last = project_config.retention.keep_last
+            if project_config.retention.max_runs is not None:
+                max_runs = project_config.retention.max_runs
+        return keep_last, max_runs
+
+    def status(self) -> RetentionStatus:
+        usage = self.usage()
+        return RetentionStatus(
+            max_size=settings.retention_max_size * 1024 * 1024,
+            interval=settings.retention_interval,
+            keep_last=settings.retention_keep_last,
+            max_runs=settings.retention_max_runs,
+            running=self._is_locked(),
+            usage=usage,
+            total=usage.total,
+            last_report=self.last_report(),
+        )
+
+    def last_report(self) -> RetentionReport | None:
+        path = Path(settings.retention_state_path)
+        if not path.exists():
+            return None
+        return RetentionReport.model_validate_json(path.read_text(encoding="utf-8"))
+
+    def run(self) -> RetentionReport | None:
+        """One retention pass, `None` if another worker is running it."""
+        if not self._acquire():
+            return None
+        try:
+            report = self._run()
+        finally:
+            self._release()
+
+        path = Path(settings.retention_state_path)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(report.model_dump_json(), encoding="utf-8")
+        os.replace(tmp_path, path)
+        return report
+
+    def _run(self) -> RetentionReport:
+        started_at = datetime.now().isoformat()
+        catalog.refresh()
+        used = used_before = self.usage().total
+        budget = settings.retention_max_size * 1024 * 1024
+        compacted, deleted = [], []
+
+        stale_archives, freed = self._remove_stale_archives()
+        used -= freed
+
+        # over `max_runs` of their scenario, deleted whatever the budget
+        candidates = []
+        for runs in self._scenarios().values():
+            keep_last, max_runs = self.policy(runs[0].project)
+            for i, run in enumerate(runs):
+                if i < keep_last or run.pinned:
+                    continue
+                if max_runs and i >= max_runs:
+                    used -= self.remove(run)
+                    deleted.append(run.test_id)
+                else:
+                    candidates.append(run)
+        candidates.sort(key=lambda run: run.started_at)
+
+        if budget:
+            for run in candidates:
+                if used <= budget:
+                    break
+                if not run.compacted:
+                    used -= self.compact(run)
+                    compacted.append(run.test_id)
+            for run in candidates:
+                if used <= budget:
+                    break
+                used -= self.remove(run)
+                deleted.append(run.test_id)
+            if used > budget:
+                logger.warning(
+                    "Results use %s bytes, over the budget of %s; the remaining runs are protected", used, budget
+                )
+
+        report = RetentionReport(
+            started_at=started_at,
+            finished_at=datetime.now().isoformat(),
+            used_before=used_before,
+            used_after=used,
+            stale_archives=stale_archives,
+            compacted=compacted,
+            deleted=deleted,
+        )
+        if stale_archives or compacted or deleted:
+            logger.info(
+                "Retention: %s stale archives, %s runs compacted, %s deleted, %s -> %s bytes",
+                stale_archives,
+                len(compacted),
+                len(deleted),
+                used_before,
+                used,
+            )
+        return report
+
+    def _scenarios(self) -> dict[tuple[str, str], list[RunInfo]]:
+        """Finished runs per scenario, newest first; runs of active tests are left alone."""
+        runs, _ = db.query_runs(limit=-1)
+        scenarios: dict[tuple[str, str], list[RunInfo]] = {}
+        for run in runs:
+            test = db.get_test(run.test_id)
+            if run.status == "running" or (test is not None and test.status != "completed"):
+                continue
+            scenarios.setdefault((run.project, run.scenario), []).append(run)
+        return scenarios
+
+    def footprint(self, test_id: str, results_dir: Path) -> int:
+        size = _dir_size(results_dir)
+        size += _dir_size(Path(settings.compressed_path) / test_id)
+        size += _dir_size(metrics.run_dir(test_id))
+        return size + sum(path.stat().st_size for path in self._archives(test_id))
+
+    def compact(self, run: RunInfo) -> int:
+        """Downsample the run's history and drop its derived copies, they are rebuilt from the smaller files."""
+        results_dir = test_results_dir(run.test_id)
+        before = self.footprint(run.test_id, results_dir)
+
+        history = results_dir / HISTORY_FILE
+        if history.exists():
+            downsample_history(history)
+        for path in self._archives(run.test_id):
+            path.unlink(missing_ok=True)
+        # gzip copies and metrics of the smaller files now, so that the freed size is what stays freed
+        process_finished_run(run.test_id, results_dir)
+
+        run.compacted = True
+        db.upsert_run(run)
+        catalog.record(run.test_id)
+        freed = before - self.footprint(run.test_id, results_dir)
+        logger.info("Compacted %s, %s bytes freed", run.test_id, freed)
+        return freed
+
+    def remove(self, run: RunInfo) -> int:
+        results_dir = test_results_dir(run.test_id)
+        freed = self.footprint(run.test_id, results_dir)
+        shutil.rmtree(results_dir, ignore_errors=True)
+        self._remove_derived(run.test_id)
+        db.remove_run(run.test_id)
+        logger.info("Deleted %s, %s bytes freed", run.test_id, freed)
+        return freed
+
+    def _remove_derived(self, test_id: str) -> None:
+        for path in self._archives(test_id):
+            path.unlink(missing_ok=True)
+        shutil.rmtree(Path(settings.compressed_path) / test_id, ignore_errors=True)
+        metrics.forget(test_id)
+
+    def _archives(self, test_id: str) -> list[Path]:
+        archives_path = Path(settings.archives_path)
+        if not archives_path.exists():
+            return []
+        return [path for path in archives_path.glob(f"{test_id}-*.zip") if path.stem.rsplit("-", 1)[0] == test_id]
+
+    def _remove_stale_archives(self) -> tuple[int, int]:
+        """Cached archives of deleted runs or of an older version of the files, never served again."""
+        archives_path = Path(settings.archives_path)
+        if not archives_path.exists():
+            return 0, 0
+
+        removed = freed = 0
+        for path in archives_path.glob("*.zip"):
+            test_id = path.stem.rsplit("-", 1)[0]
+            try:
+                results_dir = test_results_dir(test_id)
+            except ValueError:
+                results_dir = None
+            if results_dir and results_dir.is_dir() and archive_path(test_id, results_dir) == path:
+                continue
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def _acquire(self) -> bool:
+        """Lock shared by the gunicorn workers, held for one pass."""
+        Path(settings.tmp_path).mkdir(parents=True, exist_ok=True)
+        lock_file = open(Path(settings.tmp_path) / "retention.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release(self) -> None:
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _is_locked(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        if not self._acquire():
+            return True
+        self._release()
+        return False
+
+
+retention = Retention()
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+
+import requests
+from werkzeug.utils import secure_filename
+
+from config.settings import settings
+from db.db import database as db
+from models.config import ArrivalScenario, RpsScenario, Scenario
+from models.jobs import JobInfo
+from models.scheduler import Allocation
+from models.tests import StartTestRequest, StartTestResponse, StopTestResponse, TestInfo
+from utils.catalog import catalog
+from utils.docker import PoolProfile, container_labels, engines
+from utils.generator import (
+    generate_arrival_scenario_file,
+    generate_custom_scenario_file,
+    generate_rps_scenario_file,
+)
+from utils.images import images
+from utils.jobs import jobs
+from utils.ports import ports
+from utils.scheduler import scheduler
+from utils.test_ids import results_dir as test_results_dir
+
+logger = getLogger(__name__)
+
+
+def launch_test(job: JobInfo, start_request: StartTestRequest, allocation: Allocation) -> StartTestResponse:
+    try:
+        return _launch_test(job, start_request, allocation)
+    finally:
+        # whatever was not handed over to the started test goes back to the scheduler
+        scheduler.release(job.job_id)
+
+
+scheduler.launcher = launch_test
+
+
+def _launch_test(job: JobInfo, start_request: StartTestRequest, allocation: Allocation) -> StartTestResponse:
+    project = start_request.project
+    scenario = start_request.scenario
+    in_web = start_request.in_web
+    auth_token = start_request.auth_token
+
+    if not db.has_tests() and scheduler.running_count() == 1:
+        engines.cleanup_containers(keep_pool=True)
+
+    docker = engines.get(allocation.engine)
+
+    test_id_prefix = f"{project}__{scenario}"
+    test_id = f"{test_id_prefix}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    logger.debug("test_id: %s", test_id)
+
+    project_configs = settings.config.projects_configs[project]
+    scenario_config = project_configs.scenarios[scenario]
+
+    logger.debug("scenario_config: %s", scenario_config)
+
+    test = db.find_unfinished(test_id_prefix)
+    if test is not None:
+        logger.debug("Test %s already running!", test)
+        return StartTestResponse(
+            test_id=test.test_id,
+            in_web=test.in_web,
+            web_url=test.web_url,
+            status="running",
+            container_status=test.container_status,
+        )
+
+    jobs.progress(job, "Preparing image")
+    image = images.get_image(project, docker)
+
+    tmp_dir = Path(settings.tmp_path) / secure_filename(project)
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    volumes = {
+        os.path.abspath(tmp_dir): {"bind": f"/tmp/{project}", "mode": "ro"},
+    }
+
+    environment = {
+        "AUTH_TOKEN": auth_token,
+        "PYTHONPATH": "/tests/",
+    }
+    if scenario_config.corrected_latency:
+        environment["CORRECTED_LATENCY"] = "1"
+    results_volume = docker.setup_results_volume(project, scenario, test_id)
+    volumes.update(results_volume)
+
+    results_path = f"/results/{project}/{scenario}/{test_id}"
+
+    if not isinstance(scenario_config, Scenario):
+        if isinstance(scenario_config, RpsScenario):
+            custom_scenario_content = generate_rps_scenario_file(project, scenario_config)
+        elif isinstance(scenario_config, ArrivalScenario):
+            custom_scenario_content = generate_arrival_scenario_file(project, scenario_config)
+        else:
+            custom_scenario_content = generate_custom_scenario_file(project, scenario_config)
+        logger.debug(custom_scenario_content)
+
+        custom_scenario_path = tmp_dir / "custom_scenario.py"
+        with open(custom_scenario_path, "w", encoding="utf-8") as f:
+            f.write(custom_scenario_content)
+
+    locustfiles = f"/tests/{project}/{scenario}.py"
+    if not isinstance(scenario_config, Scenario):
+        locustfiles += f",/tmp/{project}/custom_scenario.py"
+    if settings.latency_histograms or scenario_config.corrected_latency:
+        locustfiles += ",/tests/histograms.py"
+
+    workers = scenario_config.workers
+
+    command = f"""
+        -f {locustfiles}
+        {"--loglevel DEBUG" if settings.debug else ""}
+        --host {project_configs.host}
+        --web-port 8089
+        --html {{results_path}}/report.html
+        --csv {{results_path}}/stats
+        --csv-full-history
+        {"--headless" if not in_web else ""}
+        {f"--master --expect-workers {workers}" if workers else ""}
+    """
+
+    run_args = ""
+    if isinstance(scenario_config, Scenario):
+        run_args = f"""
+            --users {scenario_config.users}
+            --spawn-rate {scenario_config.spawn_rate} 
+            --run-time {scenario_config.run_time}
+        """
+
+    command = command.strip().replace("\n", " ")
+    run_args = run_args.strip().replace("\n", " ")
+
+    jobs.progress(job, "Starting containers")
+    container = None
+    network = None
+    pooled = None
+    if in_web and not workers:
+        pool_volumes = {k: v for k, v in volumes.items() if k not in results_volume}
+        profile_key = hashlib.sha1(
+            json.dumps(
+                [image, command, pool_volumes, environment, scenario_config.model_dump()], sort_keys=True
+            ).encode()
+        ).hexdigest()
+        pooled = docker.take_from_pool(
+            PoolProfile(key=profile_key, image=image, command=command, volumes=pool_volumes, environment=environment)
+        )
+
+    if pooled:
+        swarm_data = {"host": project_configs.host}
+        if isinstance(scenario_config, Scenario):
+            swarm_data.update(
+                user_count=scenario_config.users,
+                spawn_rate=scenario_config.spawn_rate,
+                run_time=scenario_config.run_time,
+            )
+        try:
+            response = requests.post(f"{docker.web_host}:{pooled.web_port}/swarm", data=swarm_data, timeout=10)
+            response.raise_for_status()
+            pooled.container.update(
+                cpuset_cpus=str(allocation.cpus[0]),
+                mem_limit=allocation.mem_limit,
+                memswap_limit=allocation.mem_limit,
+            )
+            pooled.container.rename(f"locust_{test_id}")
+            ports.transfer(pooled.slot, test_id)
+            container = pooled.container
+            locust_web_port = int(pooled.web_port)
+        except Exception as e:
+            logger.warning("Failed to start swarm on pooled container %s: %s", pooled.slot, e)
+            pooled.container.remove(force=True)
+            ports.release(pooled.slot)
+            pooled = None
+
+    try:
+        if container is None:
+            network = docker.create_network(test_id) if workers else None
+
+            container, locust_web_port = docker.run_with_port(
+                test_id,
+                image,
+                f"locust_{test_id}",
+                command=f"{command.replace('{results_path}', results_path)} {run_args}",
+                volumes=volumes,
+                detach=True,
+                environment=environment,
+                network=network.name if network else None,
+                labels=container_labels("master", test_id),
+                cpuset_cpus=str(allocation.cpus[0]),
+                mem_limit=allocation.mem_limit,
+            )
+
+        container.reload()
+        if container.status != "running":
+            logs = container.logs().decode("utf-8")[:500]
+            logger.error("Container failed to start. Status: %s, Logs: %s", container.status, logs)
+            raise ValueError(f"Container failed to start. Status: {container.status}")
+
+        worker_containers = []
+        if network:
+            worker_command = f"-f {locustfiles} {'--loglevel DEBUG' if settings.debug else ''}"
+            worker_volumes = {k: v for k, v in volumes.items() if k not in results_volume}
+            worker_containers = docker.run_workers(
+                image, test_id, worker_command, worker_volumes, environment, network, allocation
+            )
+    except Exception:
+        # nothing tracks the test yet, so its master, workers and network go now
+        docker.discard_test(test_id, container, network)
+        ports.release(test_id)
+        raise
+
+    container_id = container.id or "unknown"
+    container_status = container.status or "unknown"
+
+    db.add_test(
+        TestInfo(
+            test_id=test_id,
+            status="running",
+            project=project_configs.name,
+            scenario=scenario,
+            in_web=in_web,
+            web_url=f"{docker.web_host}:{locust_web_port}",
+            container_id=container_id,
+            container_status=container_status,
+            start_time=datetime.now().isoformat(),
+            web_port=locust_web_port,
+            worker_ids=[worker.id or "unknown" for worker in worker_containers],
+            network_id=network.id if network else None,
+            pool_slot=pooled.slot if pooled else None,
+            engine=docker.name,
+            cpus=allocation.cpus,
+        )
+    )
+
+    scheduler.transfer(job.job_id, test_id)
+    catalog.record(test_id)
+
+    return StartTestResponse(
+        test_id=test_id,
+        in_web=in_web,
+        web_url=f"{docker.web_host}:{locust_web_port}",
+        status="started",
+        container_status=container_status,
+    )
+
+
+def shutdown_test(job: JobInfo, test_id: str) -> StopTestResponse:
+    test = db.get_test(test_id)
+    if test is None:
+        raise ValueError(f"Test {test_id} not found")
+
+    report_html = None
+    if test.in_web:
+        jobs.progress(job, "Downloading report")
+        report_url = f"{test.web_url}/stats/report"
+        response = requests.get(report_url, timeout=10)
+
+        if response.status_code == 200:
+            report_html = response.text
+        else:
+            logger.warning("Failed to download report: %s", response.status_code)
+
+    jobs.progress(job, "Stopping containers")
+    docker = engines.for_test(test)
+    container = docker.stop_test(test, timeout=10)
+    docker.fetch_results(test)
+    docker.collect_pool_results(test)
+
+    if report_html is not None:
+        results_dir = test_results_dir(test_id)
+        results_dir.mkdir(parents=True, exist_ok=True)
+
+        report_path = results_dir / "report.html"
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(report_html)
+
+        logger.info("HTML report saved: %s", report_path)
+
+    catalog.record(test_id)
+
+    container_status = container.status or "unknown"
+    return StopTestResponse(
+        test_id=test.test_id,
+        status="stopped",
+        container_status=container_status,
+        message="Success",
+    )
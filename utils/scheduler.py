@@ -0,0 +1,240 @@
+import os
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import getLogger
+
+from pydantic import BaseModel
+
+from config.settings import settings
+from db.db import database as db
+from models.jobs import JobInfo
+from models.scheduler import Allocation, CapacityInfo, PendingRun, PendingRunInfo, QueueInfo
+from models.tests import StartTestRequest
+from utils.docker import Docker, engines
+from utils.jobs import jobs
+
+logger = getLogger(__name__)
+
+MEM_UNITS = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_mem(value: str) -> int:
+    value = value.strip().lower()
+    if value[-1] in MEM_UNITS:
+        return int(float(value[:-1]) * MEM_UNITS[value[-1]])
+    return int(value)
+
+
+@dataclass
+class Scheduler:
+    """FIFO queue of test runs in front of the launcher, sized by the cores and memory of every Docker engine.
+    The queue is stored in the database, a run queued by a process that has exited is started by the next one."""
+
+    launcher: Callable[[JobInfo, StartTestRequest, Allocation], BaseModel] | None = None  # set by `utils.runner`
+    _allocations: dict[str, Allocation] = field(default_factory=dict)
+    _capacity: dict[str, tuple[int, int]] = field(default_factory=dict)
+    _lock: threading.RLock = field(default_factory=threading.RLock)
+    _restored_pid: int | None = None
+
+    def capacity(self, engine: Docker) -> tuple[int, int]:
+        """Cores and memory (bytes) of the engine's host."""
+        if engine.name not in self._capacity:
+            try:
+                info = engine.get().info()
+                self._capacity[engine.name] = (int(info["NCPU"]), int(info["MemTotal"]))
+            except Exception as e:
+                logger.warning("Failed to get resources of %s, using local ones: %s", engine.name, e)
+                self._capacity[engine.name] = (
+                    os.cpu_count() or 1,
+                    os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"),
+                )
+        return self._capacity[engine.name]
+
+    def usable_cpus(self, engine: Docker) -> list[int]:
+        cpus, _ = self.capacity(engine)
+        reserved = min(settings.scheduler_reserved_cpus, cpus - 1)
+        return list(range(reserved, cpus))
+
+    def max_containers(self, engine: Docker) -> int:
+        _, mem_total = self.capacity(engine)
+        by_mem = mem_total // parse_mem(settings.container_mem_limit)
+        return max(1, min(len(self.usable_cpus(engine)), by_mem))
+
+    def enqueue(self, job: JobInfo, containers: int, request: StartTestRequest) -> None:
+        """Queue a run of `containers` containers; the launcher gets the job with its allocation once it fits."""
+        max_containers = max(self.max_containers(engine) for engine in engines.all())
+        if containers > max_containers:
+            raise ValueError(f"Test needs {containers} containers, the largest engine fits {max_containers}")
+
+        with self._lock:
+            job.status = "queued"
+            jobs.progress(job, f"Waiting for capacity, position {len(db.get_pending_runs()) + 1}")
+            db.add_pending_run(
+                PendingRun(
+                    job_id=job.job_id,
+                    key=job.key,
+                    containers=containers,
+                    request=request,
+                    enqueued_at=datetime.now().isoformat(),
+                )
+            )
+        self._dispatch()
+
+    def cancel(self, job_id: str) -> bool:
+        if not db.remove_pending_run(job_id):
+            return False
+        job = jobs.get(job_id)
+        if job is not None:
+            jobs.fail(job, "Cancelled")
+        return True
+
+    def resume(self) -> None:
+        """Take over after a restart or a recycled gunicorn worker: restore the allocations and start the runs queued
+        by the previous process that fit now."""
+        if self._restored_pid != os.getpid():
+            self._dispatch()
+
+    def transfer(self, owner: str, new_owner: str) -> None:
+        with self._lock:
+            allocation = self._allocations.pop(owner, None)
+            if allocation:
+                allocation.owner = new_owner
+                self._allocations[new_owner] = allocation
+
+    def release(self, owner: str) -> None:
+        with self._lock:
+            allocation = self._allocations.pop(owner, None)
+        if allocation:
+            logger.debug("Released cpus %s on %s of %s", allocation.cpus, allocation.engine, owner)
+            self._dispatch()
+
+    def running_count(self) -> int:
+        with self._lock:
+            self._restore()
+            return len(self._allocations)
+
+    def info(self) -> QueueInfo:
+        mem_limit = parse_mem(settings.container_mem_limit)
+        with self._lock:
+            self._restore()
+            capacities = []
+            for engine in engines.all():
+                cpus_total, mem_total = self.capacity(engine)
+                used = self._used_cpus(engine)
+                capacities.append(
+                    CapacityInfo(
+                        engine=engine.name,
+                        weight=engine.weight,
+                        cpus_total=cpus_total,
+                        cpus_reserved=cpus_total - len(self.usable_cpus(engine)),
+                        cpus_free=self.max_containers(engine) - len(used),
+                        mem_total=mem_total,
+                        mem_free=mem_total - len(used) * mem_limit,
+                        mem_limit=settings.container_mem_limit,
+                    )
+                )
+            return QueueInfo(
+                engines=capacities,
+                running=list(self._allocations.values()),
+                pending=[
+                    PendingRunInfo(
+                        job_id=run.job_id,
+                        key=run.key,
+                        position=i + 1,
+                        containers=run.containers,
+                        enqueued_at=run.enqueued_at,
+                    )
+                    for i, run in enumerate(db.get_pending_runs())
+                ],
+            )
+
+    def _restore(self) -> None:
+        """Allocations of the tests started before this process (a restart, a recycled gunicorn worker), from the
+        stored tests. Tests stored without their cores take free ones, so they still count against capacity."""
+        if self._restored_pid == os.getpid():
+            return
+        self._restored_pid = os.getpid()
+        try:
+            tests = db.get_tests()
+        except Exception as e:
+            logger.warning("Failed to restore allocations of running tests: %s", e)
+            return
+
+        for test in tests:
+            if test.status == "completed" or test.test_id in self._allocations:
+                continue
+            try:
+                engine = engines.for_test(test)
+            except ValueError:
+                continue  # a removed engine, its tests are completed by the watcher
+            cpus = test.cpus
+            if not cpus:
+                used = self._used_cpus(engine)
+                cpus = [cpu for cpu in self.usable_cpus(engine) if cpu not in used][: 1 + len(test.worker_ids)]
+            self._allocations[test.test_id] = Allocation(
+                owner=test.test_id, engine=engine.name, cpus=cpus, mem_limit=settings.container_mem_limit
+            )
+            logger.info("Restored cpus %s on %s of %s", cpus, engine.name, test.test_id)
+
+    def _used_cpus(self, engine: Docker) -> set[int]:
+        return {
+            cpu
+            for allocation in self._allocations.values()
+            if allocation.engine == engine.name
+            for cpu in allocation.cpus
+        }
+
+    def _allocate(self, run: PendingRun) -> Allocation | None:
+        if not settings.allow_parallel and self._allocations:
+            return None
+
+        # least loaded engine first, the load is the used share of its capacity scaled down by its weight
+        candidates = []
+        for engine in engines.all():
+            used = self._used_cpus(engine)
+            max_containers = self.max_containers(engine)
+            free = [cpu for cpu in self.usable_cpus(engine) if cpu not in used][: max_containers - len(used)]
+            if len(free) >= run.containers and engine.weight > 0:
+                candidates.append((len(used) / (max_containers * engine.weight), engine, free))
+        if not candidates:
+            return None
+
+        _, engine, free = min(candidates, key=lambda candidate: candidate[0])
+        allocation = Allocation(
+            owner=run.job_id,
+            engine=engine.name,
+            cpus=free[: run.containers],
+            mem_limit=settings.container_mem_limit,
+        )
+        self._allocations[allocation.owner] = allocation
+        return allocation
+
+    def _dispatch(self) -> None:
+        ready = []
+        with self._lock:
+            self._restore()
+            pending = db.get_pending_runs()
+            # strict FIFO: a big run at the head is not overtaken by smaller ones
+            while pending:
+                allocation = self._allocate(pending[0])
+                if allocation is None:
+                    break
+                run = pending.pop(0)
+                job = jobs.get(run.job_id)
+                if not db.remove_pending_run(run.job_id) or job is None:
+                    self._allocations.pop(allocation.owner, None)  # taken by another process or cancelled
+                    continue
+                ready.append((job, run, allocation))
+            for i, run in enumerate(pending):
+                job = jobs.get(run.job_id)
+                if job is not None:
+                    jobs.progress(job, f"Waiting for capacity, position {i + 1}")
+
+        for job, run, allocation in ready:
+            logger.info("Dispatching %s on %s cpus %s", run.key, allocation.engine, allocation.cpus)
+            jobs.run(job, self.launcher, run.request, allocation)
+
+
+scheduler = Scheduler()
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from config.settings import settings
+
+# A test id is `{project}__{scenario}-{timestamp}`, project and scenario are config keys and may contain `-` or `_`.
+
+
+def id_prefix(test_id: str) -> str:
+    """`{project}__{scenario}` of a test id."""
+    return test_id.rsplit("-", 1)[0]
+
+
+def split_test_id(test_id: str) -> tuple[str, str]:
+    """Project and scenario keys of a test id, `ValueError` if it is not one."""
+    project, scenario = id_prefix(test_id).split("__", 1)
+    return project, scenario
+
+
+def results_dir(test_id: str) -> Path:
+    project, scenario = split_test_id(test_id)
+    return Path(settings.results_path) / project / scenario / test_id
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from logging import getLogger
+
+from db.db import database as db
+from models.metrics import EndpointRef, EndpointStats
+from models.results import RunInfo
+from models.trends import RunSummary, Trend, TrendSeries
+from utils.metrics import LoadedRun, Series, metrics
+
+logger = getLogger(__name__)
+
+SUSTAINED_WINDOW = 30  # seconds
+
+
+@dataclass
+class RunTrends:
+    """Per-run summary rows in the store, written once when a run finishes, so trends don't read results."""
+
+    def record(self, test_id: str) -> int:
+        """(Re)compute the summaries of one finished run from its ingested metrics."""
+        run = db.get_run(test_id)
+        if run is None:
+            return 0
+        loaded = metrics.ensure(test_id)
+        if loaded is None:
+            # recorded as summarized without summaries, it's tried again only when the post-run work ingests it
+            db.replace_run_summaries(test_id, [])
+            logger.debug("No metrics to summarize for %s", test_id)
+            return 0
+
+        summaries = [self._summarize(run, loaded, stats) for stats in loaded.meta.stats]
+        db.replace_run_summaries(test_id, summaries)
+        logger.debug("Recorded %s summaries of %s", len(summaries), test_id)
+        return len(summaries)
+
+    def query(self, project: str, scenario: str, name: str | None = None, limit: int = 100) -> Trend:
+        # runs finished before summaries existed, only the ones in the requested range
+        for test_id in db.get_unsummarized_runs(project, scenario, limit):
+            self.record(test_id)
+
+        series: dict[tuple[str, str], TrendSeries] = {}
+        test_ids = set()
+        for summary in db.get_run_summaries(project, scenario, name, limit):
+            key = (summary.type, summary.name)
+            if key not in series:
+                series[key] = TrendSeries(type=summary.type, name=summary.name, points=[])
+            series[key].points.append(summary)
+            test_ids.add(summary.test_id)
+        return Trend(project=project, scenario=scenario, runs=len(test_ids), endpoints=list(series.values()))
+
+    def _summarize(self, run: RunInfo, loaded: LoadedRun, stats: EndpointStats) -> RunSummary:
+        series = loaded.finest
+        endpoint = series.endpoint((stats.type, stats.name))
+        timestamps = series.columns["timestamp"]
+        duration = timestamps[endpoint.end - 1] - timestamps[endpoint.start] if endpoint else 0
+        max_rps = self._max_sustained_rps(series, endpoint) if endpoint else None
+        return RunSummary(
+            test_id=run.test_id,
+            project=run.project,
+            scenario=run.scenario,
+            status=run.status,
+            started_at=run.started_at,
+            type=stats.type,
+            name=stats.name,
+            duration=duration,
+            requests=stats.request_count,
+            failures=stats.failure_count,
+            rps=stats.rps,
+            max_rps=max_rps if max_rps is not None else stats.rps,
+            error_rate=stats.failure_count / stats.request_count if stats.request_count else 0.0,
+            p50=stats.percentiles.get("50%"),
+            p95=stats.percentiles.get("95%"),
+            p99=stats.percentiles.get("99%"),
+        )
+
+    def _max_sustained_rps(self, series: Series, endpoint: EndpointRef) -> float | None:
+        """Highest mean RPS over any `SUSTAINED_WINDOW` seconds, from the cumulative request counts."""
+        timestamps = series.columns["timestamp"]
+        totals = series.columns["total_requests"]
+        best = None
+        j = endpoint.start
+        for i in range(endpoint.start, endpoint.end):
+            while j + 1 < i and timestamps[i] - timestamps[j + 1] >= SUSTAINED_WINDOW:
+                j += 1
+            elapsed = timestamps[i] - timestamps[j]
+            if elapsed >= SUSTAINED_WINDOW:
+                rps = (totals[i] - totals[j]) / elapsed
+                best = rps if best is None else max(best, rps)
+        return best
+
+
+trends = RunTrends()
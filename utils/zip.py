@@ -1,15 +1,90 @@
+import hashlib
 import io
+import os
+import uuid
 import zipfile
+from collections.abc import Iterator
+from contextlib import ExitStack
+from logging import getLogger
 from pathlib import Path
 
+from config.settings import settings
 
-def make_zip(results_dir: Path):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file_path in results_dir.iterdir():
-            if file_path.is_file():
-                arcname = file_path.name
-                zip_file.write(file_path, arcname)
+logger = getLogger(__name__)
 
-    zip_buffer.seek(0)
-    return zip_buffer
+CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink; `zipfile` falls back to data descriptors and the chunks are drained as built."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def result_files(results_dir: Path) -> list[Path]:
+    return sorted((p for p in results_dir.iterdir() if p.is_file()), key=lambda p: p.name)
+
+
+def archive_path(test_id: str, results_dir: Path) -> Path:
+    """Cache location of the archive, the name changes whenever a result file is added, removed or modified."""
+    digest = hashlib.sha1()
+    for file_path in result_files(results_dir):
+        stat = file_path.stat()
+        digest.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return Path(settings.archives_path) / f"{test_id}-{digest.hexdigest()[:12]}.zip"
+
+
+def iter_zip(results_dir: Path, cache_path: Path | None = None) -> Iterator[bytes]:
+    """Yield the ZIP archive of the results in chunks of about `CHUNK_SIZE`; with `cache_path` also store it there."""
+    # unwound also on client disconnect (GeneratorExit): the cache file is closed, then the tmp file removed
+    with ExitStack() as stack:
+        cache_file = None
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+            stack.callback(tmp_path.unlink, missing_ok=True)
+            cache_file = stack.enter_context(open(tmp_path, "wb"))
+
+        def emit(buffer: _StreamBuffer) -> bytes:
+            data = buffer.drain()
+            if cache_file is not None:
+                cache_file.write(data)
+            return data
+
+        buffer = _StreamBuffer()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for file_path in result_files(results_dir):
+                zip_info = zipfile.ZipInfo.from_file(file_path, file_path.name)
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                with open(file_path, "rb") as src, zip_file.open(zip_info, "w") as dest:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dest.write(chunk)
+                        if buffer.size >= CHUNK_SIZE:
+                            yield emit(buffer)
+            # the central directory is written on close
+        yield emit(buffer)
+
+        if cache_file is not None:
+            cache_file.close()
+            os.replace(tmp_path, cache_path)
+            logger.debug("Cached archive %s", cache_path)
+            for old in cache_path.parent.glob(f"{cache_path.name.rsplit('-', 1)[0]}-*.zip"):
+                if old != cache_path:
+                    old.unlink(missing_ok=True)